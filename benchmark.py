@@ -0,0 +1,578 @@
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+# Import config class for tokens
+from config import Config
+from operations import Operator
+from journal import JournalBackend
+from storage import MemoryBackend, PostgresBackend, SQLiteBackend
+
+# Table the PostgreSQL benchmarks store their locations in
+BENCHMARK_TABLE = "LOCATIONZ_BENCH"
+
+# Amount of locations saved per transaction when seeding
+SEED_BATCH_SIZE = 5000
+
+# Guild the made up locations are saved in
+BENCHMARK_GUILD = "benchmark"
+
+# Syllables used to make up location and author names
+SYLLABLES = ["ka", "ri", "mo", "tan", "vel", "or", "dun", "shi", "pe", "lox", "aru", "zen", "bri", "gol", "nea", "ut"]
+
+class FakeUser:
+    """Class to stand in for the discord user that saves a location
+
+    Stores...
+        Discord name of the user
+        Discord ID of the user
+
+    """
+    def __init__(self, name, id):
+        self.name = name
+        self.id = id
+
+class SleepingBackend(MemoryBackend):
+    """Class to stand in for a database that takes a while to answer, i.e. to check that slow queries do not hold up other commands
+
+    Locations are kept in memory, but every lookup first sleeps (blocking its thread) like a query waiting on the database would.
+    It does not count as in memory, so the Operator caches its reads and runs its calls on worker threads like it does for a database.
+
+    Stores...
+        Amount of seconds every lookup takes
+
+    """
+    in_memory = False
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def get_locations_by_name(self, guild_id, name):
+        time.sleep(self.delay)
+        return super().get_locations_by_name(guild_id, name)
+
+    def get_locations_by_names(self, guild_id, names):
+        time.sleep(self.delay)
+        return super().get_locations_by_names(guild_id, names)
+
+    def search_locations(self, guild_id, search_token, query):
+        time.sleep(self.delay)
+        return super().search_locations(guild_id, search_token, query)
+
+# Function to make up a random name
+def random_name(rand, syllables=3):
+    """Function to make up a random name out of a few syllables
+
+    Args:
+        rand      (Random): Random number generator to use
+        syllables    (int): Amount of syllables in the name (Default: 3)
+
+    Returns:
+        str: Returns the made up name
+    """
+    return "".join(rand.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+# Function to create an Operator on the given backend, with no locations in it
+def create_operator(backend, directory):
+    """Function to create an empty Operator storing its locations in the given backend
+
+    Args:
+        backend    (str): Storage backend to use, either 'memory', 'journal', 'sqlite' or 'postgres'
+        directory  (str): Directory to create the SQLite database and journal files in
+
+    Returns:
+        Operator: Returns the Operator, with its storage set up and emptied
+    """
+    config = Config()
+
+    if backend == "memory":
+        return Operator(True, config)
+
+    if backend == "journal":
+        storage = JournalBackend(os.path.join(tempfile.mkdtemp(dir=directory), "locations"))
+    elif backend == "sqlite":
+        fd, path = tempfile.mkstemp(suffix=".db", dir=directory)
+        os.close(fd)
+        storage = SQLiteBackend(path)
+    else:
+        # Separate table so the benchmarks never touch the bot's locations
+        storage = PostgresBackend(config, table_name=BENCHMARK_TABLE)
+
+    op = Operator(False, config, storage=storage)
+    op.setup_database()
+
+    if backend == "postgres":
+        with storage.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("TRUNCATE TABLE {}".format(BENCHMARK_TABLE))
+            conn.commit()
+
+    return op
+
+# Function to fill an Operator with made up locations
+def seed_operator(size, seed=0, backend="memory", directory=None):
+    """Function to create an Operator holding 'size' made up locations
+
+    Args:
+        size       (int): Amount of locations to add
+        seed       (int): Seed for the random number generator (Default: 0)
+        backend    (str): Storage backend to use, either 'memory', 'journal', 'sqlite' or 'postgres' (Default: 'memory')
+        directory  (str): Directory to create the SQLite database and journal files in (Default: None, i.e. the system's temporary directory)
+
+    Returns:
+        Operator: Returns the seeded Operator
+    """
+    rand = random.Random(seed)
+    op = create_operator(backend, directory)
+
+    # Separate generator for the users so the same locations come first whatever the size
+    user_rand = random.Random(seed + 1)
+    users = [FakeUser(random_name(user_rand, 2), 1000 + i) for i in range(max(1, size // 50))]
+
+    batch = []
+    for i in range(size):
+        name = "{} {}".format(random_name(rand), i)
+        batch.append(op.create_location(BENCHMARK_GUILD, name, rand.choice(users), rand.randint(-30000, 30000), rand.randint(-30000, 30000), rand.randint(0, 255), "N/A"))
+
+        # Save in batches, one transaction each
+        if len(batch) == SEED_BATCH_SIZE or i == size - 1:
+            op.storage.add_locations(batch)
+            batch = []
+
+    return op
+
+# Function to search the way local mode did before it had an index
+def scan_search(op, search_token):
+    """Function to search the location names by going over every location, used as the baseline
+
+    Args:
+        op           (Operator): Operator holding the locations
+        search_token      (str): Substring to search for
+
+    Returns:
+        list: Returns the matching locations
+    """
+    search_token = search_token.upper()
+
+    return [entry for entry in op.storage.partition(BENCHMARK_GUILD).locations.values() if search_token in entry["name"].upper()]
+
+# Function to time a search function over a set of tokens
+def time_searches(search, tokens, repeats):
+    """Function to time a search function over every token
+
+    Args:
+        search (callable): Function that takes a search token
+        tokens     (list): Search tokens to use
+        repeats     (int): Amount of times every token is searched
+
+    Returns:
+        float: Returns the median time of a single search in microseconds
+    """
+    timings = []
+
+    for _ in range(repeats):
+        for token in tokens:
+            start = time.perf_counter()
+            search(token)
+            timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings) * 1e6
+
+# Function to run the search benchmark
+def bench_search(sizes, repeats):
+    """Function to compare the indexed name search with a full scan over growing amounts of locations, in local mode
+
+    Args:
+        sizes   (list): Amounts of locations to benchmark with
+        repeats  (int): Amount of times every search token is searched
+
+    Returns:
+        list: Returns a dict per size with the median indexed and full scan search times in microseconds
+    """
+    print("{:>8} {:>14} {:>14}".format("size", "indexed (us)", "scan (us)"))
+
+    results = []
+
+    for size in sizes:
+        op = seed_operator(size)
+
+        # Search for the tail end of names that exist at every size, which only match a handful of locations.
+        # Broad tokens match a fixed share of the table and cost whatever it takes to return that many results.
+        rand = random.Random(1)
+        locations = list(op.storage.partition(BENCHMARK_GUILD).locations.values())
+        tokens = [locations[rand.randrange(sizes[0])]["name"][2:] for _ in range(50)]
+
+        indexed = time_searches(lambda token: op.search_locations(BENCHMARK_GUILD, token), tokens, repeats)
+        scan = time_searches(lambda token: scan_search(op, token), tokens, repeats)
+
+        print("{:>8} {:>14.1f} {:>14.1f}".format(size, indexed, scan))
+        results.append((size, indexed, scan))
+
+    # Compare how much slower searches got against how much bigger the table got
+    if len(results) > 1:
+        first, last = results[0], results[-1]
+        print("\n{}x more locations: indexed search {:.1f}x slower, full scan {:.1f}x slower".format(last[0] // first[0], last[1] / first[1], last[2] / first[2]))
+
+    return [{"size" : size, "indexed_us" : indexed, "scan_us" : scan} for size, indexed, scan in results]
+
+# Function to get a percentile of a list of timings
+def percentile(timings, q):
+    """Function to get the value below which 'q' percent of the timings fall
+
+    Args:
+        timings  (list): Sorted list of timings
+        q       (float): Percentile to get, between 0 and 100
+
+    Returns:
+        float: Returns the percentile (nearest rank)
+    """
+    return timings[min(len(timings) - 1, max(0, math.ceil(q / 100 * len(timings)) - 1))]
+
+# Function to summarize a list of timings
+def summarize(timings, elapsed):
+    """Function to turn the timings of every call into throughput and latency figures
+
+    Args:
+        timings  (list): Seconds taken by every call
+        elapsed (float): Seconds taken by all the calls together
+
+    Returns:
+        dict: Returns the amount of calls, calls per second and the p50/p99 latency in milliseconds
+    """
+    timings = sorted(timings)
+
+    return  {
+                "calls"          : len(timings),
+                "throughput"     : len(timings) / elapsed if elapsed else 0.0,
+                "p50_ms"         : percentile(timings, 50) * 1000,
+                "p99_ms"         : percentile(timings, 99) * 1000,
+            }
+
+# Function to time a function over a set of arguments
+def time_calls(func, calls, repeats):
+    """Function to time a function over every set of arguments, one call after the other
+
+    Args:
+        func (callable): Function to time
+        calls    (list): Tuple of arguments of every call
+        repeats   (int): Amount of times every call is made
+
+    Returns:
+        dict: Returns the summary of the timings (see summarize)
+    """
+    timings = []
+    began = time.perf_counter()
+
+    for _ in range(repeats):
+        for call_args in calls:
+            start = time.perf_counter()
+            func(*call_args)
+            timings.append(time.perf_counter() - start)
+
+    return summarize(timings, time.perf_counter() - began)
+
+# Function to time a coroutine function over a set of arguments
+async def time_coroutines(func, calls, repeats):
+    """Function to time a coroutine function (i.e. a bot command) over every set of arguments, one call after the other
+
+    Args:
+        func (callable): Coroutine function to time
+        calls    (list): Tuple of arguments of every call
+        repeats   (int): Amount of times every call is made
+
+    Returns:
+        dict: Returns the summary of the timings (see summarize)
+    """
+    timings = []
+    began = time.perf_counter()
+
+    for _ in range(repeats):
+        for call_args in calls:
+            start = time.perf_counter()
+            await func(*call_args)
+            timings.append(time.perf_counter() - start)
+
+    return summarize(timings, time.perf_counter() - began)
+
+class FakeChannel:
+    """Class to stand in for the text channel a command was sent in, keeping what gets sent instead of sending it
+
+    Stores...
+        Amount of messages sent
+        Last message sent, as a dict of its content, embed, file and view
+
+    """
+    def __init__(self):
+        self.sent = 0
+        self.last = None
+
+    async def send(self, content=None, embed=None, file=None, view=None):
+        self.sent += 1
+        self.last = {"content" : content, "embed" : embed, "file" : file, "view" : view}
+
+        # Page views wait for button presses until they time out, stop them right away
+        if view is not None:
+            view.stop()
+
+        return self
+
+class FakeMessage:
+    """Class to stand in for the discord message that issued a command
+
+    Stores...
+        Discord user that sent the message
+        Files attached to the message
+
+    """
+    def __init__(self, author):
+        self.author = author
+        self.attachments = []
+
+class FakeGuild:
+    """Class to stand in for the discord server a command was sent in
+
+    Stores...
+        Discord ID of the guild
+
+    """
+    def __init__(self, id):
+        self.id = id
+
+class FakeContext:
+    """Class to stand in for the context a bot command is called with
+
+    Stores...
+        Channel the command was sent in
+        Message that issued the command
+        Guild the command was sent in
+
+    """
+    def __init__(self, author, guild_id=BENCHMARK_GUILD):
+        self.channel = FakeChannel()
+        self.message = FakeMessage(author)
+        self.author = author
+        self.guild = FakeGuild(guild_id)
+
+# Function to print a table of benchmark results
+def print_results(size, results):
+    """Function to print the throughput and latency of every benchmarked call for one amount of locations
+
+    Args:
+        size      (int): Amount of locations benchmarked with
+        results  (dict): Name of the call -> summary of its timings
+    """
+    print("\n{} locations".format(size))
+    print("{:<28} {:>10} {:>12} {:>10} {:>10}".format("call", "calls", "calls/sec", "p50 (ms)", "p99 (ms)"))
+
+    for name, summary in results.items():
+        print("{:<28} {:>10} {:>12.1f} {:>10.3f} {:>10.3f}".format(name, summary["calls"], summary["throughput"], summary["p50_ms"], summary["p99_ms"]))
+
+# Function to run the Operator and command benchmark
+def bench_operator(sizes, repeats, backend="memory"):
+    """Function to time the Operator's most used functions and the bot commands that use them over growing amounts of locations
+
+    Commands are called directly (i.e. without discord) with a fake context that keeps what they send.
+
+    Args:
+        sizes    (list): Amounts of locations to benchmark with
+        repeats   (int): Amount of times every call is made
+        backend   (str): Storage backend to use, either 'memory', 'journal', 'sqlite' or 'postgres' (Default: 'memory')
+
+    Returns:
+        list: Returns a dict per size with the name of every benchmarked call -> summary of its timings
+    """
+    # Imported here since it pulls in discord and builds the bot's commands
+    import disc_mc_bot
+
+    runs = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            op = seed_operator(size, backend=backend, directory=directory)
+            disc_mc_bot.op = op
+
+            # Same made up names at every size, from the locations every size has
+            rand = random.Random(2)
+            first = op.storage.search_locations_page(BENCHMARK_GUILD, "", "all", None, False, sizes[0])[0]
+            names = [rand.choice(first)["name"] for _ in range(20)]
+            pairs = [(rand.choice(names), rand.choice(names)) for _ in range(20)]
+            tokens = [name[2:6] for name in names]
+            points = [(rand.randint(-30000, 30000), rand.randint(-30000, 30000)) for _ in range(20)]
+            page = op.search_locations_page(BENCHMARK_GUILD, "", "all")[0]
+
+            results = {}
+            results["get_location_data"] = time_calls(op.get_location_data, [(BENCHMARK_GUILD, name) for name in names], repeats)
+            results["search_locations"] = time_calls(op.search_locations, [(BENCHMARK_GUILD, token) for token in tokens], repeats)
+            results["search_locations_page"] = time_calls(op.search_locations_page, [(BENCHMARK_GUILD, token) for token in tokens], repeats)
+            results["location_list_embed"] = time_calls(op.location_list_embed, [(page,)], repeats * 20)
+            results["distance"] = time_calls(op.distance, [(BENCHMARK_GUILD,) + pair for pair in pairs], repeats)
+            results["navigation_locations"] = time_calls(op.navigation_locations, [(BENCHMARK_GUILD,) + pair for pair in pairs], repeats)
+            results["nearest_locations"] = time_calls(op.nearest_locations, [(BENCHMARK_GUILD,) + point for point in points], repeats)
+
+            # Bot commands, each with a fresh context
+            author = FakeUser("benchmark", 1)
+            commands = [
+                ("$get", disc_mc_bot.get_coords, [(name,) for name in names]),
+                ("$search", disc_mc_bot.search_coords, [(token,) for token in tokens]),
+                ("$list", disc_mc_bot.list_coords, [()]),
+                ("$distance", disc_mc_bot.distance, pairs),
+                ("$navigate", disc_mc_bot.navigate, pairs),
+                ("$nearest", disc_mc_bot.nearest_coords, points),
+                ("$compass", disc_mc_bot.compass_coords, points),
+            ]
+
+            async def run_commands():
+                for name, command, calls in commands:
+                    results[name] = await time_coroutines(lambda *call_args: command.callback(FakeContext(author), *call_args), calls, repeats)
+
+            asyncio.run(run_commands())
+
+            # Saves last, so the locations they add are not in any of the timings above
+            saves = [(BENCHMARK_GUILD, "benchmark save {}".format(i), author, x, y, 64, "N/A") for i, (x, y) in enumerate(points * repeats)]
+            results["add_location"] = time_calls(op.add_location, saves, 1)
+
+            print_results(size, results)
+            runs.append({"size" : size, "results" : results})
+
+            op.close()
+
+    return runs
+
+# Function to check that slow commands run side by side
+def bench_concurrency(repeats, delay=0.2):
+    """Function to time two $get commands awaited one after the other and then together, on a backend where every lookup takes 'delay' seconds
+
+    The lookups run on the Operator's worker threads, so two commands awaited together should take about one
+    delay rather than two. Each run starts with empty caches so both commands really wait on the backend.
+
+    Args:
+        repeats   (int): Amount of times both ways are timed
+        delay   (float): Amount of seconds every lookup takes (Default: 0.2)
+
+    Returns:
+        dict: Returns the delay, the median time of both ways, how much faster running them together was and whether they overlapped
+    """
+    # Imported here since it pulls in discord and builds the bot's commands
+    import disc_mc_bot
+
+    op = Operator(False, Config(), storage=SleepingBackend(delay))
+    disc_mc_bot.op = op
+
+    author = FakeUser("benchmark", 1)
+    for name in ["first", "second"]:
+        op.storage.add_location(op.create_location(BENCHMARK_GUILD, name, author, 0, 0, 64, "N/A"))
+
+    async def run():
+        sequential = []
+        together = []
+
+        for _ in range(repeats):
+            op.guild_invalidated(BENCHMARK_GUILD)
+            start = time.perf_counter()
+            await disc_mc_bot.get_coords.callback(FakeContext(author), "first")
+            await disc_mc_bot.get_coords.callback(FakeContext(author), "second")
+            sequential.append(time.perf_counter() - start)
+
+            op.guild_invalidated(BENCHMARK_GUILD)
+            start = time.perf_counter()
+            await asyncio.gather(disc_mc_bot.get_coords.callback(FakeContext(author), "first"), disc_mc_bot.get_coords.callback(FakeContext(author), "second"))
+            together.append(time.perf_counter() - start)
+
+        return statistics.median(sequential), statistics.median(together)
+
+    sequential, together = asyncio.run(run())
+    op.close()
+
+    results =   {
+                    "delay_s"       : delay,
+                    "sequential_s"  : sequential,
+                    "together_s"    : together,
+                    "speedup"       : sequential / together,
+                    # Well under two delays means the commands waited on the backend at the same time
+                    "overlapped"    : together < 1.5 * delay,
+                }
+
+    print("\nTwo $get commands, {:.0f} ms per lookup".format(delay * 1000))
+    print("one after the other: {:.0f} ms, together: {:.0f} ms ({})".format(sequential * 1000, together * 1000, "overlapped" if results["overlapped"] else "NOT overlapped"))
+
+    return results
+
+# Function to save the benchmark results
+def save_results(path, backend, repeats, results):
+    """Function to save the benchmark results as JSON, along with what they were measured on, so runs can be compared
+
+    Args:
+        path      (str): Path of the JSON file to write
+        backend   (str): Storage backend that was used
+        repeats   (int): Amount of times every call was made
+        results  (dict): Name of the suite -> its results
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    report =    {
+                    "timestamp"  : datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    "commit"     : commit,
+                    "python"     : platform.python_version(),
+                    "platform"   : platform.platform(),
+                    "backend"    : backend,
+                    "repeats"    : repeats,
+                    "suites"     : results,
+                }
+
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+
+    print("\nResults saved to {}".format(path))
+
+# Function to set up the argparser
+def setup_argparse():
+    """Function to set up the argparser for the command line arguments
+
+    Supported arguments:
+        --sizes: Amounts of locations to benchmark with
+        --repeats: Amount of times each call is made
+        --suites: Which benchmarks to run
+        --backend: Storage backend to benchmark the Operator and commands on
+        --output: Path of the JSON file to save the results in
+
+    Returns:
+        Returns arguments parser object that contains the parsed args
+    """
+    parser = argparse.ArgumentParser(description="Minecraft Discord Bot benchmarks")
+
+    parser.add_argument('--sizes', type=int, nargs="+", default=[1000, 10000, 100000], help="Amounts of locations to benchmark with")
+    parser.add_argument('--repeats', type=int, default=5, help="Amount of times each call is made")
+    parser.add_argument('--suites', nargs="+", choices=["search", "operator", "concurrency"], default=["search", "operator", "concurrency"], help="Benchmarks to run")
+    parser.add_argument('--backend', choices=["memory", "journal", "sqlite", "postgres"], default="memory", help="Storage backend for the operator benchmark (postgres uses DATABASE_URL and its own table)")
+    parser.add_argument('--output', metavar="PATH", default="benchmark-results.json", help="JSON file to save the results in")
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = setup_argparse()
+
+    results = {}
+
+    if "search" in args.suites:
+        results["search"] = bench_search(args.sizes, args.repeats)
+
+    if "operator" in args.suites:
+        results["operator"] = bench_operator(args.sizes, args.repeats, args.backend)
+
+    if "concurrency" in args.suites:
+        results["concurrency"] = bench_concurrency(args.repeats)
+
+    save_results(args.output, args.backend, args.repeats, results)
@@ -0,0 +1,327 @@
+import threading
+from collections import OrderedDict
+
+from listing import ListingIndex
+
+class LocationCache:
+    """Class to keep recently used location data in memory so reads do not need to go to the database
+
+    Stores...
+        Location data keyed by location name, in least recently used order (bounded by 'max_size')
+        Mapping of location IDs to the names they are cached under
+        The full list of locations once it has been read (only if it fits in 'max_size'), with their keys in listing order
+        Hit, miss and eviction counters
+
+    The Operator keeps the cache up to date on every add, edit and remove so it never has to expire entries. A name
+    is only cached while it is known to point to a single location, i.e. when it was read that way or when the full
+    list shows no other location uses it.
+
+    """
+    def __init__(self, max_size=1024):
+        self.max_size = max(1, max_size)
+
+        # Location name -> location data, least recently used first
+        self._entries = OrderedDict()
+        # Location ID -> location name, for the entries currently cached
+        self._ids = {}
+        # Location ID -> location data for every location, None until the full list was loaded
+        self._all = None
+        # (name, id) keys of the full list in listing order, None along with it
+        self._listing = None
+
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Function to store a single location
+    def _store(self, location):
+        """Function to store a location under its name, evicting the least recently used one if full
+
+        Args:
+            location (dict): Location data to store
+        """
+        name = location["name"]
+
+        if name in self._entries:
+            self._ids.pop(self._entries[name]["id"], None)
+
+        self._entries[name] = location
+        self._entries.move_to_end(name)
+        self._ids[location["id"]] = name
+
+        while len(self._entries) > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._ids.pop(evicted["id"], None)
+            self.evictions += 1
+
+    # Function to drop a single location
+    def _drop(self, id):
+        """Function to remove the location with the given ID from the name entries
+
+        Args:
+            id (str): ID of the location to drop
+
+        Returns:
+            dict or None: Returns the dropped location data, None if it was not cached
+        """
+        name = self._ids.pop(id, None)
+
+        if name is None:
+            return None
+
+        return self._entries.pop(name, None)
+
+    # Function to look up a location by name
+    def get(self, name):
+        """Function to get a cached location by its name
+
+        Args:
+            name (str): Name of the location
+
+        Returns:
+            dict or None: Returns the location data, None if the location is not cached (i.e. a miss)
+        """
+        with self._lock:
+            location = self._entries.get(name)
+
+            if location is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(name)
+            self.hits += 1
+
+            return location
+
+    # Function to add a location read from the database
+    def put(self, location):
+        """Function to cache a location that was read from the database
+
+        Args:
+            location (dict): Location data to cache
+        """
+        with self._lock:
+            self._store(location)
+
+    # Function to get every location
+    def get_all(self):
+        """Function to get the full list of locations
+
+        Returns:
+            list or None: Returns a list of all location data, None if the full list is not cached (i.e. a miss)
+        """
+        with self._lock:
+            if self._all is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+            return list(self._all.values())
+
+    # Function to get a page of every location
+    def page(self, cursor, backwards, page_size):
+        """Function to get one page of the full list of locations, in (name, id) order
+
+        Args:
+            cursor     (tuple): (name, id) key to start the page after, None for the first page
+            backwards   (bool): Flag to get the page before the cursor instead of after it
+            page_size    (int): Amount of locations on the page
+
+        Returns:
+            tuple or None: Returns the page's list of location data and whether more locations follow in that direction, None if the full list is not cached (i.e. a miss)
+        """
+        with self._lock:
+            if self._all is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            keys, more = self._listing.page(cursor, backwards, page_size)
+
+            return [self._all[id] for _, id in keys], more
+
+    # Function to forget the full list
+    def _drop_all(self):
+        """Function to drop the full list of locations and its keys, i.e. once it no longer fits or can not be kept up to date"""
+        self._all = None
+        self._listing = None
+
+    # Function to cache the full list of locations
+    def put_all(self, locations):
+        """Function to cache the full list of locations read from the database
+
+        Lists bigger than the cache are not kept, only the first 'max_size' locations are cached by name.
+        Names shared by more than one location are not cached by name since they do not point to a single location.
+
+        Args:
+            locations (list): List of every location data
+        """
+        # Count how many locations use each name
+        name_counts = {}
+        for location in locations:
+            name_counts[location["name"]] = name_counts.get(location["name"], 0) + 1
+
+        with self._lock:
+            if len(locations) <= self.max_size:
+                self._all = {location["id"] : location for location in locations}
+                self._listing = ListingIndex(locations)
+
+            for location in locations[:self.max_size]:
+                if name_counts[location["name"]] == 1:
+                    self._store(location)
+
+    # Function to check that a name points to a single location
+    def _name_is_unique(self, location):
+        """Function to check that no other location uses the name of the given one, which can only be known with the full list cached
+
+        Args:
+            location (dict): Location data, already in the full list
+
+        Returns:
+            bool: Returns whether the name is known to point to this location only
+        """
+        if self._all is None:
+            return False
+
+        return all(id == location["id"] for id in self._listing.ids_named(location["name"]))
+
+    # Function to write-through a newly added location
+    def add(self, location):
+        """Function to add a location that was just saved
+
+        Any other location cached under the same name is dropped, since the name may no longer point to a
+        single location. The new location is only cached by name if the full list shows its name is unique.
+
+        Args:
+            location (dict): Location data that was saved
+        """
+        with self._lock:
+            name = location["name"]
+
+            if self._all is not None:
+                old = self._all.get(location["id"])
+                if old is not None:
+                    self._listing.remove(old)
+
+                self._all[location["id"]] = location
+                self._listing.add([location])
+
+                if len(self._all) > self.max_size:
+                    self._drop_all()
+
+            if name in self._entries:
+                self._drop(self._entries[name]["id"])
+
+            if self._name_is_unique(location):
+                self._store(location)
+
+    # Function to write-through an edited location
+    def update(self, id, edit_func, field_to_edit=None):
+        """Function to replace a cached location with its edited version
+
+        Args:
+            id             (str): ID of the location that was edited
+            edit_func (callable): Function that takes the old location data and returns the edited location data
+            field_to_edit  (str): Name of the field that was edited, None if unknown (Default: None)
+
+        Returns:
+            bool: Returns whether the edit could be applied, the location is dropped from the cache if not
+        """
+        with self._lock:
+            old = self._drop(id)
+            was_cached = old is not None
+
+            if old is None and self._all is not None:
+                old = self._all.get(id)
+
+            if old is None:
+                # Not cached, but it may have been renamed to a name that is cached (which then no longer points to a single location)
+                if field_to_edit in [None, "name"]:
+                    try:
+                        name = edit_func({"id" : id, "name" : None, "author" : {"name" : None, "id" : None}, "coords" : {"x" : 0, "y" : 0, "z" : 0}, "desc" : None, "portal" : False})["name"]
+                    except (ValueError, TypeError):
+                        name = None
+
+                    if name in self._entries:
+                        self._drop(self._entries[name]["id"])
+
+                return True
+
+            try:
+                new = edit_func(old)
+            except (ValueError, TypeError):
+                self._drop_all()
+                return False
+
+            if self._all is not None:
+                self._listing.remove(self._all.get(id, old))
+                self._all[id] = new
+                self._listing.add([new])
+
+            if new["name"] in self._entries:
+                self._drop(self._entries[new["name"]]["id"])
+
+            # A name that pointed to this location alone still does if it did not change
+            if (was_cached and new["name"] == old["name"]) or self._name_is_unique(new):
+                self._store(new)
+
+            return True
+
+    # Function to write-through a removed location
+    def remove(self, id):
+        """Function to remove a location that was just deleted
+
+        Args:
+            id (str): ID of the location that was removed
+        """
+        with self._lock:
+            self._drop(id)
+
+            if self._all is not None:
+                old = self._all.pop(id, None)
+                if old is not None:
+                    self._listing.remove(old)
+
+    # Function to get everything that is cached
+    def export(self):
+        """Function to get every cached location, i.e. to save them for the next run
+
+        Returns:
+            tuple: Returns whether the full list of locations is cached and the list of cached location data (every location if it is)
+        """
+        with self._lock:
+            if self._all is not None:
+                return True, list(self._all.values())
+
+            return False, list(self._entries.values())
+
+    # Function to empty the cache
+    def clear(self):
+        """Function to drop every cached location"""
+        with self._lock:
+            self._entries.clear()
+            self._ids.clear()
+            self._drop_all()
+
+    # Function to get the current state of the cache
+    def stats(self):
+        """Function to get a snapshot of the cache's size and counters
+
+        Returns:
+            dict: Returns the cache size, whether the full list is cached and the hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return  {
+                        "size"       : len(self._entries),
+                        "max_size"   : self.max_size,
+                        "all_cached" : self._all is not None,
+                        "hits"       : self.hits,
+                        "misses"     : self.misses,
+                        "evictions"  : self.evictions,
+                        "hit_ratio"  : self.hits / lookups if lookups else 0.0,
+                    }
@@ -0,0 +1,34 @@
+import numpy as np
+
+# Cardinal directions, every 45 degrees counter-clockwise starting from East
+CARDINAL_DIRECTIONS = ["E", "NE", "N", "NW", "W", "SW", "S", "SE"]
+
+# Function to get the bearings from one point to many points
+def bearings(x, y, coords):
+    """Function to calculate the distance, angle and cardinal direction from one point to every given point in one pass
+
+    Angles follow the rest of the bot: East is 0°, North 90°, West 180° and South 270°, where North is towards +y.
+
+    Args:
+        x             (int): X coordinate of the point to start from
+        y             (int): Y coordinate of the point to start from (NOTE: This is the z coordinate in minecraft)
+        coords  (array-like): (n, 2) (x, y) coordinates of the points to go to
+
+    Returns:
+        tuple: Returns the distances (float array), the angles in whole degrees (int array) and the cardinal directions (list of str).
+        Points on the starting coordinates have no direction, their direction is None.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+
+    dx = coords[:, 0] - x
+    dy = coords[:, 1] - y
+
+    distances = np.hypot(dx, dy)
+    angles = np.degrees(np.arctan2(dy, dx)) % 360
+
+    # Closest cardinal direction, i.e. within 22.5° of it
+    sectors = np.rint(angles / 45).astype(int) % 8
+
+    directions = [CARDINAL_DIRECTIONS[sector] if distance > 0 else None for sector, distance in zip(sectors.tolist(), distances.tolist())]
+
+    return distances, np.floor(angles).astype(int), directions
@@ -7,10 +7,44 @@ class Config:
         Discord Bot Token
         Postgres SQLite Token
         Discord ID of admin account (i.e. account that can issue all types of commands)
+        Minimum and maximum amount of pooled database connections
+        SSL mode of the database connections (i.e. 'disable' for a local database)
+        Amount of seconds to wait for a database connection to open before giving up
+        URLs of the read replicas of the database (optional, comma separated)
+        Amount of seconds a guild keeps reading from the primary database after it was written to
+        Maximum amount of locations kept in the in-memory cache
+        Path of the SQLite database file to use instead of PostgreSQL (optional)
+        Path the journal files are named after, to keep the locations in memory and journal them to local disk instead of using a database (optional)
+        Amount of seconds between two fsyncs of the journal (0 to fsync every write) and size (in bytes) past which it is compacted
+        Local port to serve the Prometheus metrics on (optional)
+        ID of the guild that gets the locations saved before locations belonged to guilds (optional)
+        Total amount of shards (optional, discord's recommended amount if not set)
+        Amount of worker processes the shards are split between
+        Amount of worker processes drawing the maps
+        Path of the file the cached locations are saved to for the next run to start from (optional)
+        Amount of seconds between two saves of that file
 
     Extracts all tokens from the OS' environment variables
 
     """
     DISCORD_TOKEN = os.environ.get('DISCORD_TOKEN')
     DATABASE_URL = os.environ.get('DATABASE_URL')
-    DISCORD_USER_ID = os.environ.get('DISCORD_USER_ID')
\ No newline at end of file
+    DISCORD_USER_ID = os.environ.get('DISCORD_USER_ID')
+    DATABASE_POOL_MIN = int(os.environ.get('DATABASE_POOL_MIN', 1))
+    DATABASE_POOL_MAX = int(os.environ.get('DATABASE_POOL_MAX', 5))
+    DATABASE_SSLMODE = os.environ.get('DATABASE_SSLMODE', 'require')
+    DATABASE_CONNECT_TIMEOUT = int(os.environ.get('DATABASE_CONNECT_TIMEOUT', 10))
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URL', '').split(',') if url.strip()]
+    DATABASE_REPLICA_STICKY_SECONDS = float(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5))
+    LOCATION_CACHE_SIZE = int(os.environ.get('LOCATION_CACHE_SIZE', 1024))
+    SQLITE_PATH = os.environ.get('SQLITE_PATH')
+    JOURNAL_PATH = os.environ.get('JOURNAL_PATH')
+    JOURNAL_FSYNC_INTERVAL = float(os.environ.get('JOURNAL_FSYNC_INTERVAL', 0.05))
+    JOURNAL_COMPACT_BYTES = int(os.environ.get('JOURNAL_COMPACT_BYTES', 16 * 1024 * 1024))
+    METRICS_PORT = int(os.environ['METRICS_PORT']) if os.environ.get('METRICS_PORT') else None
+    LEGACY_GUILD_ID = os.environ.get('LEGACY_GUILD_ID')
+    SHARD_COUNT = int(os.environ['SHARD_COUNT']) if os.environ.get('SHARD_COUNT') else None
+    SHARD_WORKERS = int(os.environ.get('SHARD_WORKERS', 1))
+    MAP_RENDER_WORKERS = int(os.environ.get('MAP_RENDER_WORKERS', 2))
+    SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')
+    SNAPSHOT_INTERVAL = float(os.environ.get('SNAPSHOT_INTERVAL', 300))
@@ -0,0 +1,315 @@
+import contextlib
+import threading
+import time
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Class for psycopg2 connections that remember which named statements were prepared on them
+
+    Pass it as the connection_factory when connecting. A statement is prepared (parsed and planned by
+    PostgreSQL) the first time it is used on a connection, every later use only executes it.
+
+    Stores...
+        Names of the statements prepared on this connection
+
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.prepared = set()
+
+    # Function to run a named prepared statement
+    def execute_prepared(self, cur, name, sql, params=()):
+        """Function to execute a named statement with the given parameters, preparing it first if this connection has not yet
+
+        Args:
+            cur   (cursor): Cursor of this connection to execute the statement with
+            name     (str): Name of the statement
+            sql      (str): SQL of the statement, with $1, $2, ... placeholders for the parameters
+            params (tuple): Values of the parameters
+        """
+        if name not in self.prepared:
+            cur.execute("PREPARE {} AS {}".format(name, sql))
+            self.prepared.add(name)
+
+        if len(params) > 0:
+            statement = "EXECUTE {} ({})".format(name, ", ".join(["%s"] * len(params)))
+        else:
+            statement, params = "EXECUTE {}".format(name), None
+
+        try:
+            cur.execute(statement, params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # The statement is gone from the session, prepare it again next time
+            self.prepared.discard(name)
+            raise
+
+class ConnectionPool:
+    """Class to manage a pool of reusable connections to the PostgreSQL database
+
+    Keeps at least 'min_size' connections open and never opens more than 'max_size' at once.
+    Connections that sat idle for longer than the health check interval are pinged before being handed out,
+    and broken connections are thrown away and replaced by fresh ones.
+
+    Stores...
+        Idle connections waiting to be checked out
+        Number of connections currently open (idle + checked out)
+        Counters describing how the pool has been used (see stats())
+
+    """
+    def __init__(self, dsn, min_size=1, max_size=5, timeout=10.0, health_check_interval=30.0, prewarm=True, **connect_kwargs):
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+
+        # List of (connection, time it was released) tuples, most recently released last
+        self._idle = []
+        # Number of connections currently open, including the ones being opened
+        self._size = 0
+        self._condition = threading.Condition()
+
+        # Counters for how the pool has been used
+        self._counters = {
+                            "created"        : 0,
+                            "closed"         : 0,
+                            "checkouts"      : 0,
+                            "waits"          : 0,
+                            "timeouts"       : 0,
+                            "health_checks"  : 0,
+                            "reconnects"     : 0,
+                        }
+
+        # Open the minimum amount of connections up front, unless whoever creates the pool can not wait on the database
+        if prewarm:
+            self.prewarm()
+
+    # Function to open the minimum amount of connections
+    def prewarm(self):
+        """Function to open connections until 'min_size' of them are open, a database that is down should not stop the bot from starting"""
+        try:
+            while True:
+                with self._condition:
+                    if self._size >= self.min_size:
+                        return
+                    # Reserve the slot now, the connection is opened outside of the lock
+                    self._size += 1
+
+                try:
+                    con = self._connect()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+
+                with self._condition:
+                    self._idle.append((con, time.monotonic()))
+                    self._condition.notify()
+        except psycopg2.Error as e:
+            print("WARN - Unable to pre-open database connections due to: {}".format(e))
+
+    # Function to bump one of the usage counters
+    def _count(self, counter):
+        """Function to increment one of the pool's usage counters
+
+        Args:
+            counter (str): Name of the counter to increment
+        """
+        with self._condition:
+            self._counters[counter] += 1
+
+    # Function to open a brand new connection to the database
+    def _connect(self):
+        """Function to open a new connection to the database and count it
+
+        Returns:
+            connection: Returns a new psycopg2 connection
+        """
+        con = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        self._count("created")
+        return con
+
+    # Function to close a connection without caring if it was already dead
+    def _discard(self, con):
+        """Function to close a connection that is leaving the pool and free up its slot
+
+        Args:
+            con (connection): Connection to close
+        """
+        try:
+            con.close()
+        except Exception:
+            pass
+
+        with self._condition:
+            self._size -= 1
+            self._counters["closed"] += 1
+            self._condition.notify()
+
+    # Function to check if a connection is still usable
+    def _is_healthy(self, con, idle_since):
+        """Function to verify that a connection taken from the idle list can still be used
+
+        Connections that were used recently are trusted, older ones are pinged with a 'SELECT 1'.
+
+        Args:
+            con       (connection): Connection to verify
+            idle_since     (float): Monotonic time at which the connection was released to the pool
+
+        Returns:
+            bool: Returns whether the connection is usable
+        """
+        if con.closed:
+            return False
+
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+
+        self._count("health_checks")
+
+        try:
+            cur = con.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            con.rollback()
+        except psycopg2.Error:
+            return False
+
+        return True
+
+    # Function to check out a connection from the pool
+    def get_connection(self):
+        """Function to check out a connection from the pool, waiting for one to free up if the pool is full
+
+        Returns:
+            connection: Returns a healthy psycopg2 connection that must be given back with release()
+
+        Raises:
+            PoolError: If no connection became available before the timeout
+        """
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            con = None
+            idle_since = None
+
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise psycopg2.pool.PoolError("Timed out waiting for a database connection ({} open)".format(self._size))
+                    self._counters["waits"] += 1
+                    self._condition.wait(remaining)
+
+                if self._idle:
+                    con, idle_since = self._idle.pop()
+                else:
+                    # Reserve the slot now, the connection is opened outside of the lock
+                    self._size += 1
+
+            # Fresh connection for the reserved slot
+            if con is None:
+                try:
+                    con = self._connect()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                break
+
+            # Reused connection, make sure it did not die while idle
+            if self._is_healthy(con, idle_since):
+                break
+
+            print("WARN - Dropping broken database connection and reconnecting...")
+            self._count("reconnects")
+            self._discard(con)
+
+        self._count("checkouts")
+        return con
+
+    # Function to give a connection back to the pool
+    def release(self, con, broken=False):
+        """Function to return a checked out connection to the pool
+
+        Any transaction left open is rolled back. Broken connections are closed instead of being reused.
+
+        Args:
+            con   (connection): Connection that was returned by get_connection()
+            broken      (bool): Flag to force the connection to be closed (Default: False)
+        """
+        if not broken and not con.closed:
+            try:
+                if con.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    con.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        if broken or con.closed:
+            self._discard(con)
+            return
+
+        with self._condition:
+            self._idle.append((con, time.monotonic()))
+            self._condition.notify()
+
+    # Context manager to check out a connection for the duration of a with block
+    @contextlib.contextmanager
+    def connection(self):
+        """Function to check out a connection for the duration of a 'with' block
+
+        The connection goes back to the pool however the block exits, including a generator holding it being
+        closed early (i.e. GeneratorExit). If the block raised a connection-level error (i.e. the server went away)
+        the connection is discarded so that the next checkout reconnects.
+
+        Returns:
+            connection: Yields a psycopg2 connection
+        """
+        con = self.get_connection()
+        broken = False
+
+        try:
+            yield con
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(con, broken=broken)
+
+    # Function to close every idle connection
+    def close_all(self):
+        """Function to close all idle connections, used when shutting down"""
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+
+        for con, _ in idle:
+            self._discard(con)
+
+    # Function to get the current state of the pool
+    def stats(self):
+        """Function to get a snapshot of the pool's state and usage counters
+
+        Returns:
+            dict: Returns the pool size limits, current open/idle/in use counts and all usage counters
+        """
+        with self._condition:
+            stats = {
+                        "min_size" : self.min_size,
+                        "max_size" : self.max_size,
+                        "open"     : self._size,
+                        "idle"     : len(self._idle),
+                        "in_use"   : self._size - len(self._idle),
+                    }
+
+        stats.update(self._counters)
+
+        return stats
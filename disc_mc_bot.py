@@ -6,18 +6,32 @@ import json
 import os
 import argparse
 import uuid
+import datetime
+import io
+import time
+import multiprocessing
 
 # Import config class for tokens
 from config import Config
 from operations import Operator
+from views import LocationPageView
+from metrics import start_metrics_server
+from sharding import InvalidationBus, recommended_shard_count, shard_ranges
 
 # Create new config object that stores all Tokens
 conf = Config()
 
+# Operator instance used by every command, created in main() (or handed in by the benchmarks)
+op = None
+
 # ==================== BOT RELATED FUNCTIONS ========================================
 
-# Setting command character for issuing commands
-client = commands.Bot(command_prefix = "$")
+# Commands are read from the content of the messages, which discord only sends when asked for
+intents = discord.Intents.default()
+intents.message_content = True
+
+# Setting command character for issuing commands, the bot runs every shard given to it (all of them by default)
+client = commands.AutoShardedBot(command_prefix = "$", intents = intents)
 # Remove default help command and replace by custom one..
 client.remove_command('help')
 
@@ -33,6 +47,38 @@ async def on_ready():
     await client.change_presence(status=discord.Status.online, activity=discord.Game('$help'))
     print("Bot is ready")
 
+    # Print the state of the storage (i.e. the database connection pool)
+    print("Storage: {}".format(op.storage.stats()))
+
+# Function to get the ID of the guild a command was sent in
+def get_guild_id(ctx):
+    """Function to get the ID of the guild a command was sent in, which the locations it works on belong to
+
+    Commands sent in direct messages work on the user's own private set of locations.
+
+    Returns:
+        str: Returns the guild ID
+    """
+    if ctx.guild is None:
+        return "user-{}".format(ctx.author.id)
+
+    return str(ctx.guild.id)
+
+# Hook run before every command, to time it
+@client.before_invoke
+async def start_command_timer(ctx):
+    """Function to remember when a command started, so its latency can be recorded once it ends"""
+    ctx.command_started = time.perf_counter()
+
+# Hook run after every command, even failed ones
+@client.after_invoke
+async def record_command_timer(ctx):
+    """Function to record how long a command took and whether it failed"""
+    started = getattr(ctx, "command_started", None)
+
+    if started is not None:
+        op.telemetry.observe_command(ctx.command.name, time.perf_counter() - started, error=ctx.command_failed)
+
 # Command to delete a specified amount of messages
 @client.command()
 async def purge(ctx, num=1):
@@ -68,7 +114,7 @@ async def save_coords(ctx, name, x, z, y, desc="N/A"):
         return
 
     # Verify that another location was not already registered under same name
-    searched = op.get_location_data(name)
+    searched = await op.run_async(op.get_location_data, get_guild_id(ctx), name)
 
     # If no data was found
     if searched != None:
@@ -78,12 +124,91 @@ async def save_coords(ctx, name, x, z, y, desc="N/A"):
     # Save instance of the user who sent the message
     user = ctx.message.author
 
-    op.add_location(name, user, x, y, z, desc)
+    await op.run_async(op.add_location, get_guild_id(ctx), name, user, x, y, z, desc)
 
     print("OK - Successfully entered in location data.")
     await ctx.channel.send("New location saved under name '**{}**' located at (**{}**, **{}**)!".format(name, x, y))
     return
 
+# Command to add a batch of locations from an attached file
+@client.command(aliases = ["import", "imp"])
+async def import_coords(ctx):
+    """Bot command to save every location listed in a CSV or JSON file attached to the message
+
+    Returns:
+        Nothing, but does send an embedded object as a message to the text channel the command was sent to.
+    """
+    # Make sure a file was attached
+    if len(ctx.message.attachments) == 0:
+        await ctx.channel.send("Please attach a .csv or .json file of locations to import. CSV files need the columns: name, x, y, z, desc")
+        return
+
+    attachment = ctx.message.attachments[0]
+
+    # Keep the files to a reasonable size
+    if attachment.size > 8 * 1024 * 1024:
+        await ctx.channel.send("The attached file is too large, please keep imports under 8MB.")
+        return
+
+    data = await attachment.read()
+
+    # Read the locations out of the file
+    try:
+        rows = await op.run_async(op.parse_location_file, attachment.filename, data)
+    except ValueError as e:
+        await ctx.channel.send("Unable to read the attached file: {}".format(e))
+        return
+
+    # Save instance of the user who sent the message
+    user = ctx.message.author
+
+    imported, errors = await op.run_async(op.import_locations, get_guild_id(ctx), user, rows)
+
+    # Ensure saving went smooth
+    if imported is False:
+        await ctx.channel.send("Unable to import the locations, nothing was saved. Please try again later.")
+        return
+
+    print("OK - Imported {} locations, skipped {} rows.".format(imported, len(errors)))
+    await ctx.channel.send(embed=op.create_import_embed(imported, errors))
+    return
+
+# Command to back up every location into a file
+@client.command(aliases = ["export", "exp"])
+async def export_coords(ctx, file_format="csv"):
+    """Bot command to send every saved location as a compressed CSV or JSON file
+
+    Args:
+        file_format (str): (Optional) Format of the file, either 'csv' or 'json' (Default: 'csv')
+
+    Returns:
+        Nothing, but does send back a file attachment to the text channel the command was sent to.
+    """
+    file_format = file_format.lower()
+
+    if file_format not in ["csv", "json"]:
+        await ctx.channel.send("'{}' is not a supported format, please choose either csv or json.".format(file_format))
+        return
+
+    # Write the locations to a temporary file
+    path, count = await op.run_async(op.export_locations, get_guild_id(ctx), file_format)
+
+    if path is False:
+        await ctx.channel.send("Unable to export the locations, please try again later.")
+        return
+
+    try:
+        # Make sure the file can be uploaded
+        upload_limit = ctx.guild.filesize_limit if ctx.guild is not None else 8 * 1024 * 1024
+        if os.path.getsize(path) > upload_limit:
+            await ctx.channel.send("The export is too large to upload to this channel.")
+            return
+
+        filename = "locations-{}.{}.gz".format(datetime.date.today().isoformat(), file_format)
+        await ctx.channel.send("Exported {} location(s).".format(count), file=discord.File(path, filename=filename))
+    finally:
+        os.remove(path)
+
 # Command to add new location
 @client.command(aliases = ["get", "g"])
 async def get_coords(ctx, name):
@@ -96,7 +221,7 @@ async def get_coords(ctx, name):
         Nothing, but does send an embedded object as a message to the text channel the command was sent to.
     """
     # Search for the location data
-    searched = op.get_location_data(name)
+    searched = await op.run_async(op.get_location_data, get_guild_id(ctx), name)
     
     # If no data was found
     if searched == None:
@@ -124,7 +249,7 @@ async def remove_coords(ctx, name):
         Nothing, but does send back a message to the text channel the command was sent to.
     """
     # Get the location that was desired to be removed
-    searched = op.get_location_data(name)
+    searched = await op.run_async(op.get_location_data, get_guild_id(ctx), name)
     
     # If no data was found, tell user
     if searched == None:
@@ -149,7 +274,7 @@ async def remove_coords(ctx, name):
         return
 
     # Means entry exists, user is the correct author, therefore remove it based on ID of location
-    status = op.remove_location_data(searched['id'])
+    status = await op.run_async(op.remove_location_data, get_guild_id(ctx), searched['id'])
 
     if status is True:
         await ctx.channel.send("Successfully removed location. Goodbye '{}'!".format(name))
@@ -162,14 +287,14 @@ async def edit_coords(ctx, name, field_to_edit, edit):
 
     Args:
         name          (str): Name of the location to remove
-        field_to_edit (str): Name of the field to edit, can only be one of the following 'name', 'x', 'y', 'z', 'desc'
+        field_to_edit (str): Name of the field to edit, can only be one of the following 'name', 'x', 'y', 'z', 'desc', 'portal'
         edit          (str): The new value to edit the field with
     
     Returns:
         Nothing, but does send back a message to the text channel the command was sent to.
     """
     # Get the location that was desired to be removed
-    searched = op.get_location_data(name)
+    searched = await op.run_async(op.get_location_data, get_guild_id(ctx), name)
     
     # If no data was found, tell user
     if searched == None:
@@ -181,8 +306,8 @@ async def edit_coords(ctx, name, field_to_edit, edit):
         await ctx.channel.send("Multiple locations found under the name '{}'. Please be specific.".format(name))
         return
 
-    if field_to_edit not in ['name', 'x', 'y', 'z', 'desc']:
-        await ctx.channel.send("'{}' is not a valid field to edit, please choose one of these fields: name, x, y, z, desc".format(field_to_edit))
+    if field_to_edit not in ['name', 'x', 'y', 'z', 'desc', 'portal']:
+        await ctx.channel.send("'{}' is not a valid field to edit, please choose one of these fields: name, x, y, z, desc, portal".format(field_to_edit))
         return
 
     # Save instance of the user who sent the message
@@ -196,7 +321,7 @@ async def edit_coords(ctx, name, field_to_edit, edit):
         return
 
     # Means entry exists, user is the correct author, therefore remove it based on ID of location
-    status = op.edit_location_data(searched['id'], field_to_edit, edit)
+    status = await op.run_async(op.edit_location_data, get_guild_id(ctx), searched['id'], field_to_edit, edit)
 
     if status is True:
         await ctx.channel.send("Successfully edited location '{}'!".format(name))
@@ -210,7 +335,7 @@ async def list_coords(ctx):
     Returns:
         Nothing, but does send an embedded object as a message to the text channel the command was sent to.
     """
-    await ctx.channel.send(embed=op.location_list_embed())
+    await send_location_pages(ctx, "", "all")
     return
 
 # Command to list locations based on search values
@@ -225,18 +350,41 @@ async def search_coords(ctx, search_token, query="name"):
     Returns:
         Nothing, but does send an embedded object as a message to the text channel the command was sent to.
     """
-    # Perform search of locations
-    found_locations = op.search_locations(search_token, query=query)
-
-    # Check if search was successful
-    if found_locations == False:
+    # Check if the query is supported
+    if query not in op.query_types:
         await ctx.channel.send("The query that you provided: {}, is unsupported. Supported queries are {}".format(query, ",".join(op.query_types)))
         return
 
     # Send back list of locations that were found via embeds
-    await ctx.channel.send(embed=op.location_list_embed(found_locations, search_token=search_token, query=query))
+    await send_location_pages(ctx, search_token, query)
     return
 
+# Function to send a list of locations one page at a time
+async def send_location_pages(ctx, search_token, query):
+    """Function to send the first page of a list of locations, with buttons to go through the other pages
+
+    Args:
+        search_token (str): What is being searched
+        query        (str): How it is searching, i.e. by name, by author or 'all' locations
+
+    Returns:
+        Nothing, but does send an embedded object as a message to the text channel the command was sent to.
+    """
+    view = LocationPageView(op, get_guild_id(ctx), search_token, query)
+
+    # Fetch the first page
+    if not await view.load():
+        await ctx.channel.send("Unable to retrieve the locations, please try again later.")
+        return
+
+    # Everything fit on one page, no need for buttons
+    if not view.has_next:
+        view.stop()
+        await ctx.channel.send(embed=view.embed())
+        return
+
+    view.message = await ctx.channel.send(embed=view.embed(), view=view)
+
 # Command to compute the distance between two location points and return other intresting data
 @client.command(aliases = ["dist", "d"])
 async def distance(ctx, nameA, nameB):
@@ -250,11 +398,12 @@ async def distance(ctx, nameA, nameB):
         Nothing, but does send an embedded object as a message to the text channel the command was sent to.
     """
     # Calculate the distance
-    status, response = op.distance(nameA, nameB)
+    status, response = await op.run_async(op.distance, get_guild_id(ctx), nameA, nameB)
 
     # Ensure calculation went smooth
     if status == False:
         await ctx.channel.send("Unable to calculate distance between the two locations.\nDue to: {}".format(response))
+        return
 
     distance_embed = op.create_distance_embed(nameA, nameB, response)
 
@@ -273,17 +422,15 @@ async def navigate(ctx, fromLocation, toLocation):
     Returns:
         Nothing, but does send an embedded object as a message to the text channel the command was sent to.
     """
-    # Calculate the distance
-    status, direction, angle = op.navigation_locations(fromLocation, toLocation)
+    # Calculate the distance, also grabs both location points data (i.e. name, and other metadata)
+    status, direction, angle, points = await op.run_async(op.navigation_locations, get_guild_id(ctx), fromLocation, toLocation)
 
     # Ensure calculation went smooth
     if status == False:
         await ctx.channel.send("Unable to calculate directions between the two locations.\nDue to: {}".format(direction))
         return
 
-    # Grab both location points data (i.e. name, and other metadata)
-    pointA = op.get_location_data(fromLocation)
-    pointB = op.get_location_data(toLocation)
+    pointA, pointB = points
 
     # Create embed to display navigation data
     nav_embed = op.create_navigation_embed(pointA, pointB, direction, angle)
@@ -318,15 +465,15 @@ async def navigate_coords(ctx, x, y, toLocation):
                         "coords" : { "x" : int(x), "y" : int(y) }
                 }
 
-    # Calculate the distance
-    status, direction, angle = op.navigation_locations_coords(pointA, toLocation)
+    # Calculate the distance, also grabs the to location point data (i.e. name, and other metadata)
+    status, direction, angle, points = await op.run_async(op.navigation_locations_coords, get_guild_id(ctx), pointA, toLocation)
 
     # Ensure calculation went smooth
     if status == False:
-        await ctx.channel.send("Unable to calculate directions between the two locations.".format(direction))
+        await ctx.channel.send("Unable to calculate directions between the two locations.\nDue to: {}".format(direction))
+        return
 
-    # Grab to location point data (i.e. name, and other metadata)
-    pointB = op.get_location_data(toLocation)
+    pointB = points[1]
 
     # Create embed to display navigation data
     nav_embed = op.create_navigation_embed(pointA, pointB, direction, angle)
@@ -334,6 +481,218 @@ async def navigate_coords(ctx, x, y, toLocation):
     # Send back the embed representation for navigation
     await ctx.channel.send(embed=nav_embed)
 
+# Command to find the saved locations closest to a set of coordinates
+@client.command(aliases = ["nearest", "near", "ne"])
+async def nearest_coords(ctx, x, y, k=5):
+    """Bot command to list the saved locations closest to the given coordinates
+
+    Args:
+        x (int): Int of the x coordinate to search around
+        y (int): Int of the y coordinate to search around (NOTE: This is actually the z coordinate in minecraft)
+        k (int): (Optional) Amount of locations to list, at most 25 (Default: 5)
+
+    Returns:
+        Nothing, but does send an embedded object as a message to the text channel the command was sent to.
+    """
+    # Check entered coords and amount
+    valid = op.verify_location_data("null", x, y, k, "N/A")
+
+    # Ensure entered arguments are valid
+    if valid == False or not 1 <= int(k) <= 25:
+        await ctx.channel.send("The provided coordinates or amount are not valid, please enter valid coordinates and an amount between 1 and 25...")
+        return
+
+    # Find the closest locations
+    nearest = await op.run_async(op.nearest_locations, get_guild_id(ctx), x, y, k)
+
+    # Ensure search went smooth
+    if nearest == False:
+        await ctx.channel.send("Unable to retrieve locations to search through, please try again later.")
+        return
+
+    # Send back the embed representation for the nearest locations
+    await ctx.channel.send(embed=op.create_nearest_embed(x, y, nearest))
+
+# Command to get the directions from a set of coordinates to every saved location
+@client.command(aliases = ["compass", "cp"])
+async def compass_coords(ctx, x, y, k=10):
+    """Bot command to list the direction and distance from the given coordinates to the saved locations, closest first
+
+    Args:
+        x (int): Int of the x coordinate to start from
+        y (int): Int of the y coordinate to start from (NOTE: This is actually the z coordinate in minecraft)
+        k (int): (Optional) Amount of locations to list, at most 25 (Default: 10)
+
+    Returns:
+        Nothing, but does send an embedded object as a message to the text channel the command was sent to.
+    """
+    # Check entered coords and amount
+    valid = op.verify_location_data("null", x, y, k, "N/A")
+
+    # Ensure entered arguments are valid
+    if valid == False or not 1 <= int(k) <= 25:
+        await ctx.channel.send("The provided coordinates or amount are not valid, please enter valid coordinates and an amount between 1 and 25...")
+        return
+
+    # Get the directions to every location
+    compass = await op.run_async(op.compass_locations, get_guild_id(ctx), x, y, k)
+
+    # Ensure calculation went smooth
+    if compass == False:
+        await ctx.channel.send("Unable to retrieve locations to get directions to, please try again later.")
+        return
+
+    # Send back the embed representation for the directions
+    await ctx.channel.send(embed=op.create_compass_embed(x, y, compass))
+
+# Command to draw a map of the locations around a set of coordinates
+@client.command(aliases = ["map", "mp"])
+async def map_coords(ctx, x=0, y=0, radius=None):
+    """Bot command to draw a map of the saved locations around the given coordinates
+
+    Args:
+        x      (int): (Optional) Int of the x coordinate of the centre of the map (Default: 0)
+        y      (int): (Optional) Int of the y coordinate of the centre of the map (NOTE: This is actually the z coordinate in minecraft) (Default: 0)
+        radius (int): (Optional) Amount of blocks shown around the centre in every direction (Default: 250)
+
+    Returns:
+        Nothing, but does send an embedded object with the map image as a message to the text channel the command was sent to.
+    """
+    radius = op.map_default_radius if radius is None else radius
+
+    # Check entered coords and radius
+    valid = op.verify_location_data("null", x, y, radius, "N/A")
+
+    # Ensure entered arguments are valid
+    if valid == False:
+        await ctx.channel.send("The provided coordinates or radius are not valid, please enter valid coordinates and a radius between 1 and {}...".format(op.map_max_radius))
+        return
+
+    success, image, count = await op.render_map(get_guild_id(ctx), x, y, radius)
+
+    # Ensure the map could be drawn
+    if not success:
+        await ctx.channel.send("Unable to draw the map: {}...".format(image))
+        return
+
+    # Send back the map along with its embed
+    await ctx.channel.send(embed=op.create_map_embed(int(x), int(y), int(radius), count), file=discord.File(io.BytesIO(image), filename="map.png"))
+
+# Command to compare the distances between a whole set of locations
+@client.command(aliases = ["matrix", "mx"])
+async def matrix_coords(ctx, *args):
+    """Bot command to compute the distance and travel time between every pair of the given locations
+
+    Usage: $matrix <name1> <name2> ... or $matrix --author <name>, add --csv to always get a CSV file
+
+    Args:
+        *args (str): Names of the locations, or --author followed by the name of the author whose locations to use
+
+    Returns:
+        Nothing, but does send an embedded object (or a CSV file if there are too many locations to show) to the text channel the command was sent to.
+    """
+    args = list(args)
+
+    # Check if a CSV file was asked for
+    as_csv = "--csv" in args
+    args = [arg for arg in args if arg != "--csv"]
+
+    # Use every location of an author
+    author = None
+    if len(args) > 0 and args[0] == "--author":
+        if len(args) != 2:
+            await ctx.channel.send("Please enter the name of a single author, i.e. $matrix --author <name>")
+            return
+        author = args[1]
+
+    # Grab every location at once
+    status, points = await op.run_async(op.matrix_locations, get_guild_id(ctx), args, author)
+
+    # Ensure locations were found
+    if status == False:
+        await ctx.channel.send("Unable to compute the distance matrix.\nDue to: {}".format(points))
+        return
+
+    distances = op.distance_matrix(points)
+
+    matrix_embed = None if as_csv else op.create_matrix_embed(points, distances)
+
+    # Send back the tables if they fit, otherwise the full matrix as a CSV file
+    if matrix_embed is not None:
+        await ctx.channel.send(embed=matrix_embed)
+    else:
+        data = io.BytesIO(op.matrix_csv(points, distances).encode("utf-8"))
+        await ctx.channel.send("Distances and travel times (in seconds) between {} locations.".format(len(points)), file=discord.File(data, filename="distance-matrix.csv"))
+
+# Command to plan a short route through several locations
+@client.command(aliases = ["route", "rt"])
+async def route_coords(ctx, *args):
+    """Bot command to order the given stops into a short route, starting from the first location
+
+    Usage: $route <start> <stop1> <stop2> ..., add --return to come back to the start at the end
+
+    Args:
+        *args (str): Names of the start location followed by the stops
+
+    Returns:
+        Nothing, but does send an embedded object as a message to the text channel the command was sent to.
+    """
+    args = list(args)
+
+    # Check if the route should end back at the start
+    round_trip = "--return" in args
+    names = [arg for arg in args if arg != "--return"]
+
+    # Order the stops
+    status, legs = await op.run_async(op.plan_route, get_guild_id(ctx), names, round_trip)
+
+    # Ensure the route was planned
+    if status == False:
+        await ctx.channel.send("Unable to plan the route.\nDue to: {}".format(legs))
+        return
+
+    # Send back the embed representation for the route
+    await ctx.channel.send(embed=op.create_route_embed(legs))
+
+# Command to find the fastest way between two locations, using the Nether portals
+@client.command(aliases = ["travel", "tr"])
+async def travel_coords(ctx, fromLocation, toLocation, mode="run"):
+    """Bot command to find the fastest way from one location to another, going through the Nether portals when it is faster
+
+    Args:
+        fromLocation (str): Name of the location to start from
+        toLocation   (str): Name of the location to go to
+        mode         (str): How to travel, either 'walk', 'run' or 'horse' (Default: 'run')
+
+    Returns:
+        Nothing, but does send an embedded object as a message to the text channel the command was sent to.
+    """
+    # Find the fastest route
+    status, response = await op.run_async(op.fastest_route, get_guild_id(ctx), fromLocation, toLocation, mode)
+
+    # Ensure the route was found
+    if status == False:
+        await ctx.channel.send("Unable to find a route between the two locations.\nDue to: {}".format(response))
+        return
+
+    # Send back the embed representation for the route
+    await ctx.channel.send(embed=op.create_travel_embed(fromLocation, toLocation, mode, response))
+
+# Command to show how long commands and database calls take
+@client.command(aliases = ["stats"])
+async def stats_command(ctx):
+    """Bot command to show the latency of every command and database call as well as the cache hit ratio, admin only
+
+    Returns:
+        Nothing, but does send an embedded object as a message to the text channel the command was sent to.
+    """
+    # Only the admin account can see the stats
+    if str(ctx.message.author.id) != conf.DISCORD_USER_ID:
+        await ctx.channel.send("Only the bot's admin can see its stats.")
+        return
+
+    await ctx.channel.send(embed=op.create_stats_embed())
+
 # Help command
 @client.command(aliases = ["h"])
 async def help(ctx):
@@ -354,6 +713,12 @@ async def help(ctx):
     # Save command
     embed.add_field(name="$save  <name>  <x>  <y>  <z>  [description]", value="> *Save a set of coordinates under the given name.*\n> *Shorthand: '$sv'*\n> *Note: The 'description' field is optional*\n", inline=False)
     
+    # Import command
+    embed.add_field(name="$import  (with a .csv or .json file attached)", value="> *Save every location listed in the attached file.*\n> *Shorthand: '$imp'*\n> *Note: CSV files need the columns name, x, y, z and optionally desc*", inline=False)
+
+    # Export command
+    embed.add_field(name="$export  [format]", value="> *Get every saved location as a compressed file.*\n> *Shorthand: '$exp'*\n> *Note: 'format' can be either csv or json. Default is csv*", inline=False)
+
     # Get command
     embed.add_field(name="$get  <name>", value="> *Get the coordinates of a location with the given name.*\n> *Shorthand: '$g'*", inline=False)
 
@@ -363,11 +728,11 @@ async def help(ctx):
                     inline=False)
 
     # List command
-    embed.add_field(name="$list", value="> *List all saved locations, server-wide.*\n> *Shorthand: '$l'*", inline=False)
+    embed.add_field(name="$list", value="> *List all saved locations, server-wide.*\n> *Shorthand: '$l'*\n> *Note: Use the Previous/Next buttons to go through the pages*", inline=False)
 
     # Edit command
     embed.add_field(name="$edit  <name>  <entry_to_edit>  <new_value>", 
-                    value="> *Edit a specific entry on the location with the given name.*\n> *Shorthand: '$e', '$ed'*\n> *Names of fields to edit: name, x, y, z, desc*\n> *Note: Only the original author of the location can edit it.*", 
+                    value="> *Edit a specific entry on the location with the given name.*\n> *Shorthand: '$e', '$ed'*\n> *Names of fields to edit: name, x, y, z, desc, portal*\n> *Note: Only the original author of the location can edit it.*", 
                     inline=False)
 
     # Remove command
@@ -382,6 +747,22 @@ async def help(ctx):
     # Navigation/Directions for coordinates command
     embed.add_field(name="$navigatec  <x>  <z>  <nameB>", value="> *Calculate directions between given coordinates and a known location*\n> *Shorthand: '$navc', '$nc'*", inline=False)
 
+    # Nearest locations command
+    embed.add_field(name="$nearest  <x>  <z>  [amount]", value="> *List the saved locations closest to the given coordinates*\n> *Shorthand: '$near', '$ne'*\n> *Note: 'amount' is optional, defaults to 5 (max 25)*", inline=False)
+
+    # Compass command
+    embed.add_field(name="$compass  <x>  <z>  [amount]", value="> *List the direction and distance from the given coordinates to the closest locations*\n> *Shorthand: '$cp'*\n> *Note: 'amount' is optional, defaults to 10 (max 25)*", inline=False)
+    embed.add_field(name="$map  [x]  [z]  [radius]", value="> *Draw a map of the saved locations around the given coordinates*\n> *Shorthand: '$mp'*\n> *Note: Centred on 0 0 by default, 'radius' defaults to 250 blocks (max 1000)*", inline=False)
+
+    # Matrix command
+    embed.add_field(name="$matrix  <name1>  <name2>  ...  |  --author <name>", value="> *Calculate the distance and travel time between every pair of locations*\n> *Shorthand: '$mx'*\n> *Note: add --csv to get the results as a CSV file*", inline=False)
+
+    # Route command
+    embed.add_field(name="$route  <start>  <stop1>  <stop2>  ...", value="> *Order the stops into a short route starting from the first location*\n> *Shorthand: '$rt'*\n> *Note: add --return to come back to the start at the end*", inline=False)
+
+    # Travel command
+    embed.add_field(name="$travel  <nameA>  <nameB>  [mode]", value="> *Find the fastest way from location A to location B, taking the Nether portals when it is faster*\n> *Shorthand: '$tr'*\n> *Note: 'mode' can be walk, run or horse. Default is run. Mark portals with '$edit <name> portal yes'*", inline=False)
+
     # Setting the footer
     embed.set_footer(text="Bot created by Warsna#4581")
 
@@ -396,6 +777,10 @@ def setup_argparse():
 
     Supported arguments: 
         --dev: To turn on developper mode and store locations in memory instead of a database
+        --sqlite: Path of a SQLite database file to store locations in instead of PostgreSQL
+        --journal: Path to name the journal files after, to keep locations in memory and journal them to local disk instead of using a database
+        --shards: Total amount of shards, discord's recommended amount if not given
+        --workers: Amount of worker processes to split the shards between
 
     Returns:
         Returns arguments parser object that contains the parsed args
@@ -403,20 +788,165 @@ def setup_argparse():
     parser = argparse.ArgumentParser(description="Minecraft Discord Bot... by: Nabeel Warsalee")
 
     parser.add_argument('--dev', action="store_true", help="Activate dev mode")
+    parser.add_argument('--sqlite', metavar="PATH", help="Store locations in a SQLite database file instead of PostgreSQL")
+    parser.add_argument('--journal', metavar="PATH", help="Keep locations in memory, journaled to files named after PATH, instead of using a database")
+    parser.add_argument('--shards', type=int, default=conf.SHARD_COUNT, help="Total amount of shards (Default: SHARD_COUNT or discord's recommendation)")
+    parser.add_argument('--workers', type=int, default=conf.SHARD_WORKERS, help="Amount of worker processes to split the shards between (Default: SHARD_WORKERS or 1)")
 
     return parser.parse_args()
 
-# Check if running in dev mode
-args = setup_argparse()
+# Function to run the bot in the current process
+def run_bot(use_local, shard_ids=None, shard_count=None, invalidations=None, metrics_port=None, setup_database=True):
+    """Function to create the Operator and run the bot until it stops
+
+    Args:
+        use_local                    (bool): Flag to store locations in memory instead of a database
+        shard_ids                    (list): IDs of the shards to run, every shard if None (Default: None)
+        shard_count                   (int): Total amount of shards, discord's recommended amount if None (Default: None)
+        invalidations  (InvalidationBus): Bus shared with the other worker processes, None if running alone (Default: None)
+        metrics_port                  (int): Local port to serve the metrics on, None to not serve them (Default: None)
+        setup_database               (bool): Flag to create the tables and indexes before starting (Default: True)
+    """
+    global op
+
+    # Create Operator instance to provide database operations and embed creation functions
+    op = Operator(use_local , conf)
+
+    # Start from the locations cached by the last run, so reads are answered before the database is even reachable
+    warm = conf.SNAPSHOT_PATH is not None and op.load_snapshot(conf.SNAPSHOT_PATH)
+
+    # Make sure the database has the indexes the searches rely on (in the background when starting from a snapshot)
+    if setup_database and not warm:
+        op.setup_database()
+
+    # Check the snapshot against the database in the background and save the cached locations every now and then
+    if conf.SNAPSHOT_PATH is not None and not op.storage.in_memory:
+        op.keep_snapshot(conf.SNAPSHOT_INTERVAL, setup_database=setup_database and warm)
+
+    # Keep the caches up to date with the locations written by other bot instances sharing the database
+    listening = op.listen_for_changes()
+    if listening:
+        print("Listening for location changes made by other bot instances...")
+
+    # Drop what this process keeps about a guild whenever another worker writes to it
+    # The other workers' writes already arrive row by row through the listener, dropping the whole guild on top of that would undo them
+    if invalidations is not None and not listening:
+        op.invalidations = invalidations
+        invalidations.listen(op.guild_invalidated)
+
+    # Serve the metrics to Prometheus on the local machine if a port was given
+    if metrics_port:
+        print("Serving metrics on http://127.0.0.1:{}/metrics...".format(metrics_port))
+        start_metrics_server(op.telemetry, metrics_port)
+
+    # Run the bot instance
+    client.shard_ids = shard_ids
+    client.shard_count = shard_count
+    client.run(conf.DISCORD_TOKEN)
 
-if args.dev:
-    print("Running in developer mode...")
-    use_local =True
-else:
-    use_local =False
+    if invalidations is not None:
+        invalidations.close()
 
-# Create Operator instance to provide database operations and embed creation functions
-op = Operator(use_local , conf)
+    # Stop the database workers and close every database connection once the bot stops
+    op.close()
 
-# Run the bot instance
-client.run(conf.DISCORD_TOKEN)
\ No newline at end of file
+# Function run by every worker process when sharded
+def run_worker(worker, shard_ids, shard_count, queues, sqlite_path):
+    """Function to run the bot for a range of shards in a worker process
+
+    Args:
+        worker       (int): Index of the worker process
+        shard_ids   (list): IDs of the shards this worker runs
+        shard_count  (int): Total amount of shards
+        queues      (list): Invalidation queue of every worker process
+        sqlite_path  (str): Path of the SQLite database file, None to use PostgreSQL
+    """
+    if sqlite_path:
+        conf.SQLITE_PATH = sqlite_path
+
+    # Every worker caches the guilds of its own shards, so each one keeps its own snapshot
+    if conf.SNAPSHOT_PATH:
+        conf.SNAPSHOT_PATH = "{}.{}".format(conf.SNAPSHOT_PATH, worker)
+
+    print("Worker {} running shards {}...".format(worker, shard_ids))
+
+    # Every worker serves its metrics on its own port, right after the previous worker's
+    metrics_port = conf.METRICS_PORT + worker if conf.METRICS_PORT else None
+
+    # The parent process already set up the database
+    run_bot(False, shard_ids, shard_count, InvalidationBus(queues, worker), metrics_port, setup_database=False)
+
+# Function to run the bot over several worker processes
+def run_sharded(shard_count, workers):
+    """Function to split the shards between worker processes and wait for all of them to stop
+
+    Args:
+        shard_count (int): Total amount of shards, discord's recommended amount if None
+        workers     (int): Amount of worker processes
+    """
+    if shard_count is None:
+        shard_count = recommended_shard_count(conf.DISCORD_TOKEN)
+
+    ranges = shard_ranges(shard_count, workers)
+    print("Running {} shards over {} worker processes...".format(shard_count, len(ranges)))
+
+    # Create the tables and indexes once, instead of every worker racing to do it
+    setup_op = Operator(False, conf)
+    setup_op.setup_database()
+    setup_op.close()
+
+    # Workers start from a fresh interpreter, nothing (i.e. database connections) is inherited from this process
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in ranges]
+
+    processes = [
+        context.Process(target=run_worker, args=(worker, shard_ids, shard_count, queues, conf.SQLITE_PATH), name="bot-worker-{}".format(worker))
+        for worker, shard_ids in enumerate(ranges)
+    ]
+
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+# Function to run the bot
+def main():
+    """Function to run the bot from the command line arguments, in this process or over several worker processes"""
+    # Check if running in dev mode
+    args = setup_argparse()
+
+    if args.dev:
+        print("Running in developer mode...")
+        use_local =True
+    else:
+        use_local =False
+
+    # Use a SQLite database file if one was given
+    if args.sqlite:
+        print("Storing locations in SQLite database {}...".format(args.sqlite))
+        conf.SQLITE_PATH = args.sqlite
+
+    # Journal the locations to local disk if a path was given
+    if args.journal:
+        print("Journaling locations to {}...".format(args.journal))
+        conf.JOURNAL_PATH = args.journal
+
+    if args.workers > 1:
+        # Locations kept in memory can not be shared between processes
+        if use_local or conf.JOURNAL_PATH:
+            print("WARN - Locations are kept in this process' memory, running every shard in a single process...")
+        else:
+            run_sharded(args.shards, args.workers)
+            return
+
+    run_bot(use_local, shard_count=args.shards, metrics_port=conf.METRICS_PORT)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import os
+import re
+import json
+import threading
+
+from storage import MemoryBackend
+from snapshot import LocationSnapshot, write_snapshot
+
+class JournalBackend(MemoryBackend):
+    """Class to store locations in memory like MemoryBackend, made durable by an append-only journal on local disk
+
+    Every write is applied in memory and appended to the journal as one JSON line. A background thread writes
+    the appended lines out and fsyncs them in batches, every 'fsync_interval' seconds, so a burst of saves costs
+    a single fsync instead of one per save (an interval of 0 fsyncs every write before returning instead).
+
+    Once the journal grows past 'compact_bytes' it is compacted in the background: writes move on to a new
+    journal and every location is written to a new snapshot, after which the older snapshot and journals are
+    deleted. Starting up replays the newest snapshot and every journal written after it.
+
+    Files (next to 'path')...
+        <path>.snapshot.<generation>: Every location at the start of that generation (see snapshot.py)
+        <path>.journal.<generation>: Every write made during that generation, one JSON line each
+
+    Stores...
+        Guild ID -> partition holding the guild's locations (see MemoryBackend)
+        Path the files are named after and the current generation
+        The open journal file and the lines waiting to be written to it
+        Thread writing and fsyncing the journal, and the thread compacting it when running
+        Counters describing how the journal has been used (see stats())
+
+    """
+    def __init__(self, path, fsync_interval=0.05, compact_bytes=16 * 1024 * 1024):
+        super().__init__()
+
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+
+        self.generation = 0
+        self._file = None
+        self._pending = []
+
+        # Held while applying a write and queueing its line, so lines are queued in the order the writes were applied
+        self._write_lock = threading.RLock()
+        # Held while the journal file is written to or swapped for a new one
+        self._file_lock = threading.Lock()
+        self._wake = threading.Condition(self._write_lock)
+        self._closing = False
+        self._closed = threading.Event()
+
+        self._compactor = None
+        self._counters = {"writes" : 0, "fsyncs" : 0, "compactions" : 0, "replayed" : 0}
+
+        self.replay()
+
+        self._flusher = None
+        if self.fsync_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+            self._flusher.start()
+
+    # Function to get the path of a generation's file
+    def file_path(self, kind, generation):
+        """Function to get the path of the snapshot or journal file of a generation
+
+        Args:
+            kind        (str): Either 'snapshot' or 'journal'
+            generation  (int): Generation of the file
+
+        Returns:
+            str: Returns the path of the file
+        """
+        return "{}.{}.{}".format(self.path, kind, generation)
+
+    # Function to find the files of every generation
+    def generations(self, kind):
+        """Function to list the generations that have a snapshot or journal file on disk
+
+        Args:
+            kind (str): Either 'snapshot' or 'journal'
+
+        Returns:
+            list: Returns the generations, oldest first
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        pattern = re.compile(r"^{}\.{}\.(\d+)$".format(re.escape(os.path.basename(self.path)), kind))
+
+        found = []
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                found.append(int(match.group(1)))
+
+        return sorted(found)
+
+    # Function to apply a journal line
+    def apply(self, record):
+        """Function to apply a write read back from the journal to the in-memory partitions, without journaling it again
+
+        Args:
+            record (dict): The write, as appended by append()
+        """
+        op = record["op"]
+
+        if op == "add":
+            MemoryBackend.add_locations(self, [record["location"]])
+        elif op == "remove":
+            MemoryBackend.remove_location(self, record["guild_id"], record["id"])
+        elif op == "edit":
+            MemoryBackend.edit_location(self, record["guild_id"], record["id"], record["field"], record["edit"])
+        else:
+            raise ValueError("Unknown journal operation '{}'".format(op))
+
+    # Function to rebuild the locations from disk
+    def replay(self):
+        """Function to load the newest snapshot and replay every journal written after it, then open the journal to append to
+
+        A journal line cut short by a crash can only be the last line written, it is dropped (along with nothing else).
+
+        Raises:
+            ValueError: If a journal line other than the very last one can not be read (i.e. the file was corrupted)
+        """
+        snapshots = self.generations("snapshot")
+        start = 0
+
+        # The newest snapshot that can be read, an older one (with its journals) is still there if writing the newest was cut short
+        for generation in reversed(snapshots):
+            try:
+                snapshot = LocationSnapshot(self.file_path("snapshot", generation))
+            except (OSError, ValueError) as e:
+                print("WARN - Skipping journal snapshot {} due to: {}".format(generation, e))
+                continue
+
+            try:
+                for guild_id in snapshot.guild_ids():
+                    MemoryBackend.add_locations(self, snapshot.locations(guild_id)[1])
+            finally:
+                snapshot.close()
+
+            start = generation
+            break
+
+        journals = [generation for generation in self.generations("journal") if generation >= start]
+
+        for generation in journals:
+            path = self.file_path("journal", generation)
+
+            with open(path, "rb") as file:
+                lines = file.read().split(b"\n")
+
+            # Everything after the last newline was cut short
+            valid = len(lines) - 1
+            good_bytes = 0
+
+            for number, line in enumerate(lines[:valid]):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise ValueError("Line {} of journal '{}' is corrupted".format(number + 1, path))
+
+                self.apply(record)
+                good_bytes += len(line) + 1
+                self._counters["replayed"] += 1
+
+            if len(lines[valid]) > 0:
+                print("WARN - Dropping the last write of journal '{}', it was cut short".format(path))
+                with open(path, "r+b") as file:
+                    file.truncate(good_bytes)
+
+        self.generation = max(journals + [start])
+        self._file = open(self.file_path("journal", self.generation), "ab")
+
+    # Function to queue a write for the journal
+    def append(self, record):
+        """Function to queue a line for the journal, written out by the next flush
+
+        Must be called while holding the write lock, right after applying the write.
+
+        Args:
+            record (dict): The write, i.e. {'op' : 'add', 'location' : ...}
+        """
+        self._pending.append(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._counters["writes"] += 1
+
+        # Wake the flushing thread up for the first line of a batch
+        if self.fsync_interval > 0 and len(self._pending) == 1:
+            self._wake.notify()
+
+    # Function to write the queued lines out
+    def flush(self):
+        """Function to write every queued line to the journal and fsync it, starting a compaction if the journal got too big"""
+        with self._file_lock:
+            with self._write_lock:
+                lines, self._pending = self._pending, []
+
+            if len(lines) == 0:
+                return
+
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            self._counters["fsyncs"] += 1
+            size = self._file.tell()
+
+        if size > self.compact_bytes:
+            self.start_compaction()
+
+    # Function run by the flushing thread
+    def _flush_loop(self):
+        """Function to flush the journal every 'fsync_interval' seconds while lines are queued, until the backend is closed"""
+        while True:
+            with self._write_lock:
+                while len(self._pending) == 0 and not self._closing:
+                    self._wake.wait()
+
+                if self._closing:
+                    return
+
+            # Give the writes right behind this one the chance to share its fsync
+            self._closed.wait(self.fsync_interval)
+
+            try:
+                self.flush()
+            except OSError as e:
+                print("ERROR while attempting to write the journal due to: {}".format(e))
+
+    # Function to start compacting in the background
+    def start_compaction(self):
+        """Function to start compacting the journal from a background thread, unless it is already being compacted"""
+        with self._write_lock:
+            if self._closing or (self._compactor is not None and self._compactor.is_alive()):
+                return
+
+            self._compactor = threading.Thread(target=self.compact, name="journal-compactor", daemon=True)
+            self._compactor.start()
+
+    # Function to compact the journal
+    def compact(self):
+        """Function to replace the journal and the snapshot before it by a new snapshot of every location
+
+        Writes keep going to a brand new journal while the snapshot is being written, they are replayed on top of it.
+        """
+        with self._file_lock:
+            with self._write_lock:
+                lines, self._pending = self._pending, []
+
+                # Finish the current journal and move on to the next generation
+                self._file.write(b"".join(lines))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+                self.generation += 1
+                generation = self.generation
+                self._file = open(self.file_path("journal", generation), "ab")
+
+                # Locations are replaced (never changed in place) on edits, so copying the lists is enough to freeze them
+                state = {guild_id : (True, list(partition.locations.values())) for guild_id, partition in self.guilds.items() if len(partition.locations) > 0}
+
+        try:
+            write_snapshot(self.file_path("snapshot", generation), state)
+        except (OSError, TypeError, ValueError) as e:
+            print("ERROR while attempting to compact the journal due to: {}".format(e))
+            return
+
+        # Everything before this generation is in the snapshot now
+        for kind in ["snapshot", "journal"]:
+            for old in self.generations(kind):
+                if old < generation:
+                    os.remove(self.file_path(kind, old))
+
+        self._counters["compactions"] += 1
+
+    def add_location(self, location):
+        self.add_locations([location])
+
+    def add_locations(self, locations):
+        with self._write_lock:
+            super().add_locations(locations)
+
+            for location in locations:
+                self.append({"op" : "add", "location" : location})
+
+        if self.fsync_interval <= 0:
+            self.flush()
+
+    def remove_location(self, guild_id, id):
+        with self._write_lock:
+            super().remove_location(guild_id, id)
+            self.append({"op" : "remove", "guild_id" : guild_id, "id" : id})
+
+        if self.fsync_interval <= 0:
+            self.flush()
+
+    def edit_location(self, guild_id, id, field_to_edit, edit):
+        with self._write_lock:
+            # A bad edit raises before anything is journaled
+            super().edit_location(guild_id, id, field_to_edit, edit)
+            self.append({"op" : "edit", "guild_id" : guild_id, "id" : id, "field" : field_to_edit, "edit" : edit})
+
+        if self.fsync_interval <= 0:
+            self.flush()
+
+    def stats(self):
+        stats = super().stats()
+        stats["backend"] = "journal"
+        stats["generation"] = self.generation
+
+        with self._write_lock:
+            stats["pending"] = len(self._pending)
+            stats.update(self._counters)
+
+        return stats
+
+    def close(self):
+        with self._write_lock:
+            self._closing = True
+            self._wake.notify_all()
+
+        self._closed.set()
+
+        if self._flusher is not None:
+            self._flusher.join()
+
+        if self._compactor is not None:
+            self._compactor.join()
+
+        # Write out whatever is still queued
+        self.flush()
+        self._file.close()
@@ -0,0 +1,147 @@
+from bisect import bisect_left, bisect_right, insort
+
+# Amount of keys added at once past which they are sorted in with the others instead of inserted one by one
+BULK_INSERT_SIZE = 32
+
+# Function to cut a page out of keys in listing order
+def page_of(keys, cursor, backwards, page_size):
+    """Function to get one page of a sorted list of (name, id) keys, the same way the storage backends page through locations
+
+    Args:
+        keys        (list): List of (name, id) keys, in listing order
+        cursor     (tuple): (name, id) key to start the page after, None for the first page
+        backwards   (bool): Flag to get the page before the cursor instead of after it
+        page_size    (int): Amount of keys on the page
+
+    Returns:
+        list, bool: Returns the page's keys and whether more keys follow in that direction
+    """
+    if backwards:
+        end = len(keys) if cursor is None else bisect_left(keys, tuple(cursor))
+        start = max(0, end - page_size)
+
+        return keys[start:end], start > 0
+
+    start = 0 if cursor is None else bisect_right(keys, tuple(cursor))
+    end = start + page_size
+
+    return keys[start:end], end < len(keys)
+
+class ListingIndex:
+    """Class to keep the (name, id) keys of a set of locations in listing order, so pages of them are cut out by bisecting
+
+    Every add and remove keeps the keys sorted, so getting a page costs the same whatever the amount of locations
+    instead of sorting all of them again on every click. Names are compared by code point, like SQLite does and
+    like the PostgreSQL page statements do (see storage.LISTING_ORDER).
+
+    Stores...
+        Sorted list of the (name, id) key of every location
+
+    """
+    def __init__(self, locations=()):
+        self._keys = sorted((location["name"], location["id"]) for location in locations)
+
+    def __len__(self):
+        return len(self._keys)
+
+    # Function to get every key
+    def keys(self):
+        """Function to get a copy of every key, in listing order
+
+        Returns:
+            list: Returns the list of (name, id) keys
+        """
+        return list(self._keys)
+
+    # Function to find the locations using a name
+    def ids_named(self, name):
+        """Function to get the ID of every location using exactly the given name
+
+        Args:
+            name (str): Name of the locations
+
+        Returns:
+            list: Returns the IDs, in listing order
+        """
+        ids = []
+
+        for i in range(bisect_left(self._keys, (name,)), len(self._keys)):
+            if self._keys[i][0] != name:
+                break
+
+            ids.append(self._keys[i][1])
+
+        return ids
+
+    # Function to add the keys of locations
+    def add(self, locations):
+        """Function to add the keys of the given locations, in their place
+
+        Args:
+            locations (list): List of location data to add
+        """
+        if len(locations) > BULK_INSERT_SIZE:
+            # Sorting mostly sorted keys is close to linear
+            self._keys.extend((location["name"], location["id"]) for location in locations)
+            self._keys.sort()
+            return
+
+        for location in locations:
+            insort(self._keys, (location["name"], location["id"]))
+
+    # Function to remove the key of a location
+    def remove(self, location):
+        """Function to remove the key of the given location, if it is there
+
+        Args:
+            location (dict): Location data to remove
+        """
+        key = (location["name"], location["id"])
+        i = bisect_left(self._keys, key)
+
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    # Function to get a page of keys
+    def page(self, cursor, backwards, page_size, ids=None):
+        """Function to get one page of the keys, optionally only of the given location IDs
+
+        Without IDs the page is bisected out of the keys. With IDs the keys are walked from the cursor,
+        skipping the other locations, until the page is full.
+
+        Args:
+            cursor     (tuple): (name, id) key to start the page after, None for the first page
+            backwards   (bool): Flag to get the page before the cursor instead of after it
+            page_size    (int): Amount of keys on the page
+            ids          (set): IDs of the only locations to page through (Default: None, i.e. every location)
+
+        Returns:
+            list, bool: Returns the page's keys (in listing order) and whether more keys follow in that direction
+        """
+        if ids is None:
+            return page_of(self._keys, cursor, backwards, page_size)
+
+        if backwards:
+            end = len(self._keys) if cursor is None else bisect_left(self._keys, tuple(cursor))
+            positions = range(end - 1, -1, -1)
+        else:
+            start = 0 if cursor is None else bisect_right(self._keys, tuple(cursor))
+            positions = range(start, len(self._keys))
+
+        # One extra key to know if there is another page
+        found = []
+        for i in positions:
+            key = self._keys[i]
+
+            if key[1] in ids:
+                found.append(key)
+
+                if len(found) > page_size:
+                    break
+
+        page = found[:page_size]
+
+        if backwards:
+            page.reverse()
+
+        return page, len(found) > page_size
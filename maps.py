@@ -0,0 +1,355 @@
+import io
+import math
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont
+
+# Amount of blocks covered by a tile, on each side (one pixel per block)
+TILE_SIZE = 256
+
+# Amount of blocks between two grid lines
+GRID_SIZE = 64
+
+# Colours of the map
+BACKGROUND_COLOUR = (34, 39, 46)
+GRID_COLOUR = (52, 58, 66)
+AXIS_COLOUR = (88, 96, 106)
+LOCATION_COLOUR = (87, 242, 135)
+PORTAL_COLOUR = (181, 110, 255)
+LABEL_COLOUR = (230, 230, 230)
+CENTRE_COLOUR = (237, 66, 69)
+
+# Radius (in pixels) of the dot drawn on every location
+DOT_RADIUS = 3
+
+# Function to get the tile a point falls in
+def tile_of(x, y):
+    """Function to get the tile that contains the given point
+
+    Args:
+        x (int): X coordinate of the point
+        y (int): Y coordinate of the point (NOTE: This is the z coordinate in minecraft)
+
+    Returns:
+        tuple: Returns the (tile x, tile y) of the point
+    """
+    return (math.floor(x / TILE_SIZE), math.floor(y / TILE_SIZE))
+
+# Function to get every tile an area touches
+def tiles_around(x, y, radius):
+    """Function to get every tile that holds part of the square of 'radius' blocks around a point
+
+    Args:
+        x        (int): X coordinate of the centre
+        y        (int): Y coordinate of the centre (NOTE: This is the z coordinate in minecraft)
+        radius   (int): Half the width of the square, in blocks
+
+    Returns:
+        list: Returns the (tile x, tile y) of every tile
+    """
+    min_x, min_y = tile_of(x - radius, y - radius)
+    max_x, max_y = tile_of(x + radius, y + radius)
+
+    return [(tile_x, tile_y) for tile_y in range(min_y, max_y + 1) for tile_x in range(min_x, max_x + 1)]
+
+# Function to draw a single tile
+def render_tile(tile, points):
+    """Function to draw one tile of the map, i.e. the grid, a dot on every location and its name
+
+    North (+y) is up, like the directions given by the rest of the bot. The points should include the
+    locations of the neighbouring tiles, so the labels crossing the border of the tile are drawn in full.
+    Runs in the render worker processes, so it only takes and returns plain values.
+
+    Args:
+        tile    (tuple): (tile x, tile y) of the tile
+        points   (list): List of (x, y, name, portal) tuples of the locations to draw
+
+    Returns:
+        bytes: Returns the tile as a PNG image
+    """
+    origin_x, origin_y = tile[0] * TILE_SIZE, tile[1] * TILE_SIZE
+
+    image = Image.new("RGB", (TILE_SIZE, TILE_SIZE), BACKGROUND_COLOUR)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+
+    # Pixel of a point of the world, the top of the image is the highest y
+    def pixel(x, y):
+        return x - origin_x, TILE_SIZE - 1 - (y - origin_y)
+
+    for offset in range(0, TILE_SIZE, GRID_SIZE):
+        colour = AXIS_COLOUR if origin_x + offset == 0 else GRID_COLOUR
+        draw.line([(offset, 0), (offset, TILE_SIZE)], fill=colour)
+
+        colour = AXIS_COLOUR if origin_y + offset == 0 else GRID_COLOUR
+        row = TILE_SIZE - 1 - offset
+        draw.line([(0, row), (TILE_SIZE, row)], fill=colour)
+
+    for x, y, name, portal in points:
+        px, py = pixel(x, y)
+        colour = PORTAL_COLOUR if portal else LOCATION_COLOUR
+
+        draw.ellipse([px - DOT_RADIUS, py - DOT_RADIUS, px + DOT_RADIUS, py + DOT_RADIUS], fill=colour)
+        draw.text((px + DOT_RADIUS + 2, py - DOT_RADIUS - 4), name, fill=LABEL_COLOUR, font=font)
+
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+
+    return output.getvalue()
+
+# Function to put tiles together into the requested map
+def compose_map(tiles, x, y, radius):
+    """Function to cut the square of 'radius' blocks around a point out of the rendered tiles
+
+    Runs in the render worker processes, so it only takes and returns plain values.
+
+    Args:
+        tiles    (dict): (tile x, tile y) -> tile PNG image, for every tile returned by tiles_around()
+        x         (int): X coordinate of the centre
+        y         (int): Y coordinate of the centre (NOTE: This is the z coordinate in minecraft)
+        radius    (int): Half the width of the map, in blocks
+
+    Returns:
+        bytes: Returns the map as a PNG image
+    """
+    size = 2 * radius + 1
+    image = Image.new("RGB", (size, size), BACKGROUND_COLOUR)
+
+    # World coordinates of the top left pixel of the map
+    left, top = x - radius, y + radius
+
+    for (tile_x, tile_y), png in tiles.items():
+        tile = Image.open(io.BytesIO(png))
+        image.paste(tile, (tile_x * TILE_SIZE - left, top - (tile_y * TILE_SIZE + TILE_SIZE - 1)))
+
+    # Mark the centre of the map
+    draw = ImageDraw.Draw(image)
+    draw.line([(radius - 6, radius), (radius + 6, radius)], fill=CENTRE_COLOUR, width=2)
+    draw.line([(radius, radius - 6), (radius, radius + 6)], fill=CENTRE_COLOUR, width=2)
+
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+
+    return output.getvalue()
+
+class LocationMap:
+    """Class to keep the rendered map tiles of a guild, along with what is needed to know when they are out of date
+
+    Every tile has a version that goes up whenever a location drawn on it is added, moved, renamed or
+    removed. Rendered tiles are cached by (tile, version), so a tile is only drawn again once something
+    on it changed and every other tile keeps being served from the cache.
+
+    Stores...
+        Location ID -> (x, y, name, portal) of every location
+        Tile -> IDs of the locations inside that tile
+        Tile -> version, for the tiles that changed at least once
+        Cache of rendered tiles by (tile, version), least recently used first
+        Counters describing how the cache has been used (see stats())
+
+    """
+    def __init__(self, max_tiles=512):
+        self.max_tiles = max_tiles
+
+        self._points = {}
+        self._tiles = {}
+        self._versions = {}
+
+        self._rendered = OrderedDict()
+        self._counters = {"hits" : 0, "misses" : 0}
+
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    # Function to get what is drawn of a location
+    @staticmethod
+    def _point(location):
+        return (location["coords"]["x"], location["coords"]["y"], location["name"], bool(location.get("portal", False)))
+
+    # Function to mark the tiles showing a point as out of date
+    def _touch(self, point):
+        """Function to bump the version of the tile a point is in and of its neighbours, which draw its label too"""
+        tile_x, tile_y = tile_of(point[0], point[1])
+
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                tile = (tile_x + dx, tile_y + dy)
+                self._versions[tile] = self._versions.get(tile, 0) + 1
+
+    # Function to add a point
+    def _insert(self, id, point):
+        self._points[id] = point
+        self._tiles.setdefault(tile_of(point[0], point[1]), set()).add(id)
+        self._touch(point)
+
+    # Function to remove a point
+    def _remove(self, id):
+        point = self._points.pop(id, None)
+
+        if point is None:
+            return None
+
+        tile = tile_of(point[0], point[1])
+        self._tiles[tile].discard(id)
+        if len(self._tiles[tile]) == 0:
+            del self._tiles[tile]
+
+        self._touch(point)
+
+        return point
+
+    # Function to set every location at once
+    def set_locations(self, locations):
+        """Function to replace every location of the map
+
+        Args:
+            locations (list): List of every location data
+        """
+        with self._lock:
+            self._points = {}
+            self._tiles = {}
+            self._rendered.clear()
+
+            for location in locations:
+                point = self._point(location)
+                self._points[location["id"]] = point
+                self._tiles.setdefault(tile_of(point[0], point[1]), set()).add(location["id"])
+
+    # Function to keep the map up to date with an added location
+    def location_added(self, location):
+        """Function to draw a newly saved location on the next render of its tiles
+
+        Args:
+            location (dict): Location data that was saved
+        """
+        with self._lock:
+            self._remove(location["id"])
+            self._insert(location["id"], self._point(location))
+
+    # Function to keep the map up to date with an edited location
+    def location_edited(self, id, edit_func):
+        """Function to redraw the tiles of an edited location, only if the edit changed how it is drawn (i.e. not its description)
+
+        Args:
+            id             (str): ID of the location that was edited
+            edit_func (callable): Function that takes the old location data and returns the edited location data
+        """
+        with self._lock:
+            old = self._points.get(id)
+
+            if old is None:
+                return
+
+            x, y, name, portal = old
+            new = self._point(edit_func({"id" : id, "name" : name, "coords" : {"x" : x, "y" : y, "z" : 0}, "portal" : portal}))
+
+            if new != old:
+                self._remove(id)
+                self._insert(id, new)
+
+    # Function to keep the map up to date with a removed location
+    def location_removed(self, id):
+        """Function to erase a deleted location on the next render of its tiles
+
+        Args:
+            id (str): ID of the location that was removed
+        """
+        with self._lock:
+            self._remove(id)
+
+    # Function to get what is needed to draw a tile
+    def tile_points(self, tile):
+        """Function to get every location drawn on a tile, i.e. the ones inside it and inside its neighbours
+
+        Args:
+            tile (tuple): (tile x, tile y) of the tile
+
+        Returns:
+            list: Returns a list of (x, y, name, portal) tuples
+        """
+        with self._lock:
+            points = []
+
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for id in self._tiles.get((tile[0] + dx, tile[1] + dy), ()):
+                        points.append(self._points[id])
+
+            return points
+
+    # Function to get the tiles of an area
+    def tiles(self, x, y, radius):
+        """Function to get the rendered tiles of an area from the cache, along with what is needed to render the others
+
+        Args:
+            x        (int): X coordinate of the centre
+            y        (int): Y coordinate of the centre (NOTE: This is the z coordinate in minecraft)
+            radius   (int): Half the width of the area, in blocks
+
+        Returns:
+            dict, list: Returns the cached tiles (tile -> PNG image) and a (tile, version, points) tuple for every tile that still needs to be rendered
+        """
+        cached = {}
+        missing = []
+
+        with self._lock:
+            for tile in tiles_around(x, y, radius):
+                key = (tile, self._versions.get(tile, 0))
+                png = self._rendered.get(key)
+
+                if png is not None:
+                    self._rendered.move_to_end(key)
+                    self._counters["hits"] += 1
+                    cached[tile] = png
+                else:
+                    self._counters["misses"] += 1
+                    missing.append((tile, key[1], self.tile_points(tile)))
+
+        return cached, missing
+
+    # Function to cache a rendered tile
+    def put_tile(self, tile, version, png):
+        """Function to cache a rendered tile, unless a location on it changed while it was being rendered
+
+        Args:
+            tile    (tuple): (tile x, tile y) of the tile
+            version   (int): Version of the tile that was rendered
+            png     (bytes): The rendered tile
+        """
+        with self._lock:
+            if self._versions.get(tile, 0) != version:
+                return
+
+            self._rendered[(tile, version)] = png
+            self._rendered.move_to_end((tile, version))
+
+            # Older versions of the tile can never be asked for again
+            for key in [key for key in self._rendered if key[0] == tile and key[1] != version]:
+                del self._rendered[key]
+
+            while len(self._rendered) > self.max_tiles:
+                self._rendered.popitem(last=False)
+
+    # Function to count the locations in an area
+    def count(self, x, y, radius):
+        """Function to count the locations inside the square of 'radius' blocks around a point
+
+        Returns:
+            int: Returns the amount of locations
+        """
+        with self._lock:
+            return sum(1 for point_x, point_y, _, _ in self._points.values() if abs(point_x - x) <= radius and abs(point_y - y) <= radius)
+
+    # Function to get stats about the map
+    def stats(self):
+        """Function to get a snapshot of the map and its tile cache
+
+        Returns:
+            dict: Returns the amount of locations and cached tiles and the cache hit/miss counters
+        """
+        with self._lock:
+            stats = {"locations" : len(self._points), "tiles" : len(self._rendered)}
+            stats.update(self._counters)
+
+        return stats
@@ -0,0 +1,328 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last bucket catches everything slower
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Class to count observed values into fixed buckets, the way Prometheus histograms do
+
+    Stores...
+        Upper bound of every bucket
+        Amount of observations that fell in each bucket (not cumulative)
+        Amount and sum of every observation
+
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    # Function to record a value
+    def observe(self, value):
+        """Function to count a value in the bucket it falls in
+
+        Args:
+            value (float): Value to record
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # Function to estimate a quantile
+    def quantile(self, q):
+        """Function to estimate a quantile from the buckets, using the upper bound of the bucket it falls in
+
+        Args:
+            q (float): Quantile to estimate, between 0 and 1 (i.e. 0.95)
+
+        Returns:
+            float: Returns the estimated quantile, 0 if nothing was observed yet and infinity if it falls in the last bucket
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+        return float("inf")
+
+class Metrics:
+    """Class to collect how long commands and database calls take, how often they fail and how many rows they return
+
+    Stores...
+        Command name -> latency histogram and error count
+        Database call name -> latency histogram, error count and total amount of rows returned
+        Collectors, functions returning extra values (i.e. cache counters) read whenever the metrics are exported
+
+    """
+    def __init__(self):
+        self.commands = {}
+        self.queries = {}
+        self.collectors = {}
+
+        self._lock = threading.Lock()
+
+    # Function to record a single command or database call
+    def _observe(self, table, name, seconds, error, rows=None):
+        """Function to record a timing in the given table, creating the entry the first time a name is seen"""
+        with self._lock:
+            entry = table.get(name)
+
+            if entry is None:
+                entry = table[name] = {"latency" : Histogram(), "errors" : 0, "rows" : 0}
+
+            entry["latency"].observe(seconds)
+            if error:
+                entry["errors"] += 1
+            if rows is not None:
+                entry["rows"] += rows
+
+    # Function to record a command
+    def observe_command(self, name, seconds, error=False):
+        """Function to record how long a bot command took
+
+        Args:
+            name      (str): Name of the command
+            seconds (float): How long the command took
+            error    (bool): Flag for commands that failed (Default: False)
+        """
+        self._observe(self.commands, name, seconds, error)
+
+    # Function to record a database call
+    def observe_query(self, name, seconds, error=False, rows=None):
+        """Function to record how long a database call took and how many rows it returned
+
+        Args:
+            name      (str): Name of the storage backend function that was called
+            seconds (float): How long the call took
+            error    (bool): Flag for calls that raised an error (Default: False)
+            rows      (int): Amount of rows returned, None if the call does not return rows (Default: None)
+        """
+        self._observe(self.queries, name, seconds, error, rows)
+
+    # Function to add a source of extra values
+    def add_collector(self, name, func):
+        """Function to register a function whose numeric values get exported along with the timings
+
+        Args:
+            name       (str): Prefix of the exported values (i.e. 'cache')
+            func  (callable): Function that returns a dict of value name -> number
+        """
+        self.collectors[name] = func
+
+    # Function to read every collector
+    def collect(self):
+        """Function to read the current values of every collector, skipping the values that are not numbers
+
+        Returns:
+            dict: Returns collector name -> {value name -> number}
+        """
+        collected = {}
+
+        for name, func in self.collectors.items():
+            try:
+                values = func() or {}
+            except Exception as e:
+                print("WARN - Unable to collect the '{}' metrics due to: {}".format(name, e))
+                continue
+
+            collected[name] = {key : float(value) for key, value in values.items() if isinstance(value, (int, float))}
+
+        return collected
+
+    # Function to summarize the metrics
+    def snapshot(self):
+        """Function to summarize every command and database call
+
+        Returns:
+            dict: Returns 'commands' and 'queries' (name -> count, errors, rows, total/mean/p50/p95 seconds) and 'collected' (see collect())
+        """
+        def summarize(table):
+            summary = {}
+            for name, entry in table.items():
+                latency = entry["latency"]
+                summary[name] = {
+                    "count"  : latency.count,
+                    "errors" : entry["errors"],
+                    "rows"   : entry["rows"],
+                    "total"  : latency.sum,
+                    "mean"   : latency.sum / latency.count if latency.count else 0.0,
+                    "p50"    : latency.quantile(0.5),
+                    "p95"    : latency.quantile(0.95),
+                }
+            return summary
+
+        with self._lock:
+            snapshot = {"commands" : summarize(self.commands), "queries" : summarize(self.queries)}
+
+        snapshot["collected"] = self.collect()
+
+        return snapshot
+
+    # Function to export the metrics for Prometheus
+    def render_prometheus(self):
+        """Function to write every metric in the Prometheus text exposition format
+
+        Returns:
+            str: Returns the metrics as text
+        """
+        lines = []
+
+        def histogram(metric, label, table):
+            lines.append("# TYPE {} histogram".format(metric))
+            for name, entry in sorted(table.items()):
+                latency = entry["latency"]
+                cumulative = 0
+                for bound, count in zip(latency.buckets, latency.counts):
+                    cumulative += count
+                    lines.append('{}_bucket{{{}="{}",le="{}"}} {}'.format(metric, label, name, bound, cumulative))
+                lines.append('{}_bucket{{{}="{}",le="+Inf"}} {}'.format(metric, label, name, latency.count))
+                lines.append('{}_sum{{{}="{}"}} {}'.format(metric, label, name, latency.sum))
+                lines.append('{}_count{{{}="{}"}} {}'.format(metric, label, name, latency.count))
+
+        def counter(metric, label, table, key):
+            lines.append("# TYPE {} counter".format(metric))
+            for name, entry in sorted(table.items()):
+                lines.append('{}{{{}="{}"}} {}'.format(metric, label, name, entry[key]))
+
+        with self._lock:
+            histogram("minecraft_bot_command_seconds", "command", self.commands)
+            counter("minecraft_bot_command_errors_total", "command", self.commands, "errors")
+            histogram("minecraft_bot_query_seconds", "query", self.queries)
+            counter("minecraft_bot_query_errors_total", "query", self.queries, "errors")
+            counter("minecraft_bot_query_rows_total", "query", self.queries, "rows")
+
+        for name, values in sorted(self.collect().items()):
+            for key, value in sorted(values.items()):
+                metric = "minecraft_bot_{}_{}".format(name, key)
+                lines.append("# TYPE {} gauge".format(metric))
+                lines.append("{} {}".format(metric, value))
+
+        return "\n".join(lines) + "\n"
+
+class InstrumentedBackend:
+    """Class to time every call made to a storage backend, passing everything else through untouched
+
+    Stores...
+        The storage backend being timed
+        Metrics to record the calls in
+
+    """
+    # Backend functions that go to the database
+    TIMED = {
+        "setup", "add_location", "add_locations", "get_locations_by_name", "get_locations_by_names", "get_locations_by_author",
+        "remove_location", "edit_location", "get_portal_locations", "search_locations", "search_locations_page", "existing_location_names",
+    }
+
+    # Backend functions returning a generator, timed from the call until the last chunk was read
+    STREAMED = {"iter_locations"}
+
+    def __init__(self, backend, metrics):
+        self.backend = backend
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        attribute = getattr(self.backend, name)
+
+        if name in self.STREAMED:
+            return lambda *args, **kwargs: self.timed_chunks(name, attribute(*args, **kwargs))
+
+        if name not in self.TIMED:
+            return attribute
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception:
+                self.metrics.observe_query(name, time.perf_counter() - start, error=True)
+                raise
+
+            # Count the rows of the calls that return locations (pages are (locations, has more) tuples)
+            rows = result[0] if isinstance(result, tuple) and result and isinstance(result[0], (list, dict)) else result
+            rows = len(rows) if isinstance(rows, (list, dict, set)) else None
+
+            self.metrics.observe_query(name, time.perf_counter() - start, rows=rows)
+
+            return result
+
+        return timed
+
+    # Function to time a generator of chunks of locations
+    def timed_chunks(self, name, chunks):
+        """Function to time the whole iteration of a backend generator, counting every location it yields
+
+        A generator closed before its end (i.e. a failed export) is timed up to that point.
+
+        Args:
+            name        (str): Name of the backend function that returned the generator
+            chunks (generator): Generator yielding lists of location data
+
+        Returns:
+            generator: Yields the same chunks
+        """
+        start = time.perf_counter()
+        rows = 0
+
+        try:
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+        except Exception:
+            self.metrics.observe_query(name, time.perf_counter() - start, error=True)
+            raise
+        except GeneratorExit:
+            chunks.close()
+            self.metrics.observe_query(name, time.perf_counter() - start, rows=rows)
+            raise
+
+        self.metrics.observe_query(name, time.perf_counter() - start, rows=rows)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Class to answer requests to the metrics endpoint with the Prometheus text format"""
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.metrics.render_prometheus().encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes happen every few seconds, keep them out of the bot's output
+        pass
+
+# Function to serve the metrics over HTTP
+def start_metrics_server(metrics, port, host="127.0.0.1"):
+    """Function to serve the metrics at http://host:port/metrics from a background thread
+
+    Args:
+        metrics (Metrics): Metrics to serve
+        port        (int): Port to listen on
+        host        (str): Address to listen on, only the local machine by default (Default: '127.0.0.1')
+
+    Returns:
+        ThreadingHTTPServer: Returns the running server, call shutdown() on it to stop it
+    """
+    handler = type("BoundMetricsHandler", (MetricsHandler,), {"metrics" : metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+
+    return server
@@ -1,17 +1,97 @@
 import discord
+import os
 import uuid
 import argparse
 import math
-import psycopg2
+import csv
+import gzip
+import io
+import json
+import tempfile
+import asyncio
+import functools
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cache import LocationCache
+from spatial import SpatialIndex
+from routing import optimize_route
+from compass import bearings
+from metrics import Metrics, InstrumentedBackend
+from travel import TravelGraph
+from maps import LocationMap, render_tile, compose_map
+from snapshot import LocationSnapshot, write_snapshot
+from journal import JournalBackend
+from storage import MemoryBackend, PostgresBackend, SQLiteBackend, edited_location, portal_flag
 
 class Operator:
-    def __init__(self, local, config):
+    def __init__(self, local, config, storage=None):
         self.local  = local
         self.config = config
-        self.locations = []
 
-        # The table name that is used for locations
-        self.location_table_name = "LOCATIONZ"
+        # Where the locations are stored (in memory in dev mode, journaled to local disk or in a SQLite file if configured, PostgreSQL otherwise)
+        if storage is None:
+            if self.local:
+                storage = MemoryBackend()
+            elif self.config.JOURNAL_PATH:
+                storage = JournalBackend(self.config.JOURNAL_PATH, self.config.JOURNAL_FSYNC_INTERVAL, self.config.JOURNAL_COMPACT_BYTES)
+            elif self.config.SQLITE_PATH:
+                storage = SQLiteBackend(self.config.SQLITE_PATH)
+            else:
+                # Starting from a snapshot answers commands before the database is reachable, its connections are opened in the background (see keep_snapshot)
+                storage = PostgresBackend(self.config, prewarm=self.config.SNAPSHOT_PATH is None)
+
+        # Timings, error and row counts of every command and database call
+        self.telemetry = Metrics()
+
+        # Every call made to the storage backend is timed
+        self.storage = InstrumentedBackend(storage, self.telemetry)
+
+        # Worker threads that run blocking database calls off of the event loop.
+        # One worker per pooled connection (to the primary and to every read replica) so that workers never sit waiting on the pool.
+        self.executor = None
+        if not self.storage.in_memory:
+            pools = 1 + len(getattr(storage, "replica_pools", []))
+            self.executor = ThreadPoolExecutor(max_workers=self.config.DATABASE_POOL_MAX * pools, thread_name_prefix="operator-db")
+        elif isinstance(storage, JournalBackend):
+            # Journal writes can wait on the disk (an fsync per write with an interval of 0, the state being copied for a compaction),
+            # a single worker keeps them off of the event loop and still runs every call in the order it was made
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="operator-journal")
+
+        # Every guild's locations are kept apart, so each guild gets its own cache and indexes (guild ID -> cache/index)
+        # In-memory cache of location data read from the database, kept up to date on every write
+        self.caches = {}
+
+        # Grid index over the location coordinates for nearest location queries, built the first time it is needed
+        self.spatial_indexes = {}
+        # Graph of the Nether portals for finding the fastest way between locations, built the first time it is needed
+        self.travel_graphs = {}
+        # Rendered map tiles of the locations, along with when they need to be drawn again, built the first time they are needed
+        self.location_maps = {}
+        # Lock held while the in-memory indexes are built or written to, so no write is lost during a build
+        self.index_lock = threading.RLock()
+
+        # Worker processes drawing the maps, started the first time a map is asked for
+        self.render_pool = None
+        self.render_pool_lock = threading.Lock()
+
+        # Bus telling the other worker processes which guilds were written to, only set when running sharded
+        self.invalidations = None
+
+        # Guild ID -> amount of writes so far, to tell whether a guild was written to while it was being read
+        self.guild_writes = {}
+
+        # Snapshot of the locations saved by the last run, the caches start from it until the database confirmed them
+        self.snapshot = None
+        # Guilds of the snapshot that were not compared to the database yet
+        self.snapshot_pending = set()
+        # Where the snapshot is saved and the background thread checking and saving it
+        self.snapshot_path = None
+        self.snapshot_thread = None
+        self.snapshot_stop = threading.Event()
 
         # List of valid query vars for getting a location
         self.query_types = ["name", "author", "all"]
@@ -30,14 +110,345 @@ class Operator:
                                         }
                         }
 
-        # Dictionary to map the field_to_edit parameter to the actual name of the column in the sql table
-        self.field_map = { 'name' : 'name', 'x' : 'x_coord', 'y' : 'z_coord', 'z' : 'y_coord', 'desc' : 'description'}
+        # Amount of locations shown per page when listing locations
+        self.page_size = 10
+
+        # Maximum amount of locations in a distance matrix
+        self.matrix_max_size = 250
+
+        # Maximum amount of seconds spent improving a route
+        self.route_time_budget = 0.5
+
+        # Default and maximum amount of blocks shown around the centre of a map, in every direction
+        self.map_default_radius = 250
+        self.map_max_radius = 1000
+
+        # Values read every time the metrics are exported
+        self.telemetry.add_collector("cache", self.cache_stats)
+        self.telemetry.add_collector("storage", self.storage.stats)
+        self.telemetry.add_collector("travel", self.travel_stats)
+        self.telemetry.add_collector("maps", self.map_stats)
+
+    # Function to get the cache of a guild
+    def guild_cache(self, guild_id):
+        """Function to get the cache holding the locations of a guild, creating it the first time
+
+        Args:
+            guild_id (str): ID of the guild
+
+        Returns:
+            LocationCache: Returns the guild's cache
+        """
+        cache = self.caches.get(guild_id)
+
+        if cache is None:
+            with self.index_lock:
+                cache = self.caches.get(guild_id)
+
+                if cache is None:
+                    cache = LocationCache(self.config.LOCATION_CACHE_SIZE)
+                    self.warm_cache(guild_id, cache)
+                    self.caches[guild_id] = cache
+
+        return cache
+
+    # Function to fill a new cache from the snapshot
+    def warm_cache(self, guild_id, cache):
+        """Function to fill a guild's brand new cache with its locations from the last run's snapshot, if the database did not confirm them yet
+
+        Args:
+            guild_id         (str): ID of the guild
+            cache  (LocationCache): The guild's empty cache
+        """
+        if self.snapshot is None or guild_id not in self.snapshot_pending:
+            return
+
+        try:
+            found = self.snapshot.locations(guild_id)
+        except Exception as e:
+            print("WARN - Unable to read guild '{}' from the snapshot due to: {}".format(guild_id, e))
+            return
+
+        if found is None:
+            return
+
+        complete, locations = found
+
+        if complete:
+            cache.put_all(locations)
+        else:
+            for location in locations:
+                cache.put(location)
+
+    # Function to get the counters of every cache
+    def cache_stats(self):
+        """Function to add up the size and counters of every guild's cache
+
+        Returns:
+            dict: Returns the amount of guild caches, the amount of cached locations and the hit/miss/eviction counters
+        """
+        stats = {"guilds" : 0, "size" : 0, "hits" : 0, "misses" : 0, "evictions" : 0}
+
+        for cache in list(self.caches.values()):
+            cache_stats = cache.stats()
+            stats["guilds"] += 1
+            for key in ["size", "hits", "misses", "evictions"]:
+                stats[key] += cache_stats[key]
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+
+        return stats
+
+    # Function to get the counters of every travel graph
+    def travel_stats(self):
+        """Function to add up the size and counters of every guild's travel graph
+
+        Returns:
+            dict: Returns the amount of graphs, portals and cached trees and the tree cache hit/miss counters
+        """
+        stats = {"graphs" : 0, "portals" : 0, "trees" : 0, "hits" : 0, "misses" : 0}
+
+        for graph in list(self.travel_graphs.values()):
+            graph_stats = graph.stats()
+            stats["graphs"] += 1
+            for key in ["portals", "trees", "hits", "misses"]:
+                stats[key] += graph_stats[key]
+
+        return stats
+
+    # Function to get the counters of every location map
+    def map_stats(self):
+        """Function to add up the size and counters of every guild's map tile cache
+
+        Returns:
+            dict: Returns the amount of maps, mapped locations and cached tiles and the tile cache hit/miss counters
+        """
+        stats = {"maps" : 0, "locations" : 0, "tiles" : 0, "hits" : 0, "misses" : 0}
+
+        for location_map in list(self.location_maps.values()):
+            map_stats = location_map.stats()
+            stats["maps"] += 1
+            for key in ["locations", "tiles", "hits", "misses"]:
+                stats[key] += map_stats[key]
+
+        return stats
+
+    # Function to create the schema and indexes used by the bot's queries
+    def setup_database(self):
+        """Function to create the locations table and the indexes that the bot's queries rely on, if they do not exist yet
+
+        What gets created depends on the storage backend, see its setup function. Does nothing in local mode.
+
+        Returns:
+            bool: Returns whether the schema and indexes were created successfully
+        """
+        try:
+            self.storage.setup(self.config.LEGACY_GUILD_ID)
+        except Exception as e:
+            print("WARN - Unable to set up the database due to: {}".format(e))
+            return False
+
+        return True
+
+    # Function to release the storage and worker threads
+    def close(self):
+        """Function to stop the worker threads and close every database connection, used once the bot stops"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+        if self.render_pool is not None:
+            self.render_pool.shutdown(wait=True)
+
+        # Save what is cached for the next run, before the database connections go away
+        if self.snapshot_thread is not None:
+            self.snapshot_stop.set()
+            self.snapshot_thread.join()
+            self.snapshot_thread = None
+            self.save_snapshot()
+
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+        self.storage.close()
+
+    # Function to read the snapshot saved by the last run
+    def load_snapshot(self, path):
+        """Function to open the snapshot of the locations saved by the last run, so the caches can start from it
+
+        The snapshot is memory mapped and a guild's locations are only decoded once the guild is used.
+        Nothing is read from the database, see keep_snapshot for checking the snapshot against it.
+
+        Args:
+            path (str): Path of the snapshot file
+
+        Returns:
+            bool: Returns whether a snapshot was loaded
+        """
+        self.snapshot_path = path
+
+        if self.storage.in_memory or not os.path.exists(path):
+            return False
+
+        try:
+            snapshot = LocationSnapshot(path)
+        except (OSError, ValueError) as e:
+            print("WARN - Unable to load the snapshot '{}' due to: {}".format(path, e))
+            return False
+
+        with self.index_lock:
+            self.snapshot = snapshot
+            self.snapshot_pending = set(snapshot.guild_ids())
+
+        print("Loaded snapshot: {}".format(snapshot.stats()))
+
+        return True
+
+    # Function to check a guild of the snapshot against the database
+    def reconcile_guild(self, guild_id):
+        """Function to replace what the snapshot put in a guild's cache with the guild's locations from the database, if they differ
+
+        Raises:
+            Exception: If the locations could not be read from the database
+        """
+        with self.index_lock:
+            writes = self.guild_writes.get(guild_id, 0)
+
+        locations = self.storage.search_locations(guild_id, '', "all")
+
+        with self.index_lock:
+            self.snapshot_pending.discard(guild_id)
+
+            # Written to while being read, no way to tell which is newer so read everything again when needed
+            if self.guild_writes.get(guild_id, 0) != writes:
+                self.guild_invalidated(guild_id)
+                return
+
+            cache = self.guild_cache(guild_id)
+            complete, cached = cache.export()
+
+            if complete and {location["id"] : location for location in cached} == {location["id"] : location for location in locations}:
+                return
+
+            # Indexes built from the snapshot are out of date too
+            self.guild_invalidated(guild_id)
+            cache.put_all(locations)
+
+    # Function to keep the snapshot up to date in the background
+    def keep_snapshot(self, interval, setup_database=False):
+        """Function to start a background thread that checks every guild of the loaded snapshot against the database, then saves the snapshot every 'interval' seconds
+
+        Opens the database connections the Operator skipped when it was created, then retries until the database is reachable,
+        while the caches keep serving the snapshot.
+
+        Args:
+            interval          (float): Amount of seconds between two saves
+            setup_database     (bool): Flag to set up the database first, i.e. when the bot started without waiting for it (Default: False)
+        """
+        def keep():
+            delay = 1.0
+
+            while not self.snapshot_stop.is_set():
+                try:
+                    self.storage.prewarm()
+
+                    if setup_database:
+                        self.storage.setup(self.config.LEGACY_GUILD_ID)
+
+                    for guild_id in list(self.snapshot_pending):
+                        if self.snapshot_stop.is_set():
+                            return
+                        self.reconcile_guild(guild_id)
+
+                    break
+                except Exception as e:
+                    print("WARN - Unable to check the snapshot against the database, retrying in {:.0f}s due to: {}".format(delay, e))
+                    self.snapshot_stop.wait(delay)
+                    delay = min(delay * 2, 60.0)
+
+            # Every guild was checked, the snapshot is not needed anymore
+            with self.index_lock:
+                if self.snapshot is not None and len(self.snapshot_pending) == 0:
+                    self.snapshot.close()
+                    self.snapshot = None
+
+            while not self.snapshot_stop.wait(interval):
+                self.save_snapshot()
+
+        self.snapshot_stop.clear()
+        self.snapshot_thread = threading.Thread(target=keep, name="snapshot-keeper", daemon=True)
+        self.snapshot_thread.start()
+
+    # Function to save the snapshot
+    def save_snapshot(self):
+        """Function to save every cached location to the snapshot file, for the next run to start from
+
+        Guilds of the loaded snapshot that were not checked against the database yet are kept as they were.
+
+        Returns:
+            bool: Returns whether the snapshot was saved
+        """
+        if self.snapshot_path is None or self.storage.in_memory:
+            return False
+
+        guilds = {}
+
+        with self.index_lock:
+            for guild_id, cache in list(self.caches.items()):
+                complete, locations = cache.export()
+                if complete or len(locations) > 0:
+                    guilds[guild_id] = (complete, locations)
+
+            try:
+                for guild_id in self.snapshot_pending - set(guilds):
+                    found = self.snapshot.locations(guild_id)
+                    if found is not None:
+                        guilds[guild_id] = found
+            except Exception as e:
+                print("WARN - Unable to carry guilds over from the previous snapshot due to: {}".format(e))
+
+        try:
+            count = write_snapshot(self.snapshot_path, guilds)
+        except (OSError, TypeError, ValueError) as e:
+            print("ERROR while attempting to save the snapshot '{}' due to: {}".format(self.snapshot_path, e))
+            return False
+
+        print("Saved {} locations of {} guilds to the snapshot".format(count, len(guilds)))
+
+        return True
+
+    # Function to run a blocking operation without stalling the bot
+    async def run_async(self, func, *args, **kwargs):
+        """Function to await any of the Operator's blocking functions from a coroutine
+
+        When using the database the call runs on one of the Operator's worker threads, so the event loop
+        (and every other guild's commands) keeps going while the query is in flight. The amount of calls
+        running at once is bounded by the amount of workers, extra calls queue up until a worker frees up.
+        Calls on the journal run on its single worker, so waiting on the disk never stalls the event loop.
+        In dev mode everything is in memory so the call is simply made directly.
+
+        Args:
+            func (callable): The Operator function to call (i.e. op.get_location_data)
+            *args         : Positional arguments to pass to the function
+            **kwargs      : Keyword arguments to pass to the function
+
+        Returns:
+            Returns whatever the called function returns
+        """
+        if self.executor is None:
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
 
     # Function to add location data to a list or to a database
-    def add_location(self, name, user, x, y, z=0, desc="N/A"):
+    def add_location(self, guild_id, name, user, x, y, z=0, desc="N/A"):
         """Function to add a set of location data to the database or list of locations (depending on run mode)
 
         Args:
+            guild_id (str): ID of the guild the location is saved in
             name (str): Name of the potential new location entry
             x    (int): X coordinate of the potential location
             y    (int): Y coordinate of the potential location
@@ -47,38 +458,268 @@ class Operator:
         Returns:
             bool: Returns whether the addition of the new location data was successful
         """
-        # Saving to local memory in a list
-        if self.local:
-            # Create new location entry to add
-            new_location =  {
-                                "id"   : uuid.uuid4(),
-                                "name" : name,
-                                "author" : {"name" : user.name.split("#")[0], "discord_name" : user.name, "discord_id" : user.id},
-                                "coords" : { "x" : int(x), "y" : int(y), "z" : z },
-                                "desc" : desc
-                            }
-
-            # save the new location in the locations list
-            self.locations.append(new_location)
-        
-        # Saving to SQL database
-        else:
-            try:
-                # Connect to the PostgreSQL DB via the database URL stored in config
-                con = psycopg2.connect(self.config.DATABASE_URL, sslmode='require')
-                # Create cursor to perform commands
-                cur = con.cursor()
-                # Execute PostgreSQL command to add new location data
-                cur.execute("INSERT INTO {} (ID,NAME,AUTHOR,DISCORD_NAME,DISCORD_ID,X_COORD,Y_COORD,Z_COORD,DESCRIPTION) VALUES ('{}', '{}', '{}', '{}', '{}', {}, {}, {}, '{}')".format(self.location_table_name, uuid.uuid4(), self.quote_escape(name), self.quote_escape(user.name.split("#")[0]), self.quote_escape(user.name), user.id, int(x), int(y), int(z), self.quote_escape(desc)))
-                # Commit changes to the database and close connection to database
-                con.commit()
-                con.close()
-            except Exception as e:
-                print("Error adding new entry due to: {}".format(e))
-                return False
+        # Create new location entry to add
+        new_location = self.create_location(guild_id, name, user, x, y, z, desc)
+
+        try:
+            self.storage.add_location(new_location)
+        except Exception as e:
+            print("Error adding new entry due to: {}".format(e))
+            return False
+
+        # Write the new location through to the cache and indexes
+        self.location_added(new_location)
         
         return True
 
+    # Function to create the dict for a new location
+    def create_location(self, guild_id, name, user, x, y, z=0, desc="N/A"):
+        """Function to create the location data for a new location, with a freshly generated ID
+
+        Args:
+            guild_id (str): ID of the guild the location is saved in
+            name (str): Name of the new location entry
+            user (User): Discord user that is saving the location
+            x    (int): X coordinate of the location
+            y    (int): Y coordinate of the location
+            z    (int): Z coordinate of the location (default=0)
+            desc (str): Description text of the new location (default="N/A")
+
+        Returns:
+            dict: Returns the location data in a dictionary/map format
+        """
+        return  {
+                    "id"   : str(uuid.uuid4()),
+                    "name" : name,
+                    "author" : {"name" : user.name.split("#")[0], "id" : str(user.id), "discord_name" : user.name},
+                    "coords" : { "x" : int(x), "y" : int(y), "z" : int(z) },
+                    "desc" : desc,
+                    "portal" : False,
+                    "guild_id" : guild_id
+                }
+
+    # Function to read the locations out of an uploaded file
+    def parse_location_file(self, filename, data):
+        """Function to read the locations out of an uploaded CSV or JSON file
+
+        CSV files need a header row with the columns name, x, y, z and optionally desc.
+        JSON files hold a list of objects with those same keys (or an object with that list under 'locations').
+        Like the $save command, 'y' is the altitude. Files can be gzip compressed (i.e. files made by $export).
+
+        Args:
+            filename  (str): Name of the uploaded file, used to tell the format apart
+            data    (bytes): Content of the file
+
+        Returns:
+            list: Returns a list of (row number, dict of the row's fields) tuples
+
+        Raises:
+            ValueError: If the file is not a CSV or JSON file, or can not be read
+        """
+        # Decompress gzip files
+        if filename.lower().endswith(".gz"):
+            try:
+                data = gzip.decompress(data)
+            except (OSError, EOFError):
+                raise ValueError("The file is not a valid gzip file")
+
+            filename = filename[:-3]
+
+        try:
+            text = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValueError("The file is not UTF-8 encoded text")
+
+        if filename.lower().endswith(".json"):
+            try:
+                entries = json.loads(text)
+            except json.JSONDecodeError as e:
+                raise ValueError("The file is not valid JSON ({})".format(e))
+
+            if isinstance(entries, dict):
+                entries = entries.get("locations")
+
+            if not isinstance(entries, list):
+                raise ValueError("The JSON file must hold a list of locations")
+
+            rows = [(i + 1, entry) for i, entry in enumerate(entries)]
+
+        elif filename.lower().endswith(".csv"):
+            reader = csv.DictReader(io.StringIO(text))
+
+            # Make the column names case and whitespace insensitive
+            if reader.fieldnames is None:
+                raise ValueError("The CSV file is empty")
+            reader.fieldnames = [field.strip().lower() for field in reader.fieldnames]
+
+            missing = [field for field in ["name", "x", "y", "z"] if field not in reader.fieldnames]
+            if len(missing) > 0:
+                raise ValueError("The CSV file is missing the column(s): {}".format(", ".join(missing)))
+
+            rows = [(reader.line_num, entry) for entry in reader]
+
+        else:
+            raise ValueError("Only .csv and .json files can be imported")
+
+        return rows
+
+    # Function to save a whole batch of locations at once
+    def import_locations(self, guild_id, user, rows):
+        """Function to validate and save a batch of locations read from a file, in a single transaction
+
+        Rows that are invalid, that use a name already taken by an existing location or that repeat
+        the name of an earlier row are skipped and reported. Existing names are checked with a single query.
+
+        Args:
+            guild_id  (str): ID of the guild the locations are saved in
+            user     (User): Discord user that is importing the locations
+            rows     (list): List of (row number, dict of the row's fields) tuples, as returned by parse_location_file
+
+        Returns:
+            int or bool, list: Returns the amount of locations imported (False if saving failed) and a list of (row number, reason) tuples for every skipped row
+        """
+        errors = []
+        new_locations = []
+        # Location name -> row number it was first seen on
+        seen = {}
+
+        for row_number, entry in rows:
+            if not isinstance(entry, dict):
+                errors.append((row_number, "Not a location"))
+                continue
+
+            name = entry.get("name")
+            x, y, z = entry.get("x"), entry.get("y"), entry.get("z")
+            desc = entry.get("desc") or "N/A"
+
+            # Same checks as the save command, 'y' in the file is the altitude
+            if name is None or len(str(name).strip()) == 0 or not self.verify_location_data(name, x, z, y, desc):
+                errors.append((row_number, "Invalid location data"))
+                continue
+
+            name = str(name).strip()
+
+            if name in seen:
+                errors.append((row_number, "Same name as row {}".format(seen[name])))
+                continue
+
+            seen[name] = row_number
+            new_locations.append((row_number, self.create_location(guild_id, name, user, x, z, y, str(desc))))
+
+        # Check every name against the existing locations at once
+        existing = self.existing_location_names(guild_id, list(seen.keys()))
+
+        if existing == False:
+            return False, errors
+
+        for row_number, location in new_locations:
+            if location["name"] in existing:
+                errors.append((row_number, "A location already exists under the name '{}'".format(location["name"])))
+
+        new_locations = [location for _, location in new_locations if location["name"] not in existing]
+        errors.sort(key=lambda error: error[0])
+
+        if len(new_locations) == 0:
+            return 0, errors
+
+        try:
+            # Every location is saved in one transaction
+            self.storage.add_locations(new_locations)
+        except Exception as e:
+            print("ERROR while attempting to import {} locations due to: {}".format(len(new_locations), e))
+            return False, errors
+
+        # Write the new locations through to the cache and indexes
+        for location in new_locations:
+            self.location_added(location)
+
+        return len(new_locations), errors
+
+    # Function to go over every location without loading them all at once
+    def iter_locations(self, guild_id, chunk_size=1000):
+        """Function to go over every location of a guild, chunk by chunk, ordered by name
+
+        When using PostgreSQL the rows are read through a server-side cursor, so only one chunk of rows is
+        ever held in memory no matter how big the table is.
+
+        Args:
+            guild_id   (str): ID of the guild the locations belong to
+            chunk_size (int): Amount of locations per chunk (Default: 1000)
+
+        Returns:
+            generator: Yields lists of at most 'chunk_size' location data
+        """
+        return self.storage.iter_locations(guild_id, chunk_size)
+
+    # Function to write every location to a compressed file
+    def export_locations(self, guild_id, file_format="csv"):
+        """Function to write every location of a guild to a gzip compressed CSV or JSON file
+
+        Locations are streamed from iter_locations straight into the compressed file, so memory use stays
+        flat however many locations there are. The file uses the same columns $import reads ('y' is the altitude).
+
+        Args:
+            guild_id    (str): ID of the guild the locations belong to
+            file_format (str): Format of the file, either 'csv' or 'json' (Default: 'csv')
+
+        Returns:
+            str or bool, int: Returns the path of the temporary file (False if exporting failed) and the amount of locations written. The caller removes the file.
+        """
+        if file_format not in ["csv", "json"]:
+            return False, 0
+
+        count = 0
+        export_file = tempfile.NamedTemporaryFile(suffix=".{}.gz".format(file_format), delete=False)
+        export_file.close()
+
+        try:
+            with gzip.open(export_file.name, "wt", encoding="utf-8", newline="") as out:
+                if file_format == "csv":
+                    writer = csv.writer(out)
+                    writer.writerow(["name", "x", "y", "z", "desc", "author"])
+                else:
+                    out.write('{"locations": [')
+
+                for chunk in self.iter_locations(guild_id):
+                    for location in chunk:
+                        row = [location["name"], location["coords"]["x"], location["coords"]["z"], location["coords"]["y"], location["desc"], location["author"]["name"]]
+
+                        if file_format == "csv":
+                            writer.writerow(row)
+                        else:
+                            out.write("{}\n{}".format("," if count > 0 else "", json.dumps(dict(zip(["name", "x", "y", "z", "desc", "author"], row)))))
+
+                        count += 1
+
+                if file_format == "json":
+                    out.write("\n]}\n")
+        except Exception as e:
+            print("ERROR while attempting to export locations due to: {}".format(e))
+            os.remove(export_file.name)
+            return False, 0
+
+        return export_file.name, count
+
+    # Function to check which names are already used
+    def existing_location_names(self, guild_id, names):
+        """Function to find which of the given names are already used by saved locations
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            names   (list): Location names to check
+
+        Returns:
+            set or bool: Returns the set of names that are already used, returns False if the check failed
+        """
+        if len(names) == 0:
+            return set()
+
+        try:
+            return self.storage.existing_location_names(guild_id, names)
+        except Exception as e:
+            print("ERROR: Unable to check for existing location names due to: {}".format(e))
+            return False
+
     # Function to verify required arguments of location data
     def verify_location_data(self, name, x, y, z, desc):
         """Function to verify a set of location data from the database
@@ -109,13 +750,14 @@ class Operator:
             return True
     
     # Function to get location data
-    def get_location_data(self, search_token, query="name"):
+    def get_location_data(self, guild_id, search_token, query="name"):
         """Function to retrieve a set of location data from the database (or from the dictionary if in local mode)
 
         Searches based on either location name or by author name.
         By default it searches based on location name unless specified for author name.
 
         Args:
+            guild_id     (str): ID of the guild the location belongs to
             search_token (str): Name of what is being searched for
             query        (str): Query method, i.e. search by location name or by author name (Default: location name)
         
@@ -127,145 +769,163 @@ class Operator:
             print("Unsupported query type {}, supported query types are {}".format(query, ",".join(self.query_types)))
             return False
 
-        # Using local dict storage
-        if self.local:
-            # Placeholder for location data that we are looking for
-            searched_location_data = None
+        # Case for search by users name, grab the first location they saved
+        if query == "author":
+            results = self.storage.get_locations_by_author(guild_id, search_token)
 
-            # Traverse all location entries to search for the proper location
-            for entry in self.locations:
-                # Case for serach by location name
-                if query == "name":
-                    if search_token == entry["name"]:
-                        searched_location_data = entry
-                        break
-
-                # Case for search by users name
-                elif query == "author":
-                    if search_token == entry["author"]["name"]:
-                        searched_location_data = entry
-                        break
-
-            if searched_location_data is None:
-                print("WARN - No location data found for search of {}: {}".format(query, search_token))
-        
-        # Using SQL DB
-        else:
-            # Connect to the database
-            con = psycopg2.connect(self.config.DATABASE_URL, sslmode='require')
-            # Create cursor to perform commands
-            cur = con.cursor()
-
-            # Search for location with given name
-            cur.execute("SELECT name, author, discord_id, x_coord, y_coord, z_coord, description, id FROM {} WHERE name='{}'".format(self.location_table_name, self.quote_escape(search_token)))
-
-            # Fetch all results
-            results = cur.fetchall()
-            
-            # Check if results are empty, if so then no location was found
             if len(results) == 0:
-                searched_location_data = None
-            # Check if we got more than one result, if so return False, something not right...
-            elif len(results) > 1:
-                searched_location_data = False
-            else:
-                # Grab first item
-                first_res = results[0]
+                print("WARN - No location data found for search of {}: {}".format(query, search_token))
+                return None
+
+            return results[0]
 
-                # Create new dict for the retrieved location
-                searched_location_data =  {
-                                    "name" : self.quote_escape(first_res[0], escape=False),
-                                    "author" : {"name" : self.quote_escape(first_res[1], escape=False), "id" : first_res[2]},
-                                    "coords" : { "x" : first_res[3], "y" : first_res[4], "z" : first_res[5] },
-                                    "desc" : self.quote_escape(first_res[6], escape=False),
-                                    "id" : first_res[7]
-                                }
+        # Serve the location from the cache if it is there (the in-memory store needs no cache)
+        if not self.storage.in_memory:
+            cached = self.guild_cache(guild_id).get(search_token)
+            if cached is not None:
+                return cached
 
-            # Close DB connection
-            con.close()
+        # Search for location with given name
+        writes = self.write_count(guild_id)
+        results = self.storage.get_locations_by_name(guild_id, search_token)
+
+        # Check if results are empty, if so then no location was found
+        if len(results) == 0:
+            print("WARN - No location data found for search of {}: {}".format(query, search_token))
+            searched_location_data = None
+        # Check if we got more than one result, if so return False, something not right...
+        elif len(results) > 1:
+            searched_location_data = False
+        else:
+            searched_location_data = results[0]
+
+            # Keep it around for the next lookup
+            if not self.storage.in_memory:
+                self.cache_read(guild_id, writes, lambda cache: cache.put(searched_location_data))
 
         return searched_location_data
 
-    # Function to remove a location entry based on the ID that it was given...
-    def remove_location_data(self, id):
-        """Function to remove a set of location data based on its ID within the database
+    # Function to get the location data of several locations at once
+    def get_locations_by_names(self, guild_id, names):
+        """Function to retrieve the location data of every given location name in a single lookup
+
+        Names found in the cache are served from it, every other name is looked up in one query.
 
         Args:
-            id (str): ID of the set of location data to remove
+            guild_id (str): ID of the guild the locations belong to
+            names   (list): Names of the locations to retrieve
 
         Returns:
-            bool: Returns whether the removal was successful or not
+            dict or bool: Returns a dict of name -> location data (None if no location was found, False if more than one was), returns False if the lookup failed
         """
-        # Local testing case
-        if self.local:
-            print("Oops, remove for local mode (i.e. --dev mode) is unsupported. Either implement it or deal with it.")
-            pass
-        
-        # Using PostgreSQL
-        else:
+        found = {}
+        missing = []
+        cache = None if self.storage.in_memory else self.guild_cache(guild_id)
+
+        for name in names:
+            cached = None if cache is None else cache.get(name)
+
+            if cached is not None:
+                found[name] = cached
+            elif name not in missing:
+                missing.append(name)
+
+        if len(missing) > 0:
+            writes = self.write_count(guild_id)
+
             try:
-                # Connect to the database
-                con = psycopg2.connect(self.config.DATABASE_URL, sslmode='require')
-                # Create cursor to perform commands
-                cur = con.cursor()
-                # Delete location entry based on the ID
-                cur.execute("DELETE from {} where ID='{}'".format(self.location_table_name, id))
-                # Commit DB changes
-                con.commit()
-                # Close DB connection
-                con.close()
+                results = self.storage.get_locations_by_names(guild_id, missing)
             except Exception as e:
-                print("ERROR while attempting to remove location with ID {} due to: {}".format(id, e))
+                print("ERROR: Unable to retrieve locations {} due to: {}".format(", ".join(missing), e))
                 return False
+
+            read = []
+
+            for name in missing:
+                matches = [location for location in results if location["name"] == name]
+
+                # Same rules as get_location_data
+                if len(matches) == 0:
+                    print("WARN - No location data found for search of name: {}".format(name))
+                    found[name] = None
+                elif len(matches) > 1:
+                    found[name] = False
+                else:
+                    found[name] = matches[0]
+                    read.append(matches[0])
+
+            # Keep them around for the next lookup
+            def fill(cache):
+                for location in read:
+                    cache.put(location)
+
+            if cache is not None and len(read) > 0:
+                self.cache_read(guild_id, writes, fill)
+
+        return found
+
+    # Function to remove a location entry based on the ID that it was given...
+    def remove_location_data(self, guild_id, id):
+        """Function to remove a set of location data based on its ID within the database
+
+        Args:
+            guild_id (str): ID of the guild the location belongs to
+            id       (str): ID of the set of location data to remove
+
+        Returns:
+            bool: Returns whether the removal was successful or not
+        """
+        try:
+            # Delete location entry based on the ID
+            self.storage.remove_location(guild_id, id)
+        except Exception as e:
+            print("ERROR while attempting to remove location with ID {} due to: {}".format(id, e))
+            return False
+
+        # Drop the removed location from the cache and indexes
+        self.location_removed(guild_id, id)
         
         return True
     
     # Function to remove a location entry based on the ID that it was given...
-    def edit_location_data(self, id, field_to_edit, edit):
+    def edit_location_data(self, guild_id, id, field_to_edit, edit):
         """Function to edit a field within the location data based on its ID within the database
 
         Args:
+            guild_id      (str): ID of the guild the location belongs to
             id            (str): ID of the set of location data to remove
-            field_to_edit (str): Name of the field to edit, can only be one of the following 'name', 'x', 'y', 'z', 'desc'
+            field_to_edit (str): Name of the field to edit, can only be one of the following 'name', 'x', 'y', 'z', 'desc', 'portal'
             edit          (str): The new value to edit the field with
 
         Returns:
             bool: Returns whether the edit was successful or not
         """
 
-        # Local testing case
-        if self.local:
-            print("Oops, remove for local mode (i.e. --dev mode) is unsupported. Either implement it or deal with it.")
-            pass
-        
-        # Using PostgreSQL
-        else:
-            try:
-                # Connect to the database
-                con = psycopg2.connect(self.config.DATABASE_URL, sslmode='require')
-                # Create cursor to perform commands
-                cur = con.cursor()
-                # Delete location entry based on the ID
-                print("UPDATE {} SET {}='{}' where ID='{}'".format(self.location_table_name, self.field_map[field_to_edit], edit, id))
-                cur.execute("UPDATE {} SET {}='{}' where ID='{}'".format(self.location_table_name, self.field_map[field_to_edit], edit, id))
-                # Commit DB changes
-                con.commit()
-                # Close DB connection
-                con.close()
-            except Exception as e:
-                print("ERROR while attempting to edit location with ID {} due to: {}".format(id, e))
-                return False
+        try:
+            # The portal flag is stored as a boolean
+            if field_to_edit == "portal":
+                edit = portal_flag(edit)
+
+            # Edit location entry based on the ID
+            self.storage.edit_location(guild_id, id, field_to_edit, edit)
+        except Exception as e:
+            print("ERROR while attempting to edit location with ID {} due to: {}".format(id, e))
+            return False
+
+        # Apply the same edit to the cached and indexed location
+        self.location_edited(guild_id, id, lambda location: edited_location(location, field_to_edit, edit), field_to_edit)
         
         return True
     
     # Function to search for locations based on search token and query type
-    def search_locations(self, search_token, query="name"):
+    def search_locations(self, guild_id, search_token, query="name"):
         """Function to search for location data from the database based on a given search token (or from the dictionary if in local mode)
 
         Searches based on either location name or by author name or to just retrieve all location data from the DB
         By default it searches based on location name unless specified for author name or all.
 
         Args:
+            guild_id     (str): ID of the guild the locations belong to
             search_token (str): Name of what is being searched for
             query        (str): Query method, i.e. search by location name or by author name (Default: location name)
         
@@ -277,68 +937,485 @@ class Operator:
             print("Unsupported query type {}, supported query types are {}".format(query, ",".join(self.query_types)))
             return False
 
-        # List to hold all found results
-        found_locations = []
-
-        # Local dictionary, dev mode
-        if self.local:
-            # Traverse all location entries to search for the proper location
-            for entry in self.locations:
-                # Case for serach by location name
-                if query == "name":
-                    # Soft search, check if search key appears in location name 
-                    if search_token in entry["name"]:
-                        found_locations.append(entry)
-
-                # Case for search by users name
-                elif query == "author":
-                    # Strict search, search key must be identical to current author name
-                    if search_token == entry["author"]["name"]:
-                        found_locations.append(entry)
-        
-        # SQL DATABASE METHOD
-        else:
-            try:
-                # Connect to the database
-                con = psycopg2.connect(self.config.DATABASE_URL, sslmode='require')
-                # Create cursor to perform commands
-                cur = con.cursor()
-
-                # Search for location based on location name
-                if query == "name":
-                    cur.execute("SELECT name, author, x_coord, y_coord, z_coord, description FROM {} WHERE UPPER(name) LIKE UPPER('%{}%')".format(self.location_table_name, search_token))
-                
-                # Search for location based on author name
-                elif query == "author":
-                    cur.execute("SELECT name, author, x_coord, y_coord, z_coord, description FROM {} WHERE UPPER(author) LIKE UPPER('%{}%')".format(self.location_table_name, search_token))
-                
-                # Retrieve all locations
-                elif query == "all":
-                    cur.execute("SELECT name, author, x_coord, y_coord, z_coord, description FROM {}".format(self.location_table_name))
-
-                # Fetch all results
-                rows = cur.fetchall()
-                # Close DB connection
-                con.close()
+        # Serve the full list of locations from the cache if it is there
+        if query == "all" and not self.storage.in_memory:
+            cached = self.guild_cache(guild_id).get_all()
+            if cached is not None:
+                return cached
+
+        writes = self.write_count(guild_id)
+
+        try:
+            found_locations = self.storage.search_locations(guild_id, search_token, query)
+        except Exception as e:
+            print("ERROR: Unable to search for locations with key '{}' in mode '{}' due to: {}".format(search_token, query, e))
+            return False
+
+        # Keep the full list around for the next time it is needed
+        if query == "all" and not self.storage.in_memory:
+            self.cache_read(guild_id, writes, lambda cache: cache.put_all(found_locations))
+        
+        return found_locations
+
+    # Function to count the writes made to a guild
+    def write_count(self, guild_id):
+        """Function to get how many times a guild's locations were written to, to tell whether a read raced a write
+
+        Args:
+            guild_id (str): ID of the guild
+
+        Returns:
+            int: Returns the amount of writes so far
+        """
+        with self.index_lock:
+            return self.guild_writes.get(guild_id, 0)
+
+    # Function to cache what was read from the storage
+    def cache_read(self, guild_id, writes, fill):
+        """Function to put locations read from the storage in a guild's cache, unless the guild was written to since the read started
+
+        A write landing while the read runs may not be in what it returned, caching the read would then undo the write in the cache.
+
+        Args:
+            guild_id       (str): ID of the guild the locations belong to
+            writes         (int): Amount of writes made to the guild before the read started (see write_count)
+            fill      (callable): Function that takes the guild's cache and puts the read locations in it
+
+        Returns:
+            bool: Returns whether the locations were cached
+        """
+        with self.index_lock:
+            if self.guild_writes.get(guild_id, 0) != writes:
+                return False
+
+            fill(self.guild_cache(guild_id))
+
+            return True
+
+    # Function to keep the in-memory data up to date with an added location
+    def location_added(self, location, publish=True):
+        """Function to write a newly saved location through to its guild's cache and every in-memory index
+
+        Args:
+            location (dict): Location data that was saved
+            publish  (bool): Flag to tell the other worker processes about it (Default: True)
+        """
+        guild_id = location["guild_id"]
+
+        with self.index_lock:
+            self.guild_writes[guild_id] = self.guild_writes.get(guild_id, 0) + 1
+
+            # The in-memory store keeps its own indexes up to date
+            if not self.storage.in_memory:
+                self.guild_cache(guild_id).add(location)
+
+            if guild_id in self.spatial_indexes:
+                self.spatial_indexes[guild_id].insert(location)
+
+            if guild_id in self.travel_graphs:
+                self.travel_graphs[guild_id].location_added(location)
+
+            if guild_id in self.location_maps:
+                self.location_maps[guild_id].location_added(location)
+
+        if publish:
+            self.publish_invalidation(guild_id)
+
+    # Function to keep the in-memory data up to date with an edited location
+    def location_edited(self, guild_id, id, edit_func, field_to_edit=None, publish=True):
+        """Function to write an edited location through to its guild's cache and every in-memory index
+
+        Args:
+            guild_id       (str): ID of the guild the location belongs to
+            id             (str): ID of the location that was edited
+            edit_func (callable): Function that takes the old location data and returns the edited location data
+            field_to_edit  (str): Name of the field that was edited, None if unknown (Default: None)
+            publish       (bool): Flag to tell the other worker processes about it (Default: True)
+        """
+        with self.index_lock:
+            self.guild_writes[guild_id] = self.guild_writes.get(guild_id, 0) + 1
+
+            if not self.storage.in_memory:
+                self.guild_cache(guild_id).update(id, edit_func, field_to_edit)
+
+            if guild_id in self.spatial_indexes:
+                try:
+                    self.spatial_indexes[guild_id].update(id, edit_func)
+                except (ValueError, TypeError):
+                    # Could not mirror the edit, rebuild the index next time it is needed
+                    del self.spatial_indexes[guild_id]
+
+            if guild_id in self.travel_graphs:
+                # Locations that became (or stopped being) a portal change the whole graph, rebuild it next time it is needed
+                if field_to_edit is None or field_to_edit == "portal":
+                    del self.travel_graphs[guild_id]
+                else:
+                    try:
+                        self.travel_graphs[guild_id].location_edited(id, edit_func)
+                    except (ValueError, TypeError):
+                        del self.travel_graphs[guild_id]
+
+            if guild_id in self.location_maps:
+                try:
+                    self.location_maps[guild_id].location_edited(id, edit_func)
+                except (ValueError, TypeError):
+                    del self.location_maps[guild_id]
+
+        if publish:
+            self.publish_invalidation(guild_id)
+
+    # Function to keep the in-memory data up to date with a removed location
+    def location_removed(self, guild_id, id, publish=True):
+        """Function to remove a deleted location from its guild's cache and every in-memory index
+
+        Args:
+            guild_id (str): ID of the guild the location belonged to
+            id       (str): ID of the location that was removed
+            publish (bool): Flag to tell the other worker processes about it (Default: True)
+        """
+        with self.index_lock:
+            self.guild_writes[guild_id] = self.guild_writes.get(guild_id, 0) + 1
+
+            if not self.storage.in_memory:
+                self.guild_cache(guild_id).remove(id)
+
+            if guild_id in self.spatial_indexes:
+                self.spatial_indexes[guild_id].remove(id)
+
+            if guild_id in self.travel_graphs:
+                self.travel_graphs[guild_id].location_removed(id)
+
+            if guild_id in self.location_maps:
+                self.location_maps[guild_id].location_removed(id)
+
+        if publish:
+            self.publish_invalidation(guild_id)
+
+    # Function to tell the other worker processes about a write
+    def publish_invalidation(self, guild_id):
+        """Function to tell the other worker processes that a guild's locations changed, if running sharded
+
+        Args:
+            guild_id (str): ID of the guild that was written to
+        """
+        if self.invalidations is not None:
+            self.invalidations.publish(guild_id)
+
+    # Function to forget what is kept in memory about a guild
+    def guild_invalidated(self, guild_id):
+        """Function to drop a guild's cached locations and in-memory indexes after another worker process wrote to them
+
+        Everything is read back from the database the next time it is needed.
+
+        Args:
+            guild_id (str): ID of the guild that was written to
+        """
+        with self.index_lock:
+            self.guild_writes[guild_id] = self.guild_writes.get(guild_id, 0) + 1
+
+            if guild_id in self.caches:
+                self.caches[guild_id].clear()
+
+            self.spatial_indexes.pop(guild_id, None)
+            self.travel_graphs.pop(guild_id, None)
+            self.location_maps.pop(guild_id, None)
+
+    # Function to start following the changes made by other bot instances
+    def listen_for_changes(self):
+        """Function to keep the caches and indexes up to date with the locations other bot instances add, edit and remove
+
+        Only does something when the storage backend can be told about changes (i.e. PostgreSQL's LISTEN/NOTIFY).
+
+        Returns:
+            bool: Returns whether the changes are being followed
+        """
+        return self.storage.listen(self.apply_change) is not None
+
+    # Function to apply a change made by another bot instance
+    def apply_change(self, change):
+        """Function to apply a location another bot instance added, edited or removed to the caches and indexes
+
+        Only that location is touched when the change comes with the location data, the whole guild is dropped otherwise.
+        Other worker processes receive the same change themselves, so it is not passed on to them.
+
+        Args:
+            change (dict): Change, see PostgresChangeListener. None when changes may have been missed, which drops everything
+        """
+        if change is None:
+            for guild_id in set(self.caches) | set(self.spatial_indexes) | set(self.travel_graphs) | set(self.location_maps):
+                self.guild_invalidated(guild_id)
+            return
+
+        guild_id = change["guild_id"]
+
+        # The read replicas may not have the change yet, read the guild from the primary until they caught up
+        self.storage.stick_to_primary(guild_id)
+
+        if change["op"] == "DELETE":
+            self.location_removed(guild_id, change["id"], publish=False)
+        elif change["location"] is not None:
+            # Whatever was kept of the old version of the location goes first, moves and renames included
+            self.location_removed(guild_id, change["id"], publish=False)
+            self.location_added(change["location"], publish=False)
+        else:
+            self.guild_invalidated(guild_id)
+
+    # Function to get the spatial index, building it if needed
+    def get_spatial_index(self, guild_id):
+        """Function to get the spatial index over all locations of a guild, building it from every location the first time
+
+        Args:
+            guild_id (str): ID of the guild
+
+        Returns:
+            SpatialIndex or None: Returns the spatial index, None if the locations could not be retrieved
+        """
+        with self.index_lock:
+            if guild_id not in self.spatial_indexes:
+                # Grab every location to index
+                locations = self.search_locations(guild_id, '', query="all")
+
+                if locations == False:
+                    return None
+
+                index = SpatialIndex()
+                for location in locations:
+                    index.insert(location)
+
+                self.spatial_indexes[guild_id] = index
+
+            return self.spatial_indexes[guild_id]
+
+    # Function to get the travel graph, building it if needed
+    def get_travel_graph(self, guild_id):
+        """Function to get the graph of a guild's Nether portals, building it from every portal the first time
+
+        Args:
+            guild_id (str): ID of the guild
+
+        Returns:
+            TravelGraph or None: Returns the travel graph, None if the portals could not be retrieved
+        """
+        with self.index_lock:
+            if guild_id not in self.travel_graphs:
+                try:
+                    portals = self.storage.get_portal_locations(guild_id)
+                except Exception as e:
+                    print("ERROR: Unable to retrieve the portal locations due to: {}".format(e))
+                    return None
+
+                graph = TravelGraph()
+                graph.set_portals(portals)
+
+                self.travel_graphs[guild_id] = graph
+
+            return self.travel_graphs[guild_id]
+
+    # Function to get the map of a guild, building it if needed
+    def get_location_map(self, guild_id):
+        """Function to get the map of a guild's locations, building it from every location the first time
+
+        Args:
+            guild_id (str): ID of the guild
+
+        Returns:
+            LocationMap or None: Returns the location map, None if the locations could not be retrieved
+        """
+        with self.index_lock:
+            if guild_id not in self.location_maps:
+                locations = self.search_locations(guild_id, '', query="all")
+
+                if locations == False:
+                    return None
+
+                location_map = LocationMap()
+                location_map.set_locations(locations)
+
+                self.location_maps[guild_id] = location_map
+
+            return self.location_maps[guild_id]
+
+    # Function to get the worker processes drawing the maps
+    def get_render_pool(self):
+        """Function to get the pool of worker processes the maps are drawn in, starting it the first time
+
+        Returns:
+            ProcessPoolExecutor: Returns the render pool
+        """
+        with self.render_pool_lock:
+            if self.render_pool is None:
+                # Workers start from a fresh interpreter, nothing (i.e. database connections) is inherited from the bot
+                self.render_pool = ProcessPoolExecutor(max_workers=self.config.MAP_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+            return self.render_pool
+
+    # Function to draw the map around a point
+    async def render_map(self, guild_id, x, y, radius=None):
+        """Function to draw a map of the saved locations around a point
+
+        Tiles that did not change since they were last drawn come from the guild's tile cache, the others are
+        drawn in the render worker processes so the bot keeps answering other commands in the meantime.
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            x        (int): X coordinate of the centre of the map
+            y        (int): Y coordinate of the centre of the map (NOTE: This is the z coordinate in minecraft)
+            radius   (int): Amount of blocks shown around the centre in every direction (Default: map_default_radius)
+
+        Returns:
+            bool, bytes or str, int: Returns whether the map was drawn, the map as a PNG image or a message as to why it was not, and the amount of locations on it
+        """
+        radius = self.map_default_radius if radius is None else int(radius)
+
+        if radius <= 0 or radius > self.map_max_radius:
+            return False, "The radius must be between 1 and {} blocks".format(self.map_max_radius), 0
+
+        x, y = int(x), int(y)
+
+        location_map = await self.run_async(self.get_location_map, guild_id)
+
+        if location_map is None:
+            return False, "Locations could not be retrieved", 0
+
+        tiles, missing = location_map.tiles(x, y, radius)
+
+        loop = asyncio.get_running_loop()
+        pool = self.get_render_pool()
+
+        try:
+            rendered = await asyncio.gather(*(loop.run_in_executor(pool, render_tile, tile, points) for tile, _, points in missing))
+
+            for (tile, version, _), png in zip(missing, rendered):
+                location_map.put_tile(tile, version, png)
+                tiles[tile] = png
+
+            image = await loop.run_in_executor(pool, compose_map, tiles, x, y, radius)
+        except Exception as e:
+            print("ERROR while attempting to draw the map around ({}, {}) due to: {}".format(x, y, e))
+
+            # A render worker died (i.e. ran out of memory), start a new pool next time
+            if isinstance(e, BrokenProcessPool):
+                with self.render_pool_lock:
+                    if self.render_pool is pool:
+                        self.render_pool = None
+                pool.shutdown(wait=False)
+
+            return False, "The map could not be drawn", 0
+
+        return True, image, location_map.count(x, y, radius)
+
+    # Function to find the fastest way between two locations
+    def fastest_route(self, guild_id, from_name, to_name, mode="run"):
+        """Function to find the fastest way to travel between two locations, going through the Nether when it is faster
+
+        Args:
+            guild_id  (str): ID of the guild the locations belong to
+            from_name (str): Name of the location to start from
+            to_name   (str): Name of the location to go to
+            mode      (str): How to travel, either 'walk', 'run' or 'horse' (Default: 'run')
+
+        Returns:
+            bool, tuple or str: Returns whether a route was found and a (legs, seconds, overworld seconds) tuple or a message as to why it was not.
+            Every leg is a (from name, to name, dimension, blocks, seconds) tuple, overworld seconds is the time it takes in a straight line without portals.
+        """
+        speeds = { "walk" : self.metrics["speed"]["player"]["walk"], "run" : self.metrics["speed"]["player"]["run"], "horse" : self.metrics["speed"]["horse"]["walk"] }
+
+        if mode not in speeds:
+            return False, "'{}' is not a way to travel, please choose one of: {}".format(mode, ", ".join(speeds.keys()))
+
+        # Retrieve both locations from database at once
+        locations = self.get_locations_by_names(guild_id, [from_name, to_name])
+
+        if locations == False:
+            return False, "Locations could not be retrieved"
+
+        # Ensure both locations were found properly
+        if not locations[from_name]:
+            return False, "First location could not be found"
+        if not locations[to_name]:
+            return False, "Second location could not be found"
+
+        graph = self.get_travel_graph(guild_id)
+
+        if graph is None:
+            return False, "Portals could not be retrieved"
+
+        source, target = locations[from_name], locations[to_name]
+        seconds, legs = graph.route(source, target, speeds[mode])
+
+        overworld = math.hypot(source["coords"]["x"] - target["coords"]["x"], source["coords"]["y"] - target["coords"]["y"]) / speeds[mode]
+
+        return True, (legs, seconds, overworld)
+
+    # Function to find the locations closest to a set of coordinates
+    def nearest_locations(self, guild_id, x, y, k=5):
+        """Function to find the k saved locations closest to the given coordinates
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            x (int): X coordinate to search around
+            y (int): Y coordinate to search around (NOTE: This is the z coordinate in minecraft)
+            k (int): Amount of locations to return (Default: 5)
+
+        Returns:
+            list or bool: Returns a list of (distance, location) tuples sorted closest first, returns False if the locations could not be retrieved
+        """
+        index = self.get_spatial_index(guild_id)
+
+        if index is None:
+            return False
+
+        return index.nearest(int(x), int(y), int(k))
+
+    # Function to get a single page of locations
+    def search_locations_page(self, guild_id, search_token, query="name", cursor=None, backwards=False, page_size=None):
+        """Function to get one page of the locations matching a search, ordered by name
+
+        Uses keyset pagination: instead of an offset, the page starts right after (or right before) the
+        (name, id) key of the last (or first) location shown, so every page costs the same no matter how deep it is.
+
+        Args:
+            guild_id      (str): ID of the guild the locations belong to
+            search_token  (str): Name of what is being searched for
+            query         (str): Query method, i.e. search by location name, by author name or 'all' locations (Default: location name)
+            cursor      (tuple): (name, id) key to start the page after, None for the first page (Default: None)
+            backwards    (bool): Flag to get the page before the cursor instead of after it (Default: False)
+            page_size     (int): Amount of locations on the page (Default: self.page_size)
+
+        Returns:
+            tuple or bool: Returns the page's list of location data and whether more locations follow in that direction, returns False if it's an illegal query or the search failed
+        """
+        # Handle case of unsupported query data
+        if query not in self.query_types:
+            print("Unsupported query type {}, supported query types are {}".format(query, ",".join(self.query_types)))
+            return False
+
+        if page_size is None:
+            page_size = self.page_size
 
-            except Exception as e:
-                print("ERROR: Unable to search for locations with key '{}' in mode '{}' due to: {}".format(search_token, query, e))
-                return False
-            
-            # Iterate over each search result, create dict and add to list
-            for row in rows:
-                # Create new dict for the retrieved location
-                searched_location_data =  {
-                                    "name" : self.quote_escape(row[0], escape=False),
-                                    "author" : {"name" : self.quote_escape(row[1], escape=False)},
-                                    "coords" : { "x" : row[2], "y" : row[3], "z" : row[4] },
-                                    "desc" : self.quote_escape(row[5], escape=False)
-                                }
-                # Append to list
-                found_locations.append(searched_location_data)
+        # List every location from the cache when all of them are in it, every backend orders names by code point like the cache does
+        if query == "all" and not self.storage.in_memory:
+            cached = self.guild_cache(guild_id).page(cursor, backwards, page_size)
+            if cached is not None:
+                return cached
 
-        
-        return found_locations
+        try:
+            return self.storage.search_locations_page(guild_id, search_token, query, cursor, backwards, page_size)
+        except Exception as e:
+            print("ERROR: Unable to get page of locations with key '{}' in mode '{}' due to: {}".format(search_token, query, e))
+            return False
+
+    # Function to get the key locations are listed in order of
+    def location_sort_key(self, location):
+        """Function to get the key that orders locations when listing them page by page (i.e. by name, then by ID)
+
+        Args:
+            location (dict): Location data
+
+        Returns:
+            tuple: Returns the (name, id) key of the location, also used as the cursor to the next or previous page
+        """
+        return (location["name"], str(location["id"]))
 
     # Function to create string of location data in a nice format
     def location_str(self, location):
@@ -384,6 +1461,9 @@ class Operator:
         if location["desc"] is not None:
             embed.add_field(name="Description", value=location["desc"], inline=False)
 
+        if location.get("portal", False):
+            embed.add_field(name=":cyclone: Nether portal", value="Yes", inline=False)
+
         return embed
 
     # Function to print out location data in a nice format
@@ -404,23 +1484,26 @@ class Operator:
         return str
 
     # Function to return a list of location data that is currently being stored
-    def location_list(self):
+    def location_list(self, guild_id):
         """Function to print the entire list of locations currently being stored in this object's list of locations
 
         Meant to be used while in dev mode...
 
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+
         Returns:
             str: Returns string that represents the list of all locations in the list
         """
         str = "List of Registered Locations...\n\n"
 
-        for entry in self.locations:
+        for entry in self.search_locations(guild_id, '', query="all") or []:
             str += self.short_location_str(entry) + "\n"
 
         return str
     
     # Function to return a list of locations stored within an embed
-    def location_list_embed(self, collection=None, search_token=None, query=None):
+    def location_list_embed(self, collection=None, search_token=None, query=None, page_number=None, guild_id=None):
         """Function to create a discord embed object for displaying a list of location data that is in the database
 
         Will create a list for all entered location data if no list, search_token and query were not provided.
@@ -431,18 +1514,18 @@ class Operator:
             collection   (list): List of location data that is pre provided (Default: None)
             search_token  (str): Token to base the search for locations (Default: None)
             query         (str): How to search for the locations, if searching (Default: None)
+            page_number   (int): Number of the page the collection is, shown in the footer if provided (Default: None)
+            guild_id      (str): ID of the guild to list every location of when no collection is provided (Default: None)
 
         Returns:
             embed: Returns a discord embed object of the location's information, nicely formatted to be sent to the text channel 
         """
-        # If no location list was provided, use the entire location list
+        # If no location list was provided, use the guild's entire location list
         if collection is None:
-            if self.local:
-                collection = self.locations
-            else:
-                collection = self.search_locations('', query="all")
-                desc = "List of all registered locations..."
+            collection = self.search_locations(guild_id, '', query="all")
 
+        if search_token is None or query == "all":
+            desc = "List of all registered locations..."
         else:
             desc = "Search results for {}: '{}'".format(query, search_token)
         
@@ -466,42 +1549,46 @@ class Operator:
         if len(collection) == 0:
             embed.add_field(name="No locations found...", value="...", inline=False)
 
+        if page_number is not None:
+            embed.set_footer(text="Page {}".format(page_number))
+
         return embed
 
     # Function to calculate the distance between two given location points
-    def distance(self, name1, name2):
+    def distance(self, guild_id, name1, name2):
         """Function to calculate the distance between two locations with given names
 
         Args:
+            guild_id (str): ID of the guild the locations belong to
             name1 (str): Name of the first location to consider in the calculation
             name2 (str): Name of the second location to consider in the calculation
 
         Returns:
             bool, float or str: Returns whether the calculation was successful and the calculated distance or a message as to why the calculation failed
         """
-        # Retrieve both locations from database
-        loc1 = self.get_location_data(name1)
-        loc2 = self.get_location_data(name2)
+        # Retrieve both locations from database at once
+        locations = self.get_locations_by_names(guild_id, [name1, name2])
+
+        if locations == False:
+            return False, "Locations could not be retrieved"
+
+        loc1 = locations[name1]
+        loc2 = locations[name2]
 
         # Ensure location 1 was found properly
-        if loc1 is None:
+        if not loc1:
             return False, "First location could not be found"
         # Ensure location 2 was found properly
-        if loc2 is None:
+        if not loc2:
             return False, "Second location could not be found"
 
         # Grabbing the x and y of both locations and putting them in tuples for ease of use
         p1 = (loc1["coords"]["x"], loc1["coords"]["y"])
         p2 = (loc2["coords"]["x"], loc2["coords"]["y"])
 
-        print("p1 - {}".format(p1))
-        print("p2 - {}".format(p2))
-
         # Calculate the distance between the two points
         distance = math.sqrt( ((p1[0]-p2[0])**2)+((p1[1]-p2[1])**2) )
 
-        print("Calculated distance: {}".format(distance))
-
         return True, distance
 
     def navigation(self, loc1, loc2):
@@ -514,162 +1601,441 @@ class Operator:
         Returns:
             bool, float or str: Returns whether the calculation was successful and the calculated angle/navigation or a message as to why the calculation failed
         """
+        distances, angles, directions = bearings(loc1["coords"]["x"], loc1["coords"]["y"], [(loc2["coords"]["x"], loc2["coords"]["y"])])
 
-        # Grabbing the x and y of both locations and putting them in tuples for ease of use
-        p1 = (loc1["coords"]["x"], loc1["coords"]["y"])
-        p2 = (loc2["coords"]["x"], loc2["coords"]["y"])
-
-        print("p1 - {}".format(p1))
-        print("p2 - {}".format(p2))
-
-        # Calculate deltas between x and y coords
-        x_delta = abs(p1[0] - p2[0])
-        y_delta = abs(p1[1] - p2[1])
-
-        print("delta x: {} | delta y: {}".format(x_delta, y_delta))
+        if directions[0] is None:
+            print("WARN - p1 and p2 are the same coordinate...")
+            return False, "Same coordinates", 0
 
-        if x_delta == 0 or y_delta == 0:
-            print("special case, either delta x or delta y is 0, set angle default to 0")
-            myAngle = 0
-        else:
-            # Calculate angle
-            myAngle = int(math.atan((y_delta)/(x_delta)) * (180/math.pi))
-
-        print("arctan(O/A) = {} deg".format(myAngle))
-
-        # Determine which quadrant p2 was located int
-        x_dir = p2[0] - p1[0]
-        y_dir = p2[1] - p1[1]
-
-        print("x dir = {} | y dir = {}".format(x_dir, y_dir))
-        
-        # The offset to add onto the calculated angle such that it falls into the corrrect quadrant (start off at 0 deg)
-        offset = 0
-
-        # Qudrant 1 case (ALL sin, cos, tan positive)
-        if x_dir > 0 and y_dir > 0:
-            offset += 0
-        
-        # Qudrant 2 case (ONLY SIN positive)
-        elif x_dir < 0 and y_dir > 0:
-            offset += 90
-
-        # Qudrant 3 case (ONLY TAN positive)
-        elif x_dir < 0 and y_dir < 0:
-            offset += 180
-
-        # Qudrant 3 case (ONLY TAN positive)
-        elif x_dir > 0 and y_dir < 0:
-            offset += 270
-
-        # Special cases where the direction is neutral for either x or y direction
-        elif x_dir == 0 or y_dir == 0:
-            if x_dir == 0 and y_dir == 0:
-                print("WARN - p1 and p2 are the same coordinate...")
-                return False, "Same coordinates", 0
-            elif x_dir == 0:
-                if y_dir > 0:
-                    offset = 90
-                else:
-                    offset = 270
-            elif y_dir == 0:
-                if x_dir > 0:
-                    offset = 0
-                else:
-                    offset = 180
-            else:
-                print("ERROR - Something unexpected happened... xdir = {} , ydir = {}".format(x_dir, y_dir))
-                return False, "Oops idk...", 0
-        
-        # Unknown case... :/
-        else:
-                print("ERROR - Something unexpected happened... xdir = {} , ydir = {}".format(x_dir, y_dir))
-                return False, "Oops idk...", 0
+        return True, directions[0], int(angles[0])
 
-        # Add the offset to modify the angle to point to the correct quadrant
-        myAngle += offset
+    # Function to get the directions from a set of coordinates to every location
+    def compass_locations(self, guild_id, x, y, amount=10):
+        """Function to calculate the distance and directions from a set of coordinates to every saved location, closest first
 
-        # Create cardinal locations dict
-        cardinalDirs = { 0 : "E", 45 : "NE", 90 : "N", 135 : "NW", 180 : "W", 225 : "SW", 270 : "S", 315 : "SE", 360 : "E" }
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            x      (int): X coordinate to start from
+            y      (int): Y coordinate to start from (NOTE: This is the z coordinate in minecraft)
+            amount (int): Amount of locations to return (Default: 10)
 
-        # Calculate the remainder and true bearing
-        remainder = myAngle % 45
+        Returns:
+            list or bool: Returns a list of (distance, direction, angle, location) tuples sorted closest first, returns False if the locations could not be retrieved
+        """
+        locations = self.search_locations(guild_id, '', query="all")
 
-        print("Angle: {} | remainder: {} | myAngle-rem = {} | myAngle+rem = {}".format(myAngle, remainder, myAngle - remainder, myAngle + remainder))
-        
-        direction = "NONE"
+        if locations == False:
+            return False
 
-        # Iterate over each quadrant for determining the cardinal direciton.
-        for i in range(0, 271, 90):
-            # Set up angle boundaries for comparison
-            base = i
-            middle = i+45
-            end = i+90
-            rad = 22.5
+        distances, angles, directions = bearings(int(x), int(y), [(location["coords"]["x"], location["coords"]["y"]) for location in locations])
 
-            # Determine which cardinal direction angle coresponds to
-            if myAngle >= base and myAngle < middle - rad:
-                direction = cardinalDirs[base]
-            
-            elif myAngle >= (middle - rad) and myAngle <= (middle + rad):
-                direction = cardinalDirs[middle]
+        # Only the closest locations need to be sorted
+        amount = min(int(amount), len(locations))
+        if amount <= 0:
+            return []
 
-            elif myAngle > (middle + rad) and myAngle <= end:
-                direction = cardinalDirs[end]
+        closest = np.argpartition(distances, amount - 1)[:amount]
+        closest = closest[np.argsort(distances[closest], kind="stable")]
 
-        return True, direction, myAngle
+        return [(float(distances[i]), directions[i], int(angles[i]), locations[i]) for i in closest.tolist()]
 
-    def navigation_locations(self, pointA, pointB):
+    def navigation_locations(self, guild_id, pointA, pointB):
         """Function to calculate the directions between two locations with given names
 
         Args:
+            guild_id (str): ID of the guild the locations belong to
             pointA (str): Name of the first location to consider in the calculation
             pointB (str): Name of the second location to consider in the calculation
 
         Returns:
-            bool, float or str: Returns whether the calculation was successful and the calculated angle/navigation or a message as to why the calculation failed
+            bool, float or str, int, tuple: Returns whether the calculation was successful, the calculated direction or a message as to why the calculation failed,
+            the calculated angle and the (first, second) location data that was used (None if the locations were not found)
         """
-        # Retrieve both locations from database
-        loc1 = self.get_location_data(pointA)
-        loc2 = self.get_location_data(pointB)
+        # Retrieve both locations from database at once
+        locations = self.get_locations_by_names(guild_id, [pointA, pointB])
+
+        if locations == False:
+            return False, "Locations could not be retrieved", 0, None
+
+        loc1 = locations[pointA]
+        loc2 = locations[pointB]
 
         # Ensure location 1 was found properly
-        if loc1 is None:
-            return False, "First location could not be found", 0
+        if not loc1:
+            return False, "First location could not be found", 0, None
         # Ensure location 2 was found properly
-        if loc2 is None:
-            return False, "Second location could not be found", 0
+        if not loc2:
+            return False, "Second location could not be found", 0, None
 
         # Perform direction calculation
-        angles = self.navigation(loc1, loc2)
+        status, direction, angle = self.navigation(loc1, loc2)
 
-        return angles
+        return status, direction, angle, (loc1, loc2)
     
-    def navigation_locations_coords(self, pointA, pointB):
+    def navigation_locations_coords(self, guild_id, pointA, pointB):
         """Function to calculate the directions between a set of coordinate and a location
 
         Args:
-            pointA (str): Name of the first location to consider in the calculation
-            pointB (str): Name of the second location to consider in the calculation
+            guild_id (str): ID of the guild the location belongs to
+            pointA (dict): Location data of the coordinates to start from
+            pointB  (str): Name of the location to consider in the calculation
 
         Returns:
-            bool, float or str: Returns whether the calculation was successful and the calculated angle/navigation or a message as to why the calculation failed
+            bool, float or str, int, tuple: Returns whether the calculation was successful, the calculated direction or a message as to why the calculation failed,
+            the calculated angle and the (first, second) location data that was used (None if the location was not found)
         """
-        # Retrieve both locations from database
+        # Retrieve the location from database
+        locations = self.get_locations_by_names(guild_id, [pointB])
+
+        if locations == False:
+            return False, "Location could not be retrieved", 0, None
+
         loc1 = pointA
-        loc2 = self.get_location_data(pointB)
+        loc2 = locations[pointB]
 
         # Ensure location 1 was found properly
         if loc1 is None:
-            return False, "First location could not be found"
+            return False, "First location could not be found", 0, None
         # Ensure location 2 was found properly
-        if loc2 is None:
-            return False, "Second location could not be found"
+        if not loc2:
+            return False, "Second location could not be found", 0, None
 
-        angles = self.navigation(loc1, loc2)
+        status, direction, angle = self.navigation(loc1, loc2)
 
-        return angles
+        return status, direction, angle, (loc1, loc2)
     
+    # Function to resolve the locations to put in a distance matrix
+    def matrix_locations(self, guild_id, names=None, author=None):
+        """Function to retrieve the locations for a distance matrix, either by name or every location of an author, in a single lookup
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            names  (list): Names of the locations (Default: None)
+            author  (str): Name of the author whose locations to use instead (Default: None)
+
+        Returns:
+            bool, list or str: Returns whether the locations were found and the list of location data or a message as to why they were not
+        """
+        if author is not None:
+            try:
+                points = self.storage.get_locations_by_author(guild_id, author)
+            except Exception as e:
+                print("ERROR: Unable to retrieve the locations of {} due to: {}".format(author, e))
+                return False, "Locations could not be retrieved"
+
+            points.sort(key=self.location_sort_key)
+
+            if len(points) < 2:
+                return False, "'{}' has less than 2 saved locations".format(author)
+        else:
+            # Drop repeated names, keep the order they were given in
+            names = list(dict.fromkeys(names))
+
+            if len(names) < 2:
+                return False, "At least 2 different locations are needed"
+
+            locations = self.get_locations_by_names(guild_id, names)
+
+            if locations == False:
+                return False, "Locations could not be retrieved"
+
+            missing = [name for name in names if not locations[name]]
+            if len(missing) > 0:
+                return False, "Could not find (or found more than one of) the location(s): {}".format(", ".join(missing))
+
+            points = [locations[name] for name in names]
+
+        if len(points) > self.matrix_max_size:
+            return False, "Too many locations, at most {} can be compared at once".format(self.matrix_max_size)
+
+        return True, points
+
+    # Function to compute the distance between every pair of locations
+    def distance_matrix(self, points):
+        """Function to calculate the distance between every pair of locations, all at once
+
+        Args:
+            points (list): List of location data
+
+        Returns:
+            ndarray: Returns the (n, n) matrix of distances in blocks, row i column j being the distance from points[i] to points[j]
+        """
+        coords = np.array([(point["coords"]["x"], point["coords"]["y"]) for point in points], dtype=float).reshape(-1, 2)
+
+        # Differences between every pair of points, broadcast to (n, n, 2)
+        deltas = coords[:, np.newaxis, :] - coords[np.newaxis, :, :]
+
+        return np.hypot(deltas[..., 0], deltas[..., 1])
+
+    # Function to compute the travel times for a distance matrix
+    def travel_time_matrices(self, distances):
+        """Function to calculate the time it takes to travel every distance of a distance matrix, for every mode of travel
+
+        Args:
+            distances (ndarray): Matrix of distances in blocks
+
+        Returns:
+            list, ndarray: Returns the names of the modes of travel (walk, run, horse) and the (modes, n, n) matrix of travel times in seconds
+        """
+        modes = ["walk", "run", "horse"]
+        speeds = np.array([self.metrics["speed"]["player"]["walk"], self.metrics["speed"]["player"]["run"], self.metrics["speed"]["horse"]["walk"]])
+
+        return modes, distances[np.newaxis, :, :] / speeds[:, np.newaxis, np.newaxis]
+
+    # Function to write a distance matrix to a CSV file
+    def matrix_csv(self, points, distances):
+        """Function to write the distance and travel times between every pair of locations as CSV
+
+        Args:
+            points         (list): List of location data
+            distances   (ndarray): Matrix of distances between the locations
+
+        Returns:
+            str: Returns the CSV text, one row per pair of locations
+        """
+        modes, times = self.travel_time_matrices(distances)
+
+        # Every pair once
+        rows, cols = np.triu_indices(len(points), k=1)
+
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["from", "to", "distance"] + ["{}_seconds".format(mode) for mode in modes])
+
+        columns = [np.round(distances[rows, cols]).astype(int).tolist()] + [np.round(mode_times[rows, cols], 1).tolist() for mode_times in times]
+
+        for i, j, *values in zip(rows.tolist(), cols.tolist(), *columns):
+            writer.writerow([points[i]["name"], points[j]["name"]] + values)
+
+        return out.getvalue()
+
+    # Function to lay out a matrix as a text table
+    def matrix_table(self, matrix, fmt):
+        """Function to lay out a matrix as a fixed width text table, rows and columns labelled 1 to n
+
+        Args:
+            matrix (ndarray): Matrix to lay out
+            fmt        (str): Format of every cell (i.e. '{:.0f}')
+
+        Returns:
+            str: Returns the table
+        """
+        cells = [[fmt.format(value) for value in row] for row in matrix.tolist()]
+        labels = [str(i + 1) for i in range(len(cells))]
+
+        width = max(len(cell) for row in cells + [labels] for cell in row)
+        label_width = len(labels[-1])
+
+        lines = [" " * label_width + "".join(" " + label.rjust(width) for label in labels)]
+        for label, row in zip(labels, cells):
+            lines.append(label.rjust(label_width) + "".join(" " + cell.rjust(width) for cell in row))
+
+        return "\n".join(lines)
+
+    # Function to create a distance matrix embed tile
+    def create_matrix_embed(self, points, distances):
+        """Function to display the distance and running time between every pair of locations as tables
+
+        Args:
+            points         (list): List of location data
+            distances   (ndarray): Matrix of distances between the locations
+
+        Returns:
+            embed or None: Returns a discord embed object with the tables, None if the tables are too big to fit in an embed
+        """
+        _, times = self.travel_time_matrices(distances)
+
+        legend = "\n".join("**{}.** {} ({}, {})".format(i + 1, point["name"], point["coords"]["x"], point["coords"]["y"]) for i, point in enumerate(points))
+
+        distance_table = "```\n{}\n```".format(self.matrix_table(distances, "{:.0f}"))
+        # Running time in minutes
+        time_table = "```\n{}\n```".format(self.matrix_table(times[1] / 60, "{:.1f}"))
+
+        # Embed descriptions hold 4096 characters and fields 1024
+        if len(legend) > 4000 or len(distance_table) > 1024 or len(time_table) > 1024:
+            return None
+
+        embed = discord.Embed(
+            title = "Distance Matrix",
+            description = legend,
+            color = discord.Color.green()
+        )
+
+        embed.add_field(name="Distance (blocks)", value=distance_table, inline=False)
+        embed.add_field(name=":woman_running: Running time (minutes)", value=time_table, inline=False)
+
+        return embed
+
+    # Function to plan a route through several locations
+    def plan_route(self, guild_id, names, round_trip=False):
+        """Function to order the given stops into a short route starting at the first one
+
+        Every location is retrieved in a single lookup and every distance is computed at once, then the
+        stops are ordered with a nearest neighbour route improved by 2-opt (see routing.py).
+
+        Args:
+            guild_id     (str): ID of the guild the locations belong to
+            names       (list): Names of the locations, the first one being where the route starts
+            round_trip  (bool): Flag to come back to the start at the end of the route (Default: False)
+
+        Returns:
+            bool, list or str: Returns whether the route was planned and its list of legs or a message as to why it was not.
+            Every leg is a (from location, to location, distance, direction, angle) tuple.
+        """
+        status, points = self.matrix_locations(guild_id, names)
+
+        if status == False:
+            return False, points
+
+        distances = self.distance_matrix(points)
+        route = optimize_route(distances, start=0, round_trip=round_trip, time_budget=self.route_time_budget)
+
+        legs = []
+        for i, j in zip(route[:-1], route[1:]):
+            nav_status, direction, angle = self.navigation(points[i], points[j])
+
+            # Locations on the same coordinates have no direction
+            if nav_status == False:
+                direction, angle = "-", 0
+
+            legs.append((points[i], points[j], float(distances[i, j]), direction, angle))
+
+        return True, legs
+
+    # Function to create a route embed tile
+    def create_route_embed(self, legs):
+        """Function to display every leg of a route and how long the whole route takes
+
+        Args:
+            legs (list): List of (from location, to location, distance, direction, angle) tuples, as returned by plan_route
+
+        Returns:
+            embed: Returns a discord embed object listing the legs of the route and the total distance and travel times
+        """
+        lines = []
+        for i, (start, end, distance, direction, angle) in enumerate(legs):
+            lines.append("**{}.** {} :arrow_right: {} - {:.0f} blocks {} ({}°), ~{:.1f} min running".format(i + 1, start["name"], end["name"], distance, direction, angle, distance / self.metrics["speed"]["player"]["run"] / 60))
+
+        # Embed descriptions hold 4096 characters
+        desc = ""
+        for i, line in enumerate(lines):
+            if len(desc) + len(line) > 3900:
+                desc += "*... and {} more leg(s)*".format(len(lines) - i)
+                break
+            desc += line + "\n"
+
+        embed = discord.Embed(
+            title = "Route",
+            description = desc,
+            color = discord.Color.green()
+        )
+
+        total = sum(leg[2] for leg in legs)
+
+        # Total distance
+        embed.add_field(name="Total distance", value="{:.0f} blocks".format(total), inline=False)
+
+        # Time to travel the route by walking
+        embed.add_field(name=":person_walking: Walk time", value="~{:.1f} minutes".format(total/self.metrics["speed"]["player"]["walk"]/60), inline=False)
+
+        # Time to travel the route by running
+        embed.add_field(name=":woman_running: Running time", value="~{:.1f} minutes".format(total/self.metrics["speed"]["player"]["run"]/60), inline=False)
+
+        # Time to travel the route by horse
+        embed.add_field(name=":racehorse: Average time by horse", value="~{:.1f} minutes".format(total/self.metrics["speed"]["horse"]["walk"]/60), inline=False)
+
+        return embed
+
+    # Function to create a travel embed tile
+    def create_travel_embed(self, from_name, to_name, mode, route):
+        """Function to display the fastest way between two locations
+
+        Args:
+            from_name  (str): Name of the location the route starts from
+            to_name    (str): Name of the location the route goes to
+            mode       (str): How the route is travelled, either 'walk', 'run' or 'horse'
+            route    (tuple): (legs, seconds, overworld seconds) tuple, as returned by fastest_route
+
+        Returns:
+            embed: Returns a discord embed object listing every leg of the route and how long it takes
+        """
+        legs, seconds, overworld = route
+
+        icons = { "overworld" : ":evergreen_tree:", "nether" : ":fire:", "portal" : ":cyclone:" }
+
+        lines = []
+        for i, (start, end, dimension, blocks, leg_seconds) in enumerate(legs):
+            if dimension == "portal":
+                lines.append("**{}.** {} Take the portal at {} ({:.0f} s)".format(i + 1, icons[dimension], start))
+            else:
+                lines.append("**{}.** {} {} :arrow_right: {} - {:.0f} blocks in the {} ({:.0f} s)".format(i + 1, icons[dimension], start, end, blocks, dimension, leg_seconds))
+
+        embed = discord.Embed(
+            title = "Travel Summary",
+            description = "Fastest way from '{}' to '{}' ({})\n\n{}".format(from_name, to_name, mode, "\n".join(lines))[:4096],
+            color = discord.Color.green()
+        )
+
+        embed.add_field(name="Travel time", value="~{:.1f} minutes".format(seconds / 60), inline=False)
+        embed.add_field(name="Overworld only", value="~{:.1f} minutes".format(overworld / 60), inline=False)
+
+        return embed
+
+    # Function to create a stats embed tile
+    def create_stats_embed(self, limit=10):
+        """Function to display where the bot spends its time, i.e. the slowest commands and database calls
+
+        Args:
+            limit (int): Maximum amount of commands and of database calls listed, slowest (by total time) first (Default: 10)
+
+        Returns:
+            embed: Returns a discord embed object with the latency of the commands and database calls and the cache counters
+        """
+        snapshot = self.telemetry.snapshot()
+
+        embed = discord.Embed(
+            title = "Bot Stats",
+            description = "*calls (errors) - mean / p95 latency*",
+            color = discord.Color.green()
+        )
+
+        def lines(table, rows=False):
+            slowest = sorted(table.items(), key=lambda item: item[1]["total"], reverse=True)[:limit]
+            text = "\n".join("**{}** {} ({}) - {:.1f} / {:.0f} ms{}".format(name, entry["count"], entry["errors"], entry["mean"] * 1000, entry["p95"] * 1000, ", {} rows".format(entry["rows"]) if rows and entry["rows"] else "") for name, entry in slowest)
+            return text[:1024] or "Nothing yet..."
+
+        embed.add_field(name=":stopwatch: Commands", value=lines(snapshot["commands"]), inline=False)
+        embed.add_field(name=":floppy_disk: Database calls", value=lines(snapshot["queries"], rows=True), inline=False)
+
+        cache = snapshot["collected"].get("cache", {})
+        embed.add_field(name=":card_box: Cache", value="{:.0%} hit ratio ({:.0f} hits, {:.0f} misses, {:.0f} evictions)".format(cache.get("hit_ratio", 0), cache.get("hits", 0), cache.get("misses", 0), cache.get("evictions", 0)), inline=False)
+
+        return embed
+
+    # Function to create a map embed tile
+    def create_map_embed(self, x, y, radius, count, filename="map.png"):
+        """Function to display a map of the locations around a point
+
+        Args:
+            x         (int): X coordinate of the centre of the map
+            y         (int): Y coordinate of the centre of the map (NOTE: This is the z coordinate in minecraft)
+            radius    (int): Amount of blocks shown around the centre in every direction
+            count     (int): Amount of locations on the map
+            filename  (str): Name of the attached map image (Default: 'map.png')
+
+        Returns:
+            embed: Returns a discord embed object showing the attached map image
+        """
+        embed = discord.Embed(
+            title = "Map around {} {}".format(x, y),
+            description = "{} location{} within {} blocks, North is up. Portals are purple.".format(count, "" if count == 1 else "s", radius),
+            color = discord.Color.green()
+        )
+
+        embed.set_image(url="attachment://{}".format(filename))
+
+        return embed
+
     # Function to create a distance embed tile
     def create_distance_embed(self, name1, name2, distance):
         """Function to calculate the distance between two locations with given names
@@ -702,6 +2068,97 @@ class Operator:
 
         return embed
 
+    # Function to create an import summary embed tile
+    def create_import_embed(self, imported, errors):
+        """Function to display the outcome of importing locations from a file
+
+        Args:
+            imported  (int): Amount of locations that were imported
+            errors   (list): List of (row number, reason) tuples for every skipped row
+
+        Returns:
+            embed: Returns a discord embed object summarizing the import and listing the skipped rows
+        """
+        embed = discord.Embed(
+            title = "Import Summary",
+            description = "Imported **{}** location(s), skipped **{}** row(s).".format(imported, len(errors)),
+            color = discord.Color.green() if len(errors) == 0 else discord.Color.orange()
+        )
+
+        # List the skipped rows, as many as fit in a field
+        if len(errors) > 0:
+            lines = []
+            length = 0
+
+            for row_number, reason in errors:
+                line = "Row {}: {}".format(row_number, reason)
+
+                if length + len(line) + 1 > 1000:
+                    lines.append("...and {} more".format(len(errors) - len(lines)))
+                    break
+
+                lines.append(line)
+                length += len(line) + 1
+
+            embed.add_field(name="Skipped rows", value="\n".join(lines), inline=False)
+
+        return embed
+
+    # Function to create a nearest locations embed tile
+    def create_nearest_embed(self, x, y, nearest):
+        """Function to display the locations closest to a set of coordinates
+
+        Args:
+            x         (int): X coordinate that was searched around
+            y         (int): Y coordinate that was searched around (NOTE: This is the z coordinate in minecraft)
+            nearest  (list): List of (distance, location) tuples, closest first
+
+        Returns:
+            embed: Returns a discord embed object that lists the closest locations and how far away they are
+        """
+        embed = discord.Embed(
+            title = "Nearest Locations",
+            description = "Closest locations to (x={}, z={})\n*(x, y, z) - author*".format(x, y),
+            color = discord.Color.green()
+        )
+
+        for distance, location in nearest:
+            embed.add_field(name="{} - {:.0f} blocks".format(location["name"], distance), value="({}, {}, {}) - {}".format(location["coords"]["x"], location["coords"]["z"], location["coords"]["y"], location["author"]["name"]), inline=False)
+
+        if len(nearest) == 0:
+            embed.add_field(name="No locations found...", value="...", inline=False)
+
+        return embed
+
+    # Function to create a compass embed tile
+    def create_compass_embed(self, x, y, compass):
+        """Function to display the directions from a set of coordinates to the closest locations
+
+        Args:
+            x         (int): X coordinate the directions start from
+            y         (int): Y coordinate the directions start from (NOTE: This is the z coordinate in minecraft)
+            compass  (list): List of (distance, direction, angle, location) tuples, closest first
+
+        Returns:
+            embed: Returns a discord embed object that lists the direction and distance to every location
+        """
+        embed = discord.Embed(
+            title = "Compass",
+            description = "Directions from (x={}, z={}) to the closest locations\n*direction (angle) - distance*".format(x, y),
+            color = discord.Color.green()
+        )
+
+        for distance, direction, angle, location in compass:
+            if direction is None:
+                embed.add_field(name=location["name"], value="You are here", inline=False)
+            else:
+                embed.add_field(name=location["name"], value="{} ({}°) - {:.0f} blocks".format(direction, angle, distance), inline=False)
+
+        if len(compass) == 0:
+            embed.add_field(name="No locations found...", value="...", inline=False)
+
+        return embed
+
     # Function to create a distance embed tile
     def create_navigation_embed(self, pointA, pointB, direction, angle):
         """Function to display the directions between two locations
@@ -730,25 +2187,4 @@ class Operator:
         embed.add_field(name="Exact Angle (East is 0°, North 90°, etc...)", value="{}°".format(angle), inline=False)
 
         return embed
-    
-    # Function to convert single or double quotes in a string to it's escaped variant
-    def quote_escape(self, string, escape=True):
-        """Function to escape all single quotes in a string to make it valid for PostgreSQL use
-
-        It will also de-escape quotes for a string that was just recently extracted from a PostgreSQL table
-
-        Args:
-            string  (str): The string that is to have all its single quotes escaped (or de-escaped)
-            escape (bool): Flag for whether to escape the single quotes in the string or to de-escape (Default: True, i.e. escape single quotes)
-        
-        Returns:
-            str: Returns the string in its single quote escaped or de-escaped format.
-        """
-        if escape:
-            # Replace all single quotes with a fake doubled quote (i.e.)
-            new_string = string.replace("\'", "''")
-        else:
-            new_string = string.replace("''", "\'")
-        
-        return new_string
 
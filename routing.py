@@ -0,0 +1,112 @@
+import time
+import numpy as np
+
+# Function to build a route by always going to the closest stop left
+def nearest_neighbour_route(distances, start=0):
+    """Function to build a route that starts at 'start' and always goes to the closest stop not visited yet
+
+    Args:
+        distances (ndarray): (n, n) matrix of distances between the stops
+        start         (int): Index of the stop to start from (Default: 0)
+
+    Returns:
+        list: Returns the indexes of the stops in the order they are visited
+    """
+    n = len(distances)
+    visited = np.zeros(n, dtype=bool)
+    route = [start]
+    visited[start] = True
+
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, distances[route[-1]])
+        closest = int(np.argmin(row))
+
+        route.append(closest)
+        visited[closest] = True
+
+    return route
+
+# Function to shorten a route by undoing crossings
+def two_opt(route, distances, deadline, fixed_end=False):
+    """Function to shorten a route with 2-opt moves (reversing a stretch of the route) until no move helps or time runs out
+
+    The first stop never moves, and neither does the last one if 'fixed_end' is set (i.e. a round trip back to the start).
+    For every stretch start, every possible stretch end is scored at once and the best one is applied if it shortens the route.
+
+    Args:
+        route         (list): Indexes of the stops in the order they are visited
+        distances  (ndarray): (n, n) matrix of distances between the stops
+        deadline     (float): time.perf_counter() value to stop improving at
+        fixed_end     (bool): Flag to keep the last stop in place (Default: False)
+
+    Returns:
+        list: Returns the improved route
+    """
+    route = np.array(route)
+    n = len(route)
+    # Last position that can be part of a reversed stretch
+    last = n - 2 if fixed_end else n - 1
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+
+        for i in range(1, last):
+            a, b = route[i - 1], route[i]
+
+            # Every possible end of the stretch starting at i
+            ends = np.arange(i + 1, last + 1)
+            c = route[ends]
+            has_next = ends + 1 < n
+            d = route[np.minimum(ends + 1, n - 1)]
+
+            # Change in length when reversing route[i:end+1], i.e. edges (a, b) and (c, d) become (a, c) and (b, d)
+            delta = distances[a, c] - distances[a, b] + np.where(has_next, distances[b, d] - distances[c, d], 0.0)
+
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                end = ends[best]
+                route[i:end + 1] = route[i:end + 1][::-1].copy()
+                improved = True
+
+            if time.perf_counter() >= deadline:
+                break
+
+    return route.tolist()
+
+# Function to find a short route through every stop
+def optimize_route(distances, start=0, round_trip=False, time_budget=0.5):
+    """Function to order the stops into a short route, using a nearest neighbour route improved with 2-opt
+
+    Args:
+        distances  (ndarray): (n, n) matrix of distances between the stops
+        start          (int): Index of the stop to start from (Default: 0)
+        round_trip    (bool): Flag to come back to the start at the end of the route (Default: False)
+        time_budget  (float): Maximum amount of seconds to spend improving the route (Default: 0.5)
+
+    Returns:
+        list: Returns the indexes of the stops in the order they are visited (ending with the start again for round trips)
+    """
+    deadline = time.perf_counter() + time_budget
+
+    route = nearest_neighbour_route(distances, start)
+
+    if round_trip:
+        route.append(start)
+
+    return two_opt(route, distances, deadline, fixed_end=round_trip)
+
+# Function to get the length of a route
+def route_length(route, distances):
+    """Function to add up the distances between every consecutive stop of a route
+
+    Args:
+        route         (list): Indexes of the stops in the order they are visited
+        distances  (ndarray): (n, n) matrix of distances between the stops
+
+    Returns:
+        float: Returns the total length of the route
+    """
+    route = np.asarray(route)
+
+    return float(distances[route[:-1], route[1:]].sum())
@@ -0,0 +1,146 @@
+import threading
+
+class NGramIndex:
+    """Class to index text by its n-grams for fast case-insensitive substring search
+
+    Every 1 to 'n' character long piece of the indexed text points back to the entries containing it.
+    Searching for a token of 'n' characters or less is a single lookup, longer tokens intersect the
+    postings of each of their n-grams and only verify the few entries left.
+
+    Stores...
+        n-gram -> set of entry keys that contain it
+        Entry key -> (insertion number, upper cased text, value)
+
+    """
+    def __init__(self, n=3):
+        self.n = n
+
+        # n-gram -> set of keys
+        self._postings = {}
+        # key -> (insertion number, text, value)
+        self._entries = {}
+        self._counter = 0
+
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Function to get every gram of a text
+    def _grams(self, text):
+        """Function to get the set of every 1 to n character long substring of a text
+
+        Args:
+            text (str): Upper cased text to split up
+
+        Returns:
+            set: Returns the set of grams
+        """
+        grams = set()
+
+        for size in range(1, self.n + 1):
+            for i in range(len(text) - size + 1):
+                grams.add(text[i:i+size])
+
+        return grams
+
+    # Function to add an entry to the index
+    def add(self, key, text, value):
+        """Function to index a value under the given text, replacing any entry with the same key
+
+        Args:
+            key   (hashable): Unique key of the entry (i.e. location ID)
+            text       (str): Text to make searchable
+            value   (object): Value returned by searches that match the text
+        """
+        with self._lock:
+            self.remove(key)
+
+            text = str(text).upper()
+
+            self._entries[key] = (self._counter, text, value)
+            self._counter += 1
+
+            for gram in self._grams(text):
+                self._postings.setdefault(gram, set()).add(key)
+
+    # Function to remove an entry from the index
+    def remove(self, key):
+        """Function to remove the entry with the given key from the index
+
+        Args:
+            key (hashable): Key of the entry to remove
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            if entry is None:
+                return
+
+            for gram in self._grams(entry[1]):
+                keys = self._postings[gram]
+                keys.discard(key)
+
+                if len(keys) == 0:
+                    del self._postings[gram]
+
+    # Function to get the value of an entry
+    def get(self, key):
+        """Function to get the value indexed under the given key
+
+        Args:
+            key (hashable): Key of the entry
+
+        Returns:
+            object or None: Returns the indexed value, None if there is no entry with that key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        return None if entry is None else entry[2]
+
+    # Function to find every entry containing a token
+    def search(self, token):
+        """Function to find every entry whose text contains the given token, ignoring case
+
+        Args:
+            token (str): Substring to search for, an empty token matches every entry
+
+        Returns:
+            list: Returns the values of the matching entries in the order they were added
+        """
+        token = str(token).upper()
+
+        with self._lock:
+            if len(token) == 0:
+                keys = self._entries.keys()
+
+            elif len(token) <= self.n:
+                keys = self._postings.get(token, ())
+
+            else:
+                # Intersect the postings of every n-gram in the token, smallest first
+                postings = []
+                for i in range(len(token) - self.n + 1):
+                    keys = self._postings.get(token[i:i+self.n])
+
+                    if keys is None:
+                        return []
+
+                    postings.append(keys)
+
+                postings.sort(key=len)
+
+                keys = set(postings[0])
+                for other in postings[1:]:
+                    keys &= other
+
+                    if len(keys) == 0:
+                        return []
+
+                # Grams can all appear without the token appearing as a whole, verify the candidates
+                keys = [key for key in keys if token in self._entries[key][1]]
+
+            found = sorted(self._entries[key] for key in keys)
+
+        return [value for _, _, value in found]
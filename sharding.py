@@ -0,0 +1,109 @@
+import threading
+import requests
+
+# Discord API endpoint giving the amount of shards discord recommends for the bot
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+
+# Function to ask discord how many shards to use
+def recommended_shard_count(token):
+    """Function to get the amount of shards discord recommends for the bot, based on how many guilds it is in
+
+    Args:
+        token (str): Discord bot token
+
+    Returns:
+        int: Returns the recommended amount of shards
+    """
+    response = requests.get(GATEWAY_URL, headers={"Authorization" : "Bot {}".format(token)}, timeout=10)
+    response.raise_for_status()
+
+    return int(response.json()["shards"])
+
+# Function to split the shards between the worker processes
+def shard_ranges(shard_count, workers):
+    """Function to split the shards into one contiguous range per worker process, as evenly as possible
+
+    Args:
+        shard_count (int): Total amount of shards
+        workers     (int): Amount of worker processes, capped to the amount of shards
+
+    Returns:
+        list: Returns one list of shard IDs per worker
+    """
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+
+    ranges = []
+    start = 0
+    for worker in range(workers):
+        end = start + size + (1 if worker < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+
+    return ranges
+
+class InvalidationBus:
+    """Class to tell the other worker processes which guilds had their locations written to
+
+    Each guild is only ever served by the worker owning its shard, so its cache and indexes live in that
+    one process. Writes can still reach a guild from another process (i.e. while shards move between
+    workers on a restart), so every write is announced and the other workers drop what they kept in
+    memory about that guild, rebuilding it from the database when it is next needed. It is only used when
+    the storage can not tell the workers about changes itself: on PostgreSQL every worker receives the changed
+    rows through LISTEN/NOTIFY (see PostgresChangeListener) and updates just those locations.
+
+    Stores...
+        One queue per worker process, each worker reads its own and writes to every other one
+        Index of the worker process using this bus
+        Thread reading the worker's own queue
+
+    """
+    def __init__(self, queues, worker):
+        self.queues = queues
+        self.worker = worker
+
+        self._listener = None
+
+    # Function to announce a write
+    def publish(self, guild_id):
+        """Function to tell every other worker process that a guild's locations changed
+
+        Args:
+            guild_id (str): ID of the guild that was written to
+        """
+        for index, other in enumerate(self.queues):
+            if index != self.worker:
+                other.put(guild_id)
+
+    # Function to start reading the announcements of the other workers
+    def listen(self, callback):
+        """Function to call 'callback' from a background thread for every guild another worker wrote to
+
+        Args:
+            callback (callable): Function that takes the ID of the guild that changed
+        """
+        def read():
+            own = self.queues[self.worker]
+
+            while True:
+                guild_id = own.get()
+
+                # Sent by close()
+                if guild_id is None:
+                    break
+
+                try:
+                    callback(guild_id)
+                except Exception as e:
+                    print("WARN - Unable to apply the invalidation of guild '{}' due to: {}".format(guild_id, e))
+
+        self._listener = threading.Thread(target=read, name="invalidation-listener", daemon=True)
+        self._listener.start()
+
+    # Function to stop reading the announcements
+    def close(self):
+        """Function to stop the background thread started by listen()"""
+        if self._listener is not None:
+            self.queues[self.worker].put(None)
+            self._listener.join(timeout=5)
+            self._listener = None
@@ -0,0 +1,178 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import tempfile
+
+from storage import location_from_row
+
+# First bytes of every snapshot file, the last digit being the version of the format
+MAGIC = b"MCBSNAP1"
+
+# Header: magic, amount of guilds
+HEADER = struct.Struct("<8sI")
+
+# Index entry of a guild (after its length prefixed ID): whether every location is in it, amount of locations, offset and size of its block
+ENTRY = struct.Struct("<?IQQ")
+
+# Function to get the row of a location
+def location_to_row(location):
+    """Function to get the row of a location, in the order location_from_row expects it
+
+    Args:
+        location (dict): Location data
+
+    Returns:
+        list: Returns the location's row
+    """
+    return [location["name"], location["author"]["name"], location["author"]["id"], location["coords"]["x"], location["coords"]["y"], location["coords"]["z"], location["desc"], location["id"], bool(location.get("portal", False)), location["guild_id"]]
+
+# Function to write a snapshot file
+def write_snapshot(path, guilds):
+    """Function to write the locations of every given guild to a snapshot file, replacing it at once so it is never half written
+
+    The file starts with an index of the guilds, followed by one block per guild holding its compressed rows,
+    so reading it back only needs to decode the blocks of the guilds that are actually used.
+
+    Args:
+        path    (str): Path of the snapshot file
+        guilds (dict): Guild ID -> (whether every location of the guild is given, list of location data)
+
+    Returns:
+        int: Returns the amount of locations written
+    """
+    blocks = []
+    index = []
+    total = 0
+
+    for guild_id, (complete, locations) in guilds.items():
+        block = zlib.compress(json.dumps([location_to_row(location) for location in locations], separators=(",", ":")).encode("utf-8"))
+        blocks.append(block)
+        index.append((guild_id.encode("utf-8"), complete, len(locations)))
+        total += len(locations)
+
+    # Blocks start right after the index
+    offset = HEADER.size + sum(2 + len(guild_id) + ENTRY.size for guild_id, _, _ in index)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(index)))
+
+            for (guild_id, complete, count), block in zip(index, blocks):
+                file.write(struct.pack("<H", len(guild_id)) + guild_id)
+                file.write(ENTRY.pack(complete, count, offset, len(block)))
+                offset += len(block)
+
+            for block in blocks:
+                file.write(block)
+
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return total
+
+class LocationSnapshot:
+    """Class to read a snapshot file written by write_snapshot, straight from a memory map of it
+
+    Opening a snapshot only reads its index, the locations of a guild are decoded the first time they are asked for.
+
+    Stores...
+        Memory map of the file
+        Guild ID -> (whether every location is in the snapshot, amount of locations, offset and size of its block)
+
+    """
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._index = self._read_index()
+        except (struct.error, UnicodeDecodeError, ValueError):
+            self.close()
+            raise ValueError("'{}' is not a valid snapshot file".format(path))
+
+    def __len__(self):
+        return len(self._index)
+
+    # Function to read the index of the file
+    def _read_index(self):
+        """Function to read which guilds are in the snapshot and where their blocks are
+
+        Returns:
+            dict: Returns guild ID -> (complete, count, offset, size)
+        """
+        magic, guilds = HEADER.unpack_from(self._map, 0)
+
+        if magic != MAGIC:
+            raise ValueError("Unknown snapshot format")
+
+        index = {}
+        position = HEADER.size
+
+        for _ in range(guilds):
+            (length,) = struct.unpack_from("<H", self._map, position)
+            guild_id = self._map[position + 2:position + 2 + length].decode("utf-8")
+            position += 2 + length
+
+            complete, count, offset, size = ENTRY.unpack_from(self._map, position)
+            position += ENTRY.size
+
+            if offset + size > len(self._map):
+                raise ValueError("Truncated snapshot")
+
+            index[guild_id] = (complete, count, offset, size)
+
+        return index
+
+    # Function to list the guilds in the snapshot
+    def guild_ids(self):
+        """Function to get the ID of every guild in the snapshot
+
+        Returns:
+            list: Returns the guild IDs
+        """
+        return list(self._index.keys())
+
+    # Function to read the locations of a guild
+    def locations(self, guild_id):
+        """Function to decode the locations of a guild
+
+        Args:
+            guild_id (str): ID of the guild
+
+        Returns:
+            tuple or None: Returns whether every location of the guild is in the snapshot (otherwise only the most used ones are) and the list of location data,
+            None if the guild is not in the snapshot
+        """
+        entry = self._index.get(guild_id)
+
+        if entry is None:
+            return None
+
+        complete, _, offset, size = entry
+        rows = json.loads(zlib.decompress(self._map[offset:offset + size]))
+
+        return complete, [location_from_row(row) for row in rows]
+
+    # Function to release the file
+    def close(self):
+        """Function to unmap the file"""
+        self._map.close()
+
+    # Function to get the size of the snapshot
+    def stats(self):
+        """Function to get the amount of guilds and locations in the snapshot
+
+        Returns:
+            dict: Returns the amount of guilds, locations and bytes
+        """
+        return {"guilds" : len(self._index), "locations" : sum(entry[1] for entry in self._index.values()), "bytes" : len(self._map)}
@@ -0,0 +1,164 @@
+import heapq
+import math
+import threading
+
+class SpatialIndex:
+    """Class to index locations on a uniform grid over their (x, y) coordinates for nearest neighbour queries
+
+    The world is cut into square cells of 'cell_size' blocks. A query only looks at the cells closest to the
+    queried point and stops as soon as no unvisited cell can hold anything closer than what was already found.
+
+    Stores...
+        Grid cell -> locations inside that cell
+        Location ID -> grid cell the location is in
+
+    Note: Like the rest of the bot, 'y' here is the Minecraft z coordinate (the altitude is not considered).
+
+    """
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+
+        # (cell x, cell y) -> { location id : location }
+        self._cells = {}
+        # location id -> (cell x, cell y)
+        self._ids = {}
+
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    # Function to get the cell a point falls in
+    def _cell(self, x, y):
+        """Function to get the grid cell that contains the given point
+
+        Args:
+            x (int): X coordinate of the point
+            y (int): Y coordinate of the point
+
+        Returns:
+            tuple: Returns the (cell x, cell y) of the point
+        """
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    # Function to add a location to the index
+    def insert(self, location):
+        """Function to add a location to the index, replacing it if it was already indexed
+
+        Args:
+            location (dict): Location data to index
+        """
+        with self._lock:
+            self.remove(location["id"])
+
+            cell = self._cell(location["coords"]["x"], location["coords"]["y"])
+
+            self._cells.setdefault(cell, {})[location["id"]] = location
+            self._ids[location["id"]] = cell
+
+    # Function to remove a location from the index
+    def remove(self, id):
+        """Function to remove a location from the index
+
+        Args:
+            id (str): ID of the location to remove
+
+        Returns:
+            dict or None: Returns the removed location data, None if it was not indexed
+        """
+        with self._lock:
+            cell = self._ids.pop(id, None)
+
+            if cell is None:
+                return None
+
+            locations = self._cells[cell]
+            location = locations.pop(id)
+
+            # Do not keep empty cells around
+            if len(locations) == 0:
+                del self._cells[cell]
+
+            return location
+
+    # Function to update an indexed location
+    def update(self, id, edit_func):
+        """Function to replace an indexed location with its edited version
+
+        Args:
+            id             (str): ID of the location that was edited
+            edit_func (callable): Function that takes the old location data and returns the edited location data
+        """
+        with self._lock:
+            old = self.remove(id)
+
+            if old is not None:
+                self.insert(edit_func(old))
+
+    # Function to find the closest locations to a point
+    def nearest(self, x, y, k=5):
+        """Function to find the k closest indexed locations to the given point
+
+        Args:
+            x (int): X coordinate of the point
+            y (int): Y coordinate of the point
+            k (int): Amount of locations to find (Default: 5)
+
+        Returns:
+            list: Returns a list of (distance, location) tuples, closest first
+        """
+        if k <= 0:
+            return []
+
+        with self._lock:
+            origin_x, origin_y = self._cell(x, y)
+
+            # Max-heap (negated squared distances) of the k best candidates found so far
+            best = []
+            visited = 0
+
+            def consider(cell):
+                for location in self._cells.get(cell, {}).values():
+                    dist_sq = (location["coords"]["x"] - x)**2 + (location["coords"]["y"] - y)**2
+                    entry = (-dist_sq, str(location["id"]), location)
+
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+
+            ring = 0
+            while visited < len(self._cells):
+                # Anything in this ring or further out is at least this far away
+                min_ring_dist = max(0, ring - 1) * self.cell_size
+                if len(best) == k and min_ring_dist**2 > -best[0][0]:
+                    break
+
+                # Rings grew bigger than the amount of occupied cells (i.e. far away outliers),
+                # just go over the occupied cells that have not been looked at yet
+                if 8 * ring > len(self._cells):
+                    for cell in self._cells:
+                        if max(abs(cell[0] - origin_x), abs(cell[1] - origin_y)) >= ring:
+                            consider(cell)
+                    break
+
+                # Go over every cell on the border of the current ring
+                if ring == 0:
+                    ring_cells = [(origin_x, origin_y)]
+                else:
+                    ring_cells = []
+                    for i in range(-ring, ring + 1):
+                        ring_cells.append((origin_x + i, origin_y - ring))
+                        ring_cells.append((origin_x + i, origin_y + ring))
+                    for i in range(-ring + 1, ring):
+                        ring_cells.append((origin_x - ring, origin_y + i))
+                        ring_cells.append((origin_x + ring, origin_y + i))
+
+                for cell in ring_cells:
+                    if cell in self._cells:
+                        visited += 1
+                        consider(cell)
+
+                ring += 1
+
+        return [(math.sqrt(-neg_dist_sq), location) for neg_dist_sq, _, location in sorted(best, reverse=True)]
@@ -0,0 +1,1388 @@
+import os
+import json
+import time
+import uuid
+import select
+import itertools
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+
+from database import ConnectionPool, PreparedConnection
+from search_index import NGramIndex
+from listing import ListingIndex, page_of
+
+# Setting every connection of a bot instance tags its changes with, read by the NOTIFY trigger
+INSTANCE_SETTING = "minecraft_bot.instance"
+
+# Errors meaning a read replica can not serve reads right now (unreachable, or no connection freed up in time)
+REPLICA_ERRORS = (psycopg2.OperationalError, psycopg2.pool.PoolError)
+
+# Amount of seconds a read replica that failed is left out of the rotation before being tried again
+REPLICA_BACKOFF_SECONDS = 30.0
+
+# Biggest NOTIFY payload (in bytes) sent with the changed row, PostgreSQL refuses payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+
+# Order locations are listed in on PostgreSQL, by code point whatever the database's collation, like SQLite and the in-memory listings (see listing.py)
+LISTING_ORDER = 'name COLLATE "C", id COLLATE "C"'
+LISTING_ORDER_DESC = 'name COLLATE "C" DESC, id COLLATE "C" DESC'
+
+# Columns selected for every location, in the order location_from_row expects them
+LOCATION_COLUMNS = "name, author, discord_id, x_coord, y_coord, z_coord, description, id, portal, guild_id"
+
+# Function to create the location dict from a row of the locations table
+def location_from_row(row):
+    """Function to create the dict representation of a location from a row of the locations table
+
+    Args:
+        row (tuple): Row with the columns name, author, discord_id, x_coord, y_coord, z_coord, description, id, portal, guild_id
+
+    Returns:
+        dict: Returns the location data in a dictionary/map format
+    """
+    return  {
+                "name" : row[0],
+                "author" : {"name" : row[1], "id" : row[2]},
+                "coords" : { "x" : row[3], "y" : row[4], "z" : row[5] },
+                "desc" : row[6],
+                "id" : row[7],
+                "portal" : bool(row[8]),
+                "guild_id" : row[9]
+            }
+
+# Function to read a yes/no value for the portal flag
+def portal_flag(value):
+    """Function to read whether a location is a Nether portal from a user entered value
+
+    Args:
+        value (str or bool): Value to read, i.e. 'true', 'yes', 'no', '1', True...
+
+    Returns:
+        bool: Returns the flag
+
+    Raises:
+        ValueError: If the value is not a yes/no value
+    """
+    if isinstance(value, bool):
+        return value
+
+    value = str(value).strip().lower()
+
+    if value in ["true", "yes", "y", "1", "on"]:
+        return True
+    if value in ["false", "no", "n", "0", "off", ""]:
+        return False
+
+    raise ValueError("'{}' is not a yes/no value".format(value))
+
+# Function to apply an edit to a location dict
+def edited_location(location, field_to_edit, edit):
+    """Function to create a copy of the given location data with one of its fields edited
+
+    Mirrors what editing the row in the database does.
+
+    Args:
+        location      (dict): Location data to edit
+        field_to_edit  (str): Name of the field to edit, can only be one of the following 'name', 'x', 'y', 'z', 'desc', 'portal'
+        edit           (str): The new value to edit the field with
+
+    Returns:
+        dict: Returns the edited location data
+
+    Raises:
+        ValueError: If a coordinate was edited to something that is not an integer, or the portal flag to something that is not yes/no
+    """
+    edited = dict(location)
+    edited["coords"] = dict(location["coords"])
+
+    if field_to_edit == "name":
+        edited["name"] = edit
+    elif field_to_edit == "desc":
+        edited["desc"] = edit
+    elif field_to_edit == "portal":
+        edited["portal"] = portal_flag(edit)
+    else:
+        # Same mapping as field_map, i.e. the entered 'y' (altitude) is stored as the z coordinate
+        coord = { 'x' : 'x', 'y' : 'z', 'z' : 'y' }[field_to_edit]
+        edited["coords"][coord] = int(edit)
+
+    return edited
+
+# Function to warn about locations that belong to no guild
+def warn_legacy_locations(count):
+    """Function to warn that locations saved before locations belonged to guilds were not moved to a guild, which hides them from every guild
+
+    Args:
+        count (int): Amount of locations with an empty guild ID
+    """
+    if count > 0:
+        print("WARN - {} locations were saved before locations belonged to servers and are not shown in any server, set LEGACY_GUILD_ID to the ID of the server they belong to".format(count))
+
+class StorageBackend(ABC):
+    """Class that every storage backend builds on, it lists the operations the Operator delegates to its backend
+
+    Locations belong to a guild (i.e. the discord server they were saved in) and every operation only ever sees
+    the locations of one guild, so its cost depends on the size of that guild and not on every guild's locations.
+
+    Backends raise exceptions when an operation fails, the Operator takes care of reporting them. A backend missing
+    one of the abstract operations can not be created at all, instead of failing in the middle of a command.
+
+    Stores...
+        Whether the backend keeps everything in memory (in which case the Operator skips its cache and worker threads)
+        Mapping of the editable fields to the actual name of the columns in the locations table
+
+    """
+    in_memory = False
+
+    # Dictionary to map the field_to_edit parameter to the actual name of the column in the sql table
+    field_map = { 'name' : 'name', 'x' : 'x_coord', 'y' : 'z_coord', 'z' : 'y_coord', 'desc' : 'description', 'portal' : 'portal'}
+
+    def setup(self, legacy_guild_id=None):
+        """Function to create the schema and indexes the backend relies on, if they do not exist yet
+
+        Args:
+            legacy_guild_id (str): ID of the guild to move the locations saved before locations belonged to guilds to (Default: None, i.e. leave them be)
+        """
+        pass
+
+    @abstractmethod
+    def add_location(self, location):
+        """Function to save a new location, in the guild given by its 'guild_id'
+
+        Args:
+            location (dict): Location data to save
+        """
+        pass
+
+    @abstractmethod
+    def add_locations(self, locations):
+        """Function to save a batch of new locations all at once, each in the guild given by its 'guild_id'
+
+        Args:
+            locations (list): List of location data to save
+        """
+        pass
+
+    @abstractmethod
+    def get_locations_by_name(self, guild_id, name):
+        """Function to get every location saved under exactly the given name
+
+        Args:
+            guild_id (str): ID of the guild the location belongs to
+            name     (str): Name of the location
+
+        Returns:
+            list: Returns a list of location data (normally zero or one)
+        """
+        pass
+
+    @abstractmethod
+    def get_locations_by_names(self, guild_id, names):
+        """Function to get every location saved under exactly one of the given names, all at once
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            names   (list): Names of the locations
+
+        Returns:
+            list: Returns a list of location data
+        """
+        pass
+
+    @abstractmethod
+    def get_locations_by_author(self, guild_id, author):
+        """Function to get every location saved by exactly the given author
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            author   (str): Name of the author
+
+        Returns:
+            list: Returns a list of location data
+        """
+        pass
+
+    @abstractmethod
+    def remove_location(self, guild_id, id):
+        """Function to remove a location
+
+        Args:
+            guild_id (str): ID of the guild the location belongs to
+            id       (str): ID of the location to remove
+        """
+        pass
+
+    @abstractmethod
+    def edit_location(self, guild_id, id, field_to_edit, edit):
+        """Function to edit one field of a location
+
+        Args:
+            guild_id      (str): ID of the guild the location belongs to
+            id            (str): ID of the location to edit
+            field_to_edit (str): Name of the field to edit, can only be one of the following 'name', 'x', 'y', 'z', 'desc', 'portal'
+            edit          (str): The new value to edit the field with
+        """
+        pass
+
+    @abstractmethod
+    def get_portal_locations(self, guild_id):
+        """Function to get every location tagged as a Nether portal
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+
+        Returns:
+            list: Returns a list of location data
+        """
+        pass
+
+    @abstractmethod
+    def search_locations(self, guild_id, search_token, query):
+        """Function to find the locations whose name or author contains the search token, ignoring case
+
+        Args:
+            guild_id     (str): ID of the guild the locations belong to
+            search_token (str): What is being searched for
+            query        (str): Either 'name', 'author' or 'all' (i.e. every location)
+
+        Returns:
+            list: Returns a list of location data
+        """
+        pass
+
+    @abstractmethod
+    def search_locations_page(self, guild_id, search_token, query, cursor, backwards, page_size):
+        """Function to get one page of the locations matching a search, in (name, id) order
+
+        Args:
+            guild_id      (str): ID of the guild the locations belong to
+            search_token  (str): What is being searched for
+            query         (str): Either 'name', 'author' or 'all' (i.e. every location)
+            cursor      (tuple): (name, id) key to start the page after, None for the first page
+            backwards    (bool): Flag to get the page before the cursor instead of after it
+            page_size     (int): Amount of locations on the page
+
+        Returns:
+            list, bool: Returns the page's list of location data and whether more locations follow in that direction
+        """
+        pass
+
+    @abstractmethod
+    def existing_location_names(self, guild_id, names):
+        """Function to find which of the given names are already used by saved locations
+
+        Args:
+            guild_id (str): ID of the guild the locations belong to
+            names   (list): Location names to check
+
+        Returns:
+            set: Returns the set of names that are already used
+        """
+        pass
+
+    @abstractmethod
+    def iter_locations(self, guild_id, chunk_size):
+        """Function to go over every location, chunk by chunk, in (name, id) order
+
+        Args:
+            guild_id   (str): ID of the guild the locations belong to
+            chunk_size (int): Amount of locations per chunk
+
+        Returns:
+            generator: Yields lists of at most 'chunk_size' location data
+        """
+        pass
+
+    def stats(self):
+        """Function to get a snapshot of the backend's state
+
+        Returns:
+            dict: Returns backend specific stats
+        """
+        return {}
+
+    def prewarm(self):
+        """Function to open the connections the backend keeps ready ahead of the first queries, if it was created without opening them"""
+        pass
+
+    def stick_to_primary(self, guild_id):
+        """Function to send the next reads of a guild to the primary database for a little while, i.e. after it was just written to
+
+        Only matters for backends reading from replicas, which may not have caught up with the write yet.
+
+        Args:
+            guild_id (str): ID of the guild that was written to
+        """
+        pass
+
+    def listen(self, callback):
+        """Function to start receiving the changes other bot instances make to the locations, from a background thread
+
+        Args:
+            callback (callable): Function called with every change (see PostgresChangeListener), or with None when
+                                 changes may have been missed and everything read before should be considered stale
+
+        Returns:
+            Returns the running listener, None if the backend has no way of being told about changes
+        """
+        return None
+
+    def close(self):
+        """Function to release everything the backend holds on to, used when shutting down"""
+        pass
+
+class MemoryPartition:
+    """Class to store the locations of a single guild in memory, see MemoryBackend
+
+    Every location is kept in a dict by ID, with secondary dicts by exact location name and by author name,
+    so lookups, edits and removals never go over the whole collection.
+
+    Stores...
+        Location ID -> location data (in the order they were added)
+        Location name -> {ID -> location data}
+        Author name -> {ID -> location data}
+        Location ID -> location data of every Nether portal
+        N-gram indexes over the location and author names for searching
+        (name, id) key of every location in listing order, for paging through them
+
+    """
+    def __init__(self):
+        self.locations = {}
+        self.by_name = {}
+        self.by_author = {}
+        self.portals = {}
+
+        # N-gram indexes over location and author names for searching
+        self.name_index = NGramIndex()
+        self.author_index = NGramIndex()
+
+        # Keys in listing order, kept sorted as locations come and go
+        self.listing = ListingIndex()
+
+        # Lock held while a location is written to every index
+        self._lock = threading.RLock()
+
+    # Function to add a location to every index
+    def _index(self, location):
+        """Function to add a location to the primary dict and every secondary index, except the listing (see add_locations)
+
+        Args:
+            location (dict): Location data to index
+        """
+        id = location["id"]
+
+        self.locations[id] = location
+        self.by_name.setdefault(location["name"], {})[id] = location
+        self.by_author.setdefault(location["author"]["name"], {})[id] = location
+
+        if location.get("portal", False):
+            self.portals[id] = location
+
+        self.name_index.add(id, location["name"], location)
+        self.author_index.add(id, location["author"]["name"], location)
+
+    # Function to remove a location from every index
+    def _unindex(self, id):
+        """Function to remove a location from the primary dict and every secondary index
+
+        Args:
+            id (str): ID of the location to remove
+
+        Returns:
+            dict or None: Returns the removed location data, None if there is no location with that ID
+        """
+        location = self.locations.pop(id, None)
+
+        if location is None:
+            return None
+
+        for index, key in [(self.by_name, location["name"]), (self.by_author, location["author"]["name"])]:
+            entries = index[key]
+            del entries[id]
+
+            if len(entries) == 0:
+                del index[key]
+
+        self.portals.pop(id, None)
+
+        self.name_index.remove(id)
+        self.author_index.remove(id)
+        self.listing.remove(location)
+
+        return location
+
+    def add_location(self, location):
+        self.add_locations([location])
+
+    def add_locations(self, locations):
+        with self._lock:
+            for location in locations:
+                # Saving a location again replaces it
+                self._unindex(location["id"])
+                self._index(location)
+
+            # All keys at once, so big batches are sorted in together
+            self.listing.add(locations)
+
+    def get_locations_by_name(self, name):
+        return list(self.by_name.get(name, {}).values())
+
+    def get_locations_by_names(self, names):
+        return [location for name in set(names) for location in self.by_name.get(name, {}).values()]
+
+    def get_locations_by_author(self, author):
+        return list(self.by_author.get(author, {}).values())
+
+    def get_portal_locations(self):
+        return list(self.portals.values())
+
+    def remove_location(self, id):
+        with self._lock:
+            self._unindex(id)
+
+    def edit_location(self, id, field_to_edit, edit):
+        with self._lock:
+            location = self.locations.get(id)
+
+            if location is None:
+                return
+
+            # Build the edited copy first, so a bad edit leaves every index untouched
+            edited = edited_location(location, field_to_edit, edit)
+
+            self._unindex(id)
+            self._index(edited)
+            self.listing.add([edited])
+
+    def search_locations(self, search_token, query):
+        # Soft search through the n-gram indexes, same as the database does it (i.e. search key appears in the name, ignoring case)
+        if query == "name":
+            return self.name_index.search(search_token)
+
+        if query == "author":
+            return self.author_index.search(search_token)
+
+        # Retrieve all locations
+        return list(self.locations.values())
+
+    def search_locations_page(self, search_token, query, cursor, backwards, page_size):
+        with self._lock:
+            if query == "all":
+                keys, more = self.listing.page(cursor, backwards, page_size)
+            else:
+                matches = self.search_locations(search_token, query)
+
+                # Few matches are quicker to sort than to find by walking the listing
+                if len(matches) * 16 < len(self.listing):
+                    keys, more = page_of(sorted((location["name"], location["id"]) for location in matches), cursor, backwards, page_size)
+                else:
+                    keys, more = self.listing.page(cursor, backwards, page_size, {location["id"] for location in matches})
+
+            return [self.locations[id] for _, id in keys], more
+
+    def existing_location_names(self, names):
+        return {name for name in names if name in self.by_name}
+
+    def iter_locations(self, chunk_size):
+        with self._lock:
+            locations = [self.locations[id] for _, id in self.listing.keys()]
+
+        for i in range(0, len(locations), chunk_size):
+            yield locations[i:i + chunk_size]
+
+class MemoryBackend(StorageBackend):
+    """Class to store locations in memory, used in dev mode (i.e. --dev)
+
+    Every guild's locations are kept in their own partition, so a guild's lookups and searches never go over
+    the locations of the other guilds. Nothing is persisted, everything is lost when the bot stops.
+
+    Stores...
+        Guild ID -> partition holding the guild's locations
+
+    """
+    in_memory = True
+
+    def __init__(self):
+        self.guilds = {}
+
+        # Lock held while a partition is created
+        self._lock = threading.Lock()
+
+    # Function to get the partition of a guild
+    def partition(self, guild_id):
+        """Function to get the partition holding the locations of a guild, creating it the first time
+
+        Args:
+            guild_id (str): ID of the guild
+
+        Returns:
+            MemoryPartition: Returns the guild's partition
+        """
+        partition = self.guilds.get(guild_id)
+
+        if partition is None:
+            with self._lock:
+                partition = self.guilds.setdefault(guild_id, MemoryPartition())
+
+        return partition
+
+    def add_location(self, location):
+        self.add_locations([location])
+
+    def add_locations(self, locations):
+        for location in locations:
+            self.partition(location["guild_id"]).add_locations([location])
+
+    def get_locations_by_name(self, guild_id, name):
+        return self.partition(guild_id).get_locations_by_name(name)
+
+    def get_locations_by_names(self, guild_id, names):
+        return self.partition(guild_id).get_locations_by_names(names)
+
+    def get_locations_by_author(self, guild_id, author):
+        return self.partition(guild_id).get_locations_by_author(author)
+
+    def get_portal_locations(self, guild_id):
+        return self.partition(guild_id).get_portal_locations()
+
+    def remove_location(self, guild_id, id):
+        self.partition(guild_id).remove_location(id)
+
+    def edit_location(self, guild_id, id, field_to_edit, edit):
+        self.partition(guild_id).edit_location(id, field_to_edit, edit)
+
+    def search_locations(self, guild_id, search_token, query):
+        return self.partition(guild_id).search_locations(search_token, query)
+
+    def search_locations_page(self, guild_id, search_token, query, cursor, backwards, page_size):
+        return self.partition(guild_id).search_locations_page(search_token, query, cursor, backwards, page_size)
+
+    def existing_location_names(self, guild_id, names):
+        return self.partition(guild_id).existing_location_names(names)
+
+    def iter_locations(self, guild_id, chunk_size):
+        return self.partition(guild_id).iter_locations(chunk_size)
+
+    def stats(self):
+        return {"backend" : "memory", "guilds" : len(self.guilds), "locations" : sum(len(partition.locations) for partition in list(self.guilds.values()))}
+
+class PostgresBackend(StorageBackend):
+    """Class to store locations in a PostgreSQL database, through a pool of connections
+
+    Every query is one of a fixed set of named, parameterized statements. Each pooled connection prepares
+    a statement the first time it runs it and reuses it from then on, so PostgreSQL parses and plans
+    each query shape once per connection instead of on every call.
+
+    Stores...
+        Pool of reusable database connections
+        Name of the locations table
+        Statement name -> SQL of every prepared statement
+        ID of this bot instance, which its connections tag their changes with
+        Listener receiving the changes of the other bot instances, once started
+        Pools of connections to the read replicas, if any, taking turns serving the reads
+        Guild ID -> time until which the guild's reads stay on the primary, for the guilds that were just written to
+        Replica pool -> time until which it is left out of the rotation, for the replicas that just failed
+
+    Reads are spread over the read replicas (round robin) while writes always go to the primary. A guild that
+    was just written to reads from the primary for a few seconds, so whoever wrote (and the caches filled by
+    their next commands) sees the write even if the replicas are lagging behind. A replica that fails is left out
+    of the rotation for a while, so the reads do not keep paying for a failed connection attempt.
+
+    """
+    def __init__(self, config, table_name="LOCATIONZ", prewarm=True):
+        self.config = config
+        self.table_name = table_name
+
+        # Every change made through this backend is tagged with the instance ID, so the instance can skip its own notifications
+        self.instance_id = uuid.uuid4().hex
+
+        # Pool of reusable database connections, which keep track of the statements prepared on them
+        # Without 'prewarm' no connection is opened until the first query, so a database that is slow to come up never holds up the caller
+        self.pool = ConnectionPool(config.DATABASE_URL, min_size=config.DATABASE_POOL_MIN, max_size=config.DATABASE_POOL_MAX, prewarm=prewarm, connection_factory=PreparedConnection, sslmode=config.DATABASE_SSLMODE, connect_timeout=config.DATABASE_CONNECT_TIMEOUT, options="-c {}={}".format(INSTANCE_SETTING, self.instance_id))
+
+        self.statements = self.build_statements()
+
+        self.listener = None
+
+        # Pools of reusable connections to the read replicas, each as big as the primary's
+        self.replica_pools = [ConnectionPool(url, min_size=config.DATABASE_POOL_MIN, max_size=config.DATABASE_POOL_MAX, prewarm=prewarm, connection_factory=PreparedConnection, sslmode=config.DATABASE_SSLMODE, connect_timeout=config.DATABASE_CONNECT_TIMEOUT) for url in config.DATABASE_REPLICA_URLS]
+        self._replicas = itertools.cycle(self.replica_pools)
+
+        # Amount of seconds a guild reads from the primary after being written to, i.e. how far behind the replicas may lag
+        self.sticky_seconds = config.DATABASE_REPLICA_STICKY_SECONDS
+        self._sticky = {}
+
+        self.replica_backoff = REPLICA_BACKOFF_SECONDS
+        self._unhealthy = {}
+
+        self._read_counters = {"primary_reads" : 0, "replica_reads" : 0, "replica_failures" : 0}
+        self._lock = threading.Lock()
+
+    # Name of the channel the changes to the locations table are sent on
+    @property
+    def channel(self):
+        return "{}_changes".format(self.table_name.lower())
+
+    # Function to build the SQL of every prepared statement
+    def build_statements(self):
+        """Function to build the SQL of every statement the backend prepares, by name
+
+        Returns:
+            dict: Returns statement name -> SQL (with $1, $2, ... placeholders)
+        """
+        table = self.table_name
+
+        # Every statement only looks at (or writes) the rows of one guild, given as $1 (execute() relies on it to know which guild a statement is for)
+        statements = {
+            "location_insert"         : "INSERT INTO {} (GUILD_ID,ID,NAME,AUTHOR,DISCORD_NAME,DISCORD_ID,X_COORD,Y_COORD,Z_COORD,DESCRIPTION,PORTAL) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)".format(table),
+            "location_by_name"        : "SELECT {} FROM {} WHERE guild_id = $1 AND name = $2".format(LOCATION_COLUMNS, table),
+            "location_by_names"       : "SELECT {} FROM {} WHERE guild_id = $1 AND name = ANY($2)".format(LOCATION_COLUMNS, table),
+            "location_by_author"      : "SELECT {} FROM {} WHERE guild_id = $1 AND author = $2".format(LOCATION_COLUMNS, table),
+            "location_delete"         : "DELETE FROM {} WHERE guild_id = $1 AND id = $2".format(table),
+            "location_existing_names" : "SELECT DISTINCT name FROM {} WHERE guild_id = $1 AND name = ANY($2)".format(table),
+            "location_search_all"     : "SELECT {} FROM {} WHERE guild_id = $1".format(LOCATION_COLUMNS, table),
+            "location_portals"        : "SELECT {} FROM {} WHERE guild_id = $1 AND portal".format(LOCATION_COLUMNS, table),
+        }
+
+        # One update per editable column
+        for column in self.field_map.values():
+            statements["location_edit_{}".format(column)] = "UPDATE {} SET {} = $3 WHERE guild_id = $1 AND id = $2".format(table, column)
+
+        for query in ["name", "author"]:
+            statements["location_search_{}".format(query)] = "SELECT {} FROM {} WHERE guild_id = $1 AND UPPER({}) LIKE UPPER($2)".format(LOCATION_COLUMNS, table, query)
+
+        # One page query per search and direction, with and without a cursor to start from, ordered by code point (see LISTING_ORDER)
+        for query in ["name", "author", "all"]:
+            for direction in ["first", "last", "after", "before"]:
+                conditions = ["guild_id = $1"]
+                params = 1
+
+                if query != "all":
+                    conditions.append("UPPER({}) LIKE UPPER(${})".format(query, params + 1))
+                    params += 1
+
+                if direction in ["after", "before"]:
+                    conditions.append("(name COLLATE \"C\", id COLLATE \"C\") {} (${}, ${})".format(">" if direction == "after" else "<", params + 1, params + 2))
+                    params += 2
+
+                where = " AND ".join(conditions)
+                order = LISTING_ORDER_DESC if direction in ["last", "before"] else LISTING_ORDER
+
+                statements["location_page_{}_{}".format(query, direction)] = "SELECT {} FROM {} WHERE {} ORDER BY {} LIMIT ${}".format(LOCATION_COLUMNS, table, where, order, params + 1)
+
+        return statements
+
+    # Function to run one of the prepared statements
+    def execute(self, name, params=(), fetch=False, read=False):
+        """Function to run one of the prepared statements on a pooled connection, in its own transaction
+
+        Reads go to one of the read replicas (see read_pool) and fall back to the primary if the replica can not be
+        reached. Everything else is a write, which goes to the primary and keeps the guild's reads there for a while.
+
+        Args:
+            name     (str): Name of the statement (see build_statements)
+            params (tuple): Values of the statement's parameters, the first one always being the guild ID (Default: No parameters)
+            fetch   (bool): Flag to fetch and return the resulting rows (Default: False)
+            read    (bool): Flag for statements that only read (Default: False)
+
+        Returns:
+            list or None: Returns the resulting rows if fetching, None otherwise
+        """
+        guild_id = params[0] if len(params) > 0 else None
+
+        if not read:
+            # Reads racing the write already stay on the primary
+            self.stick_to_primary(guild_id)
+            rows = self.execute_on(self.pool, name, params, fetch)
+            # The window starts again once the write is visible
+            self.stick_to_primary(guild_id)
+            return rows
+
+        pool = self.read_pool(guild_id)
+
+        try:
+            return self.execute_on(pool, name, params, fetch)
+        except REPLICA_ERRORS as e:
+            if pool is self.pool:
+                raise
+
+            self.replica_failed(pool, e)
+
+            return self.execute_on(self.pool, name, params, fetch)
+
+    # Function to run one of the prepared statements on the given pool
+    def execute_on(self, pool, name, params=(), fetch=False):
+        """Function to run one of the prepared statements on a connection of the given pool, in its own transaction
+
+        Args:
+            pool (ConnectionPool): Pool to borrow the connection from (the primary's or a replica's)
+            name            (str): Name of the statement (see build_statements)
+            params        (tuple): Values of the statement's parameters (Default: No parameters)
+            fetch          (bool): Flag to fetch and return the resulting rows (Default: False)
+
+        Returns:
+            list or None: Returns the resulting rows if fetching, None otherwise
+        """
+        rows = None
+
+        # Borrow a connection from the pool
+        with pool.connection() as con:
+            # Create cursor to perform commands
+            cur = con.cursor()
+
+            con.execute_prepared(cur, name, self.statements[name], tuple(params))
+
+            if fetch:
+                rows = cur.fetchall()
+
+            # Commit DB changes, the connection goes back to the pool
+            con.commit()
+
+        return rows
+
+    # Function to pick the pool a read goes to
+    def read_pool(self, guild_id):
+        """Function to pick the pool a read of a guild's locations runs on, the next replica in turn unless the guild was just written to
+
+        Args:
+            guild_id (str): ID of the guild being read
+
+        Returns:
+            ConnectionPool: Returns the pool to borrow a connection from
+        """
+        if len(self.replica_pools) == 0:
+            return self.pool
+
+        with self._lock:
+            now = time.monotonic()
+
+            if self._sticky.get(guild_id, 0) > now:
+                self._read_counters["primary_reads"] += 1
+                return self.pool
+
+            self._sticky.pop(guild_id, None)
+
+            # Next replica in turn that did not just fail, the primary if every one of them did
+            for _ in range(len(self.replica_pools)):
+                pool = next(self._replicas)
+
+                if self._unhealthy.get(pool, 0) <= now:
+                    self._unhealthy.pop(pool, None)
+                    self._read_counters["replica_reads"] += 1
+                    return pool
+
+            self._read_counters["primary_reads"] += 1
+
+            return self.pool
+
+    # Function to take a failing replica out of the rotation
+    def replica_failed(self, pool, error):
+        """Function to leave a read replica that could not serve a read out of the rotation for 'replica_backoff' seconds
+
+        Args:
+            pool (ConnectionPool): Pool of the replica that failed
+            error    (Exception): What went wrong
+        """
+        print("WARN - Read replica unavailable, reading from the primary for {} seconds due to: {}".format(self.replica_backoff, error))
+
+        with self._lock:
+            self._read_counters["replica_failures"] += 1
+            self._unhealthy[pool] = time.monotonic() + self.replica_backoff
+
+    def prewarm(self):
+        for pool in [self.pool] + self.replica_pools:
+            pool.prewarm()
+
+    def stick_to_primary(self, guild_id):
+        if len(self.replica_pools) == 0:
+            return
+
+        with self._lock:
+            self._sticky[guild_id] = time.monotonic() + self.sticky_seconds
+
+    def setup(self, legacy_guild_id=None):
+        """Function to create the locations table and the indexes that the bot's queries rely on, if they do not exist yet
+
+        Every index leads with the guild ID, so a query only ever reads the index entries of its own guild.
+
+        Creates...
+            The locations table
+            The portal and guild ID columns, on tables created before locations could be tagged as Nether portals or belonged to guilds
+            A B-tree index on the guild ID, location name and ID for exact name lookups
+            A B-tree index on the guild ID, location name and ID in the "C" collation for listing locations page by page (see LISTING_ORDER)
+            A B-tree index on the guild ID and author name for listing the locations of an author
+            Trigram (pg_trgm) GIN indexes on the guild ID and upper cased location and author names (btree_gin is what
+            lets the guild ID be part of them), which the 'UPPER(...) LIKE UPPER('%token%')' searches can use instead of scanning the table
+            A partial index on the Nether portals of every guild
+            A trigger sending every inserted, updated and deleted row on the table's NOTIFY channel (see PostgresChangeListener)
+
+        Args:
+            legacy_guild_id (str): ID of the guild to move the locations saved before locations belonged to guilds to (Default: None, i.e. leave them be)
+        """
+        # Borrow a connection from the pool
+        with self.pool.connection() as con:
+            # Create cursor to perform commands
+            cur = con.cursor()
+
+            cur.execute("CREATE TABLE IF NOT EXISTS {} (ID TEXT PRIMARY KEY, NAME TEXT NOT NULL, AUTHOR TEXT, DISCORD_NAME TEXT, DISCORD_ID TEXT, X_COORD INTEGER, Y_COORD INTEGER, Z_COORD INTEGER, DESCRIPTION TEXT)".format(self.table_name))
+            cur.execute("ALTER TABLE {} ADD COLUMN IF NOT EXISTS PORTAL BOOLEAN NOT NULL DEFAULT FALSE".format(self.table_name))
+            cur.execute("ALTER TABLE {} ADD COLUMN IF NOT EXISTS GUILD_ID TEXT NOT NULL DEFAULT ''".format(self.table_name))
+
+            # Locations saved before they belonged to guilds have an empty guild ID
+            if legacy_guild_id:
+                cur.execute("UPDATE {} SET GUILD_ID = %s WHERE GUILD_ID = ''".format(self.table_name), (legacy_guild_id,))
+
+            cur.execute("SELECT COUNT(*) FROM {} WHERE GUILD_ID = ''".format(self.table_name))
+            warn_legacy_locations(cur.fetchone()[0])
+
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+
+            # Indexes from before locations belonged to guilds, replaced by the ones leading with the guild ID
+            for index in ["name_id_idx", "name_trgm_idx", "author_trgm_idx", "portal_idx"]:
+                cur.execute("DROP INDEX IF EXISTS {}_{}".format(self.table_name, index))
+
+            cur.execute("CREATE INDEX IF NOT EXISTS {0}_guild_name_id_idx ON {0} (guild_id, name, id)".format(self.table_name))
+            cur.execute("CREATE INDEX IF NOT EXISTS {0}_guild_listing_idx ON {0} (guild_id, name COLLATE \"C\", id COLLATE \"C\")".format(self.table_name))
+            cur.execute("CREATE INDEX IF NOT EXISTS {0}_guild_author_idx ON {0} (guild_id, author)".format(self.table_name))
+            cur.execute("CREATE INDEX IF NOT EXISTS {0}_guild_name_trgm_idx ON {0} USING gin (guild_id, UPPER(name) gin_trgm_ops)".format(self.table_name))
+            cur.execute("CREATE INDEX IF NOT EXISTS {0}_guild_author_trgm_idx ON {0} USING gin (guild_id, UPPER(author) gin_trgm_ops)".format(self.table_name))
+            cur.execute("CREATE INDEX IF NOT EXISTS {0}_guild_portal_idx ON {0} (guild_id) WHERE portal".format(self.table_name))
+
+            # Tell every listening bot instance about every change, along with the changed row when it fits in a notification
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION {0}_notify() RETURNS trigger AS $$
+                DECLARE
+                    changed RECORD;
+                    payload TEXT;
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        changed := OLD;
+                    ELSE
+                        changed := NEW;
+                    END IF;
+
+                    payload := json_build_object('op', TG_OP, 'instance', current_setting('{1}', true), 'guild_id', changed.guild_id, 'id', changed.id,
+                                                 'location', CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE row_to_json(changed) END)::text;
+
+                    IF octet_length(payload) > {2} THEN
+                        payload := json_build_object('op', TG_OP, 'instance', current_setting('{1}', true), 'guild_id', changed.guild_id, 'id', changed.id)::text;
+                    END IF;
+
+                    PERFORM pg_notify('{3}', payload);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """.format(self.table_name, INSTANCE_SETTING, MAX_NOTIFY_PAYLOAD, self.channel))
+            cur.execute("DROP TRIGGER IF EXISTS {0}_notify_trigger ON {0}".format(self.table_name))
+            cur.execute("CREATE TRIGGER {0}_notify_trigger AFTER INSERT OR UPDATE OR DELETE ON {0} FOR EACH ROW EXECUTE PROCEDURE {0}_notify()".format(self.table_name))
+
+            # Commit DB changes
+            con.commit()
+
+    def add_location(self, location):
+        # Execute PostgreSQL command to add new location data
+        self.execute("location_insert", (location["guild_id"], location["id"], location["name"], location["author"]["name"], location["author"]["discord_name"], location["author"]["id"], location["coords"]["x"], location["coords"]["y"], location["coords"]["z"], location["desc"], location.get("portal", False)))
+
+    def add_locations(self, locations):
+        values = [(location["id"], location["name"], location["author"]["name"], location["author"]["discord_name"], location["author"]["id"], location["coords"]["x"], location["coords"]["y"], location["coords"]["z"], location["desc"], location.get("portal", False), location["guild_id"]) for location in locations]
+
+        # Borrow a connection from the pool
+        with self.pool.connection() as con:
+            # Create cursor to perform commands
+            cur = con.cursor()
+            # Every row in one statement and one transaction
+            psycopg2.extras.execute_values(cur, "INSERT INTO {} (ID,NAME,AUTHOR,DISCORD_NAME,DISCORD_ID,X_COORD,Y_COORD,Z_COORD,DESCRIPTION,PORTAL,GUILD_ID) VALUES %s".format(self.table_name), values, page_size=1000)
+            # Commit DB changes
+            con.commit()
+
+        for guild_id in {location["guild_id"] for location in locations}:
+            self.stick_to_primary(guild_id)
+
+    def get_locations_by_name(self, guild_id, name):
+        rows = self.execute("location_by_name", (guild_id, name), fetch=True, read=True)
+
+        return [location_from_row(row) for row in rows]
+
+    def get_locations_by_names(self, guild_id, names):
+        rows = self.execute("location_by_names", (guild_id, list(names)), fetch=True, read=True)
+
+        return [location_from_row(row) for row in rows]
+
+    def get_locations_by_author(self, guild_id, author):
+        rows = self.execute("location_by_author", (guild_id, author), fetch=True, read=True)
+
+        return [location_from_row(row) for row in rows]
+
+    def get_portal_locations(self, guild_id):
+        rows = self.execute("location_portals", (guild_id,), fetch=True, read=True)
+
+        return [location_from_row(row) for row in rows]
+
+    def remove_location(self, guild_id, id):
+        # Delete location entry based on the ID
+        self.execute("location_delete", (guild_id, id))
+
+    def edit_location(self, guild_id, id, field_to_edit, edit):
+        # Edit location entry based on the ID
+        self.execute("location_edit_{}".format(self.field_map[field_to_edit]), (guild_id, id, edit))
+
+    def search_locations(self, guild_id, search_token, query):
+        # Retrieve all locations
+        if query == "all":
+            rows = self.execute("location_search_all", (guild_id,), fetch=True, read=True)
+
+        # Search for location based on location or author name
+        else:
+            rows = self.execute("location_search_{}".format(query), (guild_id, "%{}%".format(search_token)), fetch=True, read=True)
+
+        return [location_from_row(row) for row in rows]
+
+    def search_locations_page(self, guild_id, search_token, query, cursor, backwards, page_size):
+        params = [guild_id] if query == "all" else [guild_id, "%{}%".format(search_token)]
+
+        # Start after (or before) the cursor
+        if cursor is None:
+            direction = "last" if backwards else "first"
+        else:
+            direction = "before" if backwards else "after"
+            params += list(cursor)
+
+        # Grab one extra row to know if there is another page
+        rows = self.execute("location_page_{}_{}".format(query, direction), params + [page_size + 1], fetch=True, read=True)
+
+        more = len(rows) > page_size
+        page = [location_from_row(row) for row in rows[:page_size]]
+
+        # Rows were read in reverse order when going backwards
+        if backwards:
+            page.reverse()
+
+        return page, more
+
+    def existing_location_names(self, guild_id, names):
+        rows = self.execute("location_existing_names", (guild_id, list(names)), fetch=True, read=True)
+
+        return {row[0] for row in rows}
+
+    def iter_locations(self, guild_id, chunk_size):
+        pool = self.read_pool(guild_id)
+        started = False
+
+        try:
+            for chunk in self.iter_rows(pool, guild_id, chunk_size):
+                started = True
+                yield chunk
+
+            return
+        except REPLICA_ERRORS as e:
+            # Half sent exports can not be picked up where they were on another database
+            if pool is self.pool or started:
+                raise
+
+            self.replica_failed(pool, e)
+
+        yield from self.iter_rows(self.pool, guild_id, chunk_size)
+
+    # Function to stream the locations of a guild from the given pool
+    def iter_rows(self, pool, guild_id, chunk_size):
+        """Function to go over every location of a guild on a connection of the given pool, chunk by chunk, in (name, id) order
+
+        Args:
+            pool (ConnectionPool): Pool to borrow the connection from (the primary's or a replica's)
+            guild_id        (str): ID of the guild the locations belong to
+            chunk_size      (int): Amount of locations per chunk
+
+        Returns:
+            generator: Yields lists of at most 'chunk_size' location data
+        """
+        # Borrow a connection from the pool for as long as the rows are being read
+        with pool.connection() as con:
+            # Named cursors live on the server and send rows over as they are fetched (they can not run prepared statements)
+            cur = con.cursor(name="export_{}".format(os.urandom(8).hex()))
+            cur.itersize = chunk_size
+
+            cur.execute("SELECT {} FROM {} WHERE guild_id = %s ORDER BY {}".format(LOCATION_COLUMNS, self.table_name, LISTING_ORDER), (guild_id,))
+
+            while True:
+                rows = cur.fetchmany(chunk_size)
+
+                if len(rows) == 0:
+                    break
+
+                yield [location_from_row(row) for row in rows]
+
+            cur.close()
+
+    def stats(self):
+        stats = {"backend" : "postgres", "statements" : len(self.statements)}
+        stats.update(self.pool.stats())
+
+        if len(self.replica_pools) > 0:
+            stats["replicas"] = len(self.replica_pools)
+            with self._lock:
+                stats.update(self._read_counters)
+                stats["replicas_unhealthy"] = sum(1 for until in self._unhealthy.values() if until > time.monotonic())
+
+        return stats
+
+    def listen(self, callback):
+        if self.listener is None:
+            self.listener = PostgresChangeListener(self.config, self.channel, self.instance_id, callback)
+            self.listener.start()
+
+        return self.listener
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+        self.pool.close_all()
+
+        for pool in self.replica_pools:
+            pool.close_all()
+
+class PostgresChangeListener:
+    """Class to receive the changes other bot instances make to the locations table, through PostgreSQL's LISTEN/NOTIFY
+
+    A trigger on the table (see PostgresBackend.setup) sends every inserted, updated and deleted row on a channel.
+    The listener holds its own connection LISTENing on that channel from a background thread and hands every
+    change to the callback as a dict with...
+        'op'        : 'INSERT', 'UPDATE' or 'DELETE'
+        'guild_id'  : ID of the guild the location belongs to
+        'id'        : ID of the location
+        'location'  : The location data after the change, None for deletes and for rows too big to fit in a notification
+
+    Changes made by this instance are skipped, it already applied them itself. Notifications sent while the
+    connection is down are lost, so the callback is called with None every time the listener reconnects.
+
+    Stores...
+        Database settings to connect with
+        Name of the channel to listen on
+        ID of this bot instance
+        Function to call with every change
+        Background thread doing the listening
+
+    """
+    def __init__(self, config, channel, instance_id, callback, reconnect_interval=5.0):
+        self.config = config
+        self.channel = channel
+        self.instance_id = instance_id
+        self.callback = callback
+        self.reconnect_interval = reconnect_interval
+
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # Function to start listening
+    def start(self):
+        """Function to start the background thread listening for changes"""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+        self._thread.start()
+
+    # Function to stop listening
+    def stop(self):
+        """Function to stop the background thread, waiting at most a couple of seconds for it"""
+        self._stopped.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # Function to hand a notification to the callback
+    def _dispatch(self, payload):
+        """Function to read a notification's payload and pass it on to the callback, unless this instance made the change
+
+        Args:
+            payload (str): JSON payload sent by the trigger
+        """
+        change = json.loads(payload)
+
+        if change.get("instance") == self.instance_id:
+            return
+
+        row = change.get("location")
+        change["location"] = None if row is None else location_from_row((row["name"], row["author"], row["discord_id"], row["x_coord"], row["y_coord"], row["z_coord"], row["description"], row["id"], row["portal"], row["guild_id"]))
+
+        self.callback(change)
+
+    # Function run by the background thread
+    def _run(self):
+        """Function to keep a connection LISTENing on the channel and pass on every notification until stopped, reconnecting whenever it drops"""
+        connected_before = False
+
+        while not self._stopped.is_set():
+            con = None
+
+            try:
+                con = psycopg2.connect(self.config.DATABASE_URL, sslmode=self.config.DATABASE_SSLMODE, connect_timeout=self.config.DATABASE_CONNECT_TIMEOUT)
+                con.autocommit = True
+                con.cursor().execute("LISTEN {}".format(self.channel))
+
+                # Anything could have changed while the connection was down
+                if connected_before:
+                    self.callback(None)
+                connected_before = True
+
+                while not self._stopped.is_set():
+                    # Wake up every second to check whether the listener was stopped
+                    if select.select([con], [], [], 1.0) == ([], [], []):
+                        continue
+
+                    con.poll()
+
+                    while con.notifies:
+                        notify = con.notifies.pop(0)
+
+                        try:
+                            self._dispatch(notify.payload)
+                        except Exception as e:
+                            print("WARN - Unable to apply the change notification '{}' due to: {}".format(notify.payload, e))
+
+            except psycopg2.Error as e:
+                print("WARN - Lost the connection listening for location changes, reconnecting in {}s due to: {}".format(self.reconnect_interval, e))
+                self._stopped.wait(self.reconnect_interval)
+
+            finally:
+                if con is not None:
+                    try:
+                        con.close()
+                    except Exception:
+                        pass
+
+class SQLiteBackend(StorageBackend):
+    """Class to store locations in an embedded SQLite database file, so the bot can run without any external service
+
+    The database runs in WAL mode so reads never wait on writes, with the same locations table as PostgreSQL.
+    Name and author searches go through an FTS5 trigram index (when the SQLite build supports it).
+
+    Stores...
+        Path of the database file
+        Name of the locations table
+        One connection per thread (SQLite connections can not be shared between threads)
+        Whether the trigram search index is available
+
+    """
+    def __init__(self, path, table_name="LOCATIONZ"):
+        self.path = path
+        self.table_name = table_name
+        self.fts = False
+
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    # Function to get the connection of the current thread
+    def connection(self):
+        """Function to get the current thread's connection to the database file, opening it the first time
+
+        Returns:
+            Connection: Returns the sqlite3 connection of the current thread
+        """
+        con = getattr(self._local, "con", None)
+
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=10)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+
+            self._local.con = con
+            with self._lock:
+                self._connections.append(con)
+
+        return con
+
+    def setup(self, legacy_guild_id=None):
+        """Function to create the locations table and its indexes, if they do not exist yet
+
+        Creates...
+            The locations table (same columns as PostgreSQL, plus an integer row number for the search index)
+            A unique index on the location ID, an index on the guild ID, location name and ID and one on the guild ID and author name
+            A partial index on the Nether portals of every guild
+            An FTS5 trigram index on the location and author names, kept in sync by triggers
+
+        Args:
+            legacy_guild_id (str): ID of the guild to move the locations saved before locations belonged to guilds to (Default: None, i.e. leave them be)
+        """
+        con = self.connection()
+
+        with con:
+            con.execute("CREATE TABLE IF NOT EXISTS {} (NUM INTEGER PRIMARY KEY, ID TEXT NOT NULL, NAME TEXT NOT NULL, AUTHOR TEXT, DISCORD_NAME TEXT, DISCORD_ID TEXT, X_COORD INTEGER, Y_COORD INTEGER, Z_COORD INTEGER, DESCRIPTION TEXT)".format(self.table_name))
+            # Add the portal column to tables created before locations could be tagged as Nether portals
+            columns = [row[1].lower() for row in con.execute("PRAGMA table_info({})".format(self.table_name))]
+            if "portal" not in columns:
+                con.execute("ALTER TABLE {} ADD COLUMN PORTAL INTEGER NOT NULL DEFAULT 0".format(self.table_name))
+            # Same for the guild ID, on tables created before locations belonged to guilds
+            if "guild_id" not in columns:
+                con.execute("ALTER TABLE {} ADD COLUMN GUILD_ID TEXT NOT NULL DEFAULT ''".format(self.table_name))
+
+            if legacy_guild_id:
+                con.execute("UPDATE {} SET GUILD_ID = ? WHERE GUILD_ID = ''".format(self.table_name), (legacy_guild_id,))
+
+            warn_legacy_locations(con.execute("SELECT COUNT(*) FROM {} WHERE GUILD_ID = ''".format(self.table_name)).fetchone()[0])
+
+            # Indexes from before locations belonged to guilds, replaced by the ones leading with the guild ID
+            for index in ["name_id_idx", "portal_idx"]:
+                con.execute("DROP INDEX IF EXISTS {}_{}".format(self.table_name, index))
+
+            con.execute("CREATE UNIQUE INDEX IF NOT EXISTS {0}_id_idx ON {0} (id)".format(self.table_name))
+            con.execute("CREATE INDEX IF NOT EXISTS {0}_guild_portal_idx ON {0} (guild_id) WHERE portal = 1".format(self.table_name))
+            con.execute("CREATE INDEX IF NOT EXISTS {0}_guild_name_id_idx ON {0} (guild_id, name, id)".format(self.table_name))
+            con.execute("CREATE INDEX IF NOT EXISTS {0}_guild_author_idx ON {0} (guild_id, author)".format(self.table_name))
+
+        try:
+            with con:
+                created = con.execute("SELECT 1 FROM sqlite_master WHERE name = ?", ("{}_fts".format(self.table_name),)).fetchone() is None
+                con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS {0}_fts USING fts5(name, author, content='{0}', content_rowid='num', tokenize='trigram')".format(self.table_name))
+
+                # Index the rows saved before the index existed, the triggers can not update or delete rows it does not know about
+                if created:
+                    con.execute("INSERT INTO {0}_fts ({0}_fts) VALUES ('rebuild')".format(self.table_name))
+
+                con.execute("CREATE TRIGGER IF NOT EXISTS {0}_fts_insert AFTER INSERT ON {0} BEGIN INSERT INTO {0}_fts (rowid, name, author) VALUES (new.num, new.name, new.author); END".format(self.table_name))
+                con.execute("CREATE TRIGGER IF NOT EXISTS {0}_fts_delete AFTER DELETE ON {0} BEGIN INSERT INTO {0}_fts ({0}_fts, rowid, name, author) VALUES ('delete', old.num, old.name, old.author); END".format(self.table_name))
+                con.execute("CREATE TRIGGER IF NOT EXISTS {0}_fts_update AFTER UPDATE ON {0} BEGIN INSERT INTO {0}_fts ({0}_fts, rowid, name, author) VALUES ('delete', old.num, old.name, old.author); INSERT INTO {0}_fts (rowid, name, author) VALUES (new.num, new.name, new.author); END".format(self.table_name))
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print("WARN - SQLite trigram search index unavailable, searches will scan the table: {}".format(e))
+
+    def add_location(self, location):
+        self.add_locations([location])
+
+    def add_locations(self, locations):
+        values = [(location["id"], location["name"], location["author"]["name"], location["author"]["discord_name"], location["author"]["id"], location["coords"]["x"], location["coords"]["y"], location["coords"]["z"], location["desc"], location.get("portal", False), location["guild_id"]) for location in locations]
+
+        # Every row in one transaction
+        with self.connection() as con:
+            con.executemany("INSERT INTO {} (ID,NAME,AUTHOR,DISCORD_NAME,DISCORD_ID,X_COORD,Y_COORD,Z_COORD,DESCRIPTION,PORTAL,GUILD_ID) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)".format(self.table_name), values)
+
+    def get_locations_by_name(self, guild_id, name):
+        rows = self.connection().execute("SELECT {} FROM {} WHERE guild_id = ? AND name = ?".format(LOCATION_COLUMNS, self.table_name), (guild_id, name)).fetchall()
+
+        return [location_from_row(row) for row in rows]
+
+    def get_locations_by_names(self, guild_id, names):
+        names = list(names)
+        rows = self.connection().execute("SELECT {} FROM {} WHERE guild_id = ? AND name IN ({})".format(LOCATION_COLUMNS, self.table_name, ",".join("?" * len(names))), [guild_id] + names).fetchall()
+
+        return [location_from_row(row) for row in rows]
+
+    def get_locations_by_author(self, guild_id, author):
+        rows = self.connection().execute("SELECT {} FROM {} WHERE guild_id = ? AND author = ?".format(LOCATION_COLUMNS, self.table_name), (guild_id, author)).fetchall()
+
+        return [location_from_row(row) for row in rows]
+
+    def get_portal_locations(self, guild_id):
+        rows = self.connection().execute("SELECT {} FROM {} WHERE guild_id = ? AND portal = 1".format(LOCATION_COLUMNS, self.table_name), (guild_id,)).fetchall()
+
+        return [location_from_row(row) for row in rows]
+
+    def remove_location(self, guild_id, id):
+        with self.connection() as con:
+            con.execute("DELETE FROM {} WHERE guild_id = ? AND id = ?".format(self.table_name), (guild_id, id))
+
+    def edit_location(self, guild_id, id, field_to_edit, edit):
+        # Coordinates are stored as integers, the portal flag as 0 or 1
+        if field_to_edit in ['x', 'y', 'z']:
+            edit = int(edit)
+        elif field_to_edit == 'portal':
+            edit = int(portal_flag(edit))
+
+        with self.connection() as con:
+            con.execute("UPDATE {} SET {} = ? WHERE guild_id = ? AND id = ?".format(self.table_name, self.field_map[field_to_edit]), (edit, guild_id, id))
+
+    # Function to get the filter for a search
+    def search_filter(self, guild_id, search_token, query):
+        """Function to get the WHERE clause and parameters that find the locations of a guild matching a search
+
+        Args:
+            guild_id     (str): ID of the guild the locations belong to
+            search_token (str): What is being searched for
+            query        (str): Either 'name', 'author' or 'all' (i.e. every location)
+
+        Returns:
+            str, list: Returns the WHERE clause and its parameters
+        """
+        if query == "all":
+            return "guild_id = ?", [guild_id]
+
+        # LIKE is case insensitive in SQLite, and uses the trigram index when searching the FTS table
+        if self.fts:
+            return "guild_id = ? AND num IN (SELECT rowid FROM {}_fts WHERE {} LIKE ?)".format(self.table_name, query), [guild_id, "%{}%".format(search_token)]
+
+        return "guild_id = ? AND {} LIKE ?".format(query), [guild_id, "%{}%".format(search_token)]
+
+    def search_locations(self, guild_id, search_token, query):
+        where, params = self.search_filter(guild_id, search_token, query)
+
+        rows = self.connection().execute("SELECT {} FROM {} WHERE {}".format(LOCATION_COLUMNS, self.table_name, where), params).fetchall()
+
+        return [location_from_row(row) for row in rows]
+
+    def search_locations_page(self, guild_id, search_token, query, cursor, backwards, page_size):
+        where, params = self.search_filter(guild_id, search_token, query)
+
+        # Start after (or before) the cursor
+        if cursor is not None:
+            where += " AND (name, id) {} (?, ?)".format("<" if backwards else ">")
+            params += list(cursor)
+
+        order = "name DESC, id DESC" if backwards else "name, id"
+
+        # Grab one extra row to know if there is another page
+        rows = self.connection().execute("SELECT {} FROM {} WHERE {} ORDER BY {} LIMIT ?".format(LOCATION_COLUMNS, self.table_name, where, order), params + [page_size + 1]).fetchall()
+
+        more = len(rows) > page_size
+        page = [location_from_row(row) for row in rows[:page_size]]
+
+        # Rows were read in reverse order when going backwards
+        if backwards:
+            page.reverse()
+
+        return page, more
+
+    def existing_location_names(self, guild_id, names):
+        existing = set()
+        con = self.connection()
+
+        # Stay under SQLite's limit on the amount of parameters in a statement
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            rows = con.execute("SELECT DISTINCT name FROM {} WHERE guild_id = ? AND name IN ({})".format(self.table_name, ",".join("?" * len(chunk))), [guild_id] + chunk).fetchall()
+            existing.update(row[0] for row in rows)
+
+        return existing
+
+    def iter_locations(self, guild_id, chunk_size):
+        # SQLite steps through the rows as they are fetched
+        cur = self.connection().execute("SELECT {} FROM {} WHERE guild_id = ? ORDER BY name, id".format(LOCATION_COLUMNS, self.table_name), (guild_id,))
+
+        while True:
+            rows = cur.fetchmany(chunk_size)
+
+            if len(rows) == 0:
+                break
+
+            yield [location_from_row(row) for row in rows]
+
+        cur.close()
+
+    def stats(self):
+        return {"backend" : "sqlite", "path" : self.path, "trigram_index" : self.fts}
+
+    def close(self):
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+
+        for con in connections:
+            try:
+                con.close()
+            except sqlite3.Error:
+                pass
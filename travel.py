@@ -0,0 +1,264 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class TravelGraph:
+    """Class to find the fastest way between two locations, walking through the overworld or taking the Nether portals
+
+    Between two points in the same dimension the fastest way is a straight line, so the only stops that
+    matter are the portals. The graph has one overworld node and one Nether node per portal (the Nether
+    node sits at the portal's coordinates divided by the Nether scale), plus the location the trip starts from.
+    Going through a portal takes a fixed amount of time.
+
+    Dijkstra runs once per starting location over that graph and the resulting shortest path tree is cached,
+    any destination is then answered by checking which overworld node to walk to it from. Trees are thrown
+    away whenever a portal is added, moved or removed.
+
+    Stores...
+        Portal location ID -> location data
+        Overworld coordinates of every portal, in the same order as the portal IDs
+        Cache of shortest path trees by (starting location, speed), least recently used first
+        Counters describing how the cache has been used (see stats())
+
+    """
+    def __init__(self, nether_scale=8, portal_time=4.0, max_trees=256):
+        self.nether_scale = nether_scale
+        self.portal_time = portal_time
+        self.max_trees = max_trees
+
+        self._portals = {}
+        self._portal_ids = []
+        self._portal_coords = np.zeros((0, 2))
+
+        self._trees = OrderedDict()
+        self._counters = {"hits" : 0, "misses" : 0}
+
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._portals)
+
+    # Function to rebuild the portal arrays after the portals changed
+    def _portals_changed(self):
+        """Function to rebuild the portal coordinates array and drop every cached tree, since they all depend on the portals"""
+        self._portal_ids = list(self._portals.keys())
+        self._portal_coords = np.array([(portal["coords"]["x"], portal["coords"]["y"]) for portal in self._portals.values()], dtype=float).reshape(-1, 2)
+
+        self._trees.clear()
+
+    # Function to set every portal at once
+    def set_portals(self, portals):
+        """Function to replace every portal in the graph
+
+        Args:
+            portals (list): List of location data of every portal
+        """
+        with self._lock:
+            self._portals = {portal["id"] : portal for portal in portals}
+            self._portals_changed()
+
+    # Function to keep the graph up to date with an added location
+    def location_added(self, location):
+        """Function to add a newly saved location to the graph if it is a portal
+
+        Args:
+            location (dict): Location data that was saved
+        """
+        if not location.get("portal", False):
+            return
+
+        with self._lock:
+            self._portals[location["id"]] = location
+            self._portals_changed()
+
+    # Function to keep the graph up to date with an edited location
+    def location_edited(self, id, edit_func):
+        """Function to apply an edit to a portal, or forget the trees starting from the edited location
+
+        Only works for edits that do not change whether the location is a portal.
+
+        Args:
+            id             (str): ID of the location that was edited
+            edit_func (callable): Function that takes the old location data and returns the edited location data
+        """
+        with self._lock:
+            portal = self._portals.get(id)
+
+            if portal is not None:
+                self._portals[id] = edit_func(portal)
+                self._portals_changed()
+            else:
+                self.forget(id)
+
+    # Function to keep the graph up to date with a removed location
+    def location_removed(self, id):
+        """Function to remove a deleted location from the graph, or forget the trees starting from it
+
+        Args:
+            id (str): ID of the location that was removed
+        """
+        with self._lock:
+            if self._portals.pop(id, None) is not None:
+                self._portals_changed()
+            else:
+                self.forget(id)
+
+    # Function to drop the trees of a starting location
+    def forget(self, id):
+        """Function to drop every cached tree that starts from the given location
+
+        Args:
+            id (str): ID of the starting location
+        """
+        with self._lock:
+            for key in [key for key in self._trees if key[0] == id]:
+                del self._trees[key]
+
+    # Function to run Dijkstra from a location
+    def _build_tree(self, x, y, speed):
+        """Function to find the fastest way from a point to every portal node
+
+        Node 0 is the starting point, nodes 1 to P are the portals in the overworld and nodes P+1 to 2P the same
+        portals in the Nether. Every node is connected to every other node of its dimension and each portal's
+        two nodes are connected to each other. The graph is dense, so every step relaxes a whole row at once.
+
+        Args:
+            x       (float): X coordinate of the starting point
+            y       (float): Y coordinate of the starting point (NOTE: This is the z coordinate in minecraft)
+            speed   (float): Travel speed in blocks/sec
+
+        Returns:
+            tuple: Returns the seconds to reach every node, the previous node on the fastest way to every node and the overworld coordinates of nodes 0 to P
+        """
+        portals = len(self._portal_ids)
+        nodes = 2 * portals + 1
+
+        overworld = np.vstack([[x, y], self._portal_coords])
+
+        seconds = np.full(nodes, np.inf)
+        previous = np.full(nodes, -1)
+        done = np.zeros(nodes, dtype=bool)
+        seconds[0] = 0.0
+
+        for _ in range(nodes):
+            node = int(np.argmin(np.where(done, np.inf, seconds)))
+
+            if done[node] or np.isinf(seconds[node]):
+                break
+
+            done[node] = True
+            cost = np.full(nodes, np.inf)
+
+            # Overworld node, walk to any other overworld node or take the portal
+            if node <= portals:
+                cost[:portals + 1] = np.hypot(*(overworld - overworld[node]).T) / speed
+                if node > 0:
+                    cost[portals + node] = self.portal_time
+
+            # Nether node, walk to any other Nether node or take the portal back
+            else:
+                portal = node - portals
+                cost[portals + 1:] = np.hypot(*(self._portal_coords - self._portal_coords[portal - 1]).T) / self.nether_scale / speed
+                cost[portal] = self.portal_time
+
+            reached = seconds[node] + cost
+            better = (reached < seconds) & ~done
+
+            seconds[better] = reached[better]
+            previous[better] = node
+
+        return seconds, previous, overworld
+
+    # Function to get the tree from a location, building it if needed
+    def tree(self, source, speed):
+        """Function to get the shortest path tree starting from a location, from the cache if it is there
+
+        Args:
+            source   (dict): Location data to start from
+            speed   (float): Travel speed in blocks/sec
+
+        Returns:
+            tuple: Returns the tree (see _build_tree)
+        """
+        key = (source["id"], source["coords"]["x"], source["coords"]["y"], speed)
+
+        with self._lock:
+            tree = self._trees.get(key)
+
+            if tree is not None:
+                self._trees.move_to_end(key)
+                self._counters["hits"] += 1
+                return tree
+
+            self._counters["misses"] += 1
+
+            tree = self._build_tree(float(source["coords"]["x"]), float(source["coords"]["y"]), speed)
+
+            self._trees[key] = tree
+            if len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+
+            return tree
+
+    # Function to find the fastest way between two locations
+    def route(self, source, target, speed):
+        """Function to find the fastest way from one location to another
+
+        Args:
+            source   (dict): Location data to start from
+            target   (dict): Location data to go to
+            speed   (float): Travel speed in blocks/sec
+
+        Returns:
+            float, list: Returns the total amount of seconds and the list of legs, every leg being a
+            (from name, to name, dimension, blocks, seconds) tuple where dimension is 'overworld', 'nether' or 'portal'
+        """
+        with self._lock:
+            seconds, previous, overworld = self.tree(source, speed)
+            portals = len(self._portal_ids)
+            names = [source["name"]] + [self._portals[id]["name"] for id in self._portal_ids]
+
+        # Walk to the destination from whichever overworld node gets there first
+        walk = np.hypot(*(overworld - [target["coords"]["x"], target["coords"]["y"]]).T) / speed
+        arrival = seconds[:portals + 1] + walk
+        last = int(np.argmin(arrival))
+
+        # Follow the tree back to the start
+        path = [last]
+        while path[-1] != 0:
+            path.append(int(previous[path[-1]]))
+        path.reverse()
+
+        legs = []
+        for a, b in zip(path[:-1], path[1:]):
+            name_a, name_b = names[a if a <= portals else a - portals], names[b if b <= portals else b - portals]
+
+            if a <= portals and b <= portals:
+                blocks = float(np.hypot(*(overworld[a] - overworld[b])))
+                legs.append((name_a, name_b, "overworld", blocks, blocks / speed))
+            elif a > portals and b > portals:
+                blocks = float(np.hypot(*(overworld[a - portals] - overworld[b - portals]))) / self.nether_scale
+                legs.append((name_a, name_b, "nether", blocks, blocks / speed))
+            else:
+                legs.append((name_a, name_b, "portal", 0.0, self.portal_time))
+
+        blocks = float(walk[last]) * speed
+        legs.append((names[last], target["name"], "overworld", blocks, float(walk[last])))
+
+        # Drop the walks that go nowhere (i.e. starting or ending right at a portal)
+        legs = [leg for leg in legs if leg[2] != "overworld" or leg[3] > 0] or legs
+
+        return float(arrival[last]), legs
+
+    # Function to get stats about the graph
+    def stats(self):
+        """Function to get a snapshot of the graph and its tree cache
+
+        Returns:
+            dict: Returns the amount of portals and cached trees and the cache hit/miss counters
+        """
+        with self._lock:
+            stats = {"portals" : len(self._portals), "trees" : len(self._trees)}
+            stats.update(self._counters)
+
+        return stats
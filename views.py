@@ -0,0 +1,130 @@
+import discord
+
+class LocationPageView(discord.ui.View):
+    """Class for the previous/next buttons that page through a list of locations
+
+    Only the page being shown is ever held, each button press asks the Operator for the page
+    right before or right after it.
+
+    Stores...
+        The Operator used to fetch pages
+        ID of the guild whose locations are listed
+        Search token and query the list is for
+        The locations on the current page and its page number
+        Whether there are pages before and after the current one
+        The message the view is attached to (set after sending it)
+
+    """
+    def __init__(self, op, guild_id, search_token, query, timeout=180):
+        super().__init__(timeout=timeout)
+
+        self.op = op
+        self.guild_id = guild_id
+        self.search_token = search_token
+        self.query = query
+
+        self.page = []
+        self.page_number = 0
+        self.has_previous = False
+        self.has_next = False
+
+        self.message = None
+
+    # Function to fetch a page next to the current one
+    async def load(self, backwards=False):
+        """Function to fetch the next page (or previous page if going backwards) and make it the current one
+
+        The first call loads the first page.
+
+        Args:
+            backwards (bool): Flag to load the previous page instead of the next one (Default: False)
+
+        Returns:
+            bool: Returns whether the page was loaded
+        """
+        # Key of the location to start after (or before)
+        cursor = None
+        if len(self.page) > 0:
+            cursor = self.op.location_sort_key(self.page[0] if backwards else self.page[-1])
+
+        result = await self.op.run_async(self.op.search_locations_page, self.guild_id, self.search_token, query=self.query, cursor=cursor, backwards=backwards)
+
+        if result == False:
+            return False
+
+        page, more = result
+
+        # Nothing left in that direction (i.e. locations were removed since the last page), stay on the current page
+        if len(page) == 0 and len(self.page) > 0:
+            if backwards:
+                self.has_previous = False
+            else:
+                self.has_next = False
+            self.update_buttons()
+            return True
+
+        if backwards:
+            self.page_number -= 1
+            self.has_previous = more
+            self.has_next = True
+        else:
+            self.page_number += 1
+            self.has_previous = self.page_number > 1
+            self.has_next = more
+
+        self.page = page
+        self.update_buttons()
+
+        return True
+
+    # Function to enable/disable the buttons
+    def update_buttons(self):
+        """Function to only enable the buttons that lead to another page"""
+        self.previous_page.disabled = not self.has_previous
+        self.next_page.disabled = not self.has_next
+
+    # Function to create the embed for the current page
+    def embed(self):
+        """Function to create the discord embed object for the current page
+
+        Returns:
+            embed: Returns the embed listing the locations on the current page
+        """
+        search_token = None if self.query == "all" else self.search_token
+
+        return self.op.location_list_embed(self.page, search_token=search_token, query=self.query, page_number=self.page_number)
+
+    # Function to show another page in place of the current one
+    async def show(self, interaction, backwards):
+        """Function to load another page and edit the message to show it
+
+        Args:
+            interaction (Interaction): The button press
+            backwards          (bool): Flag to show the previous page instead of the next one
+        """
+        if not await self.load(backwards=backwards):
+            await interaction.response.send_message("Unable to retrieve the locations, please try again later.", ephemeral=True)
+            return
+
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        """Button to show the previous page"""
+        await self.show(interaction, backwards=True)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        """Button to show the next page"""
+        await self.show(interaction, backwards=False)
+
+    async def on_timeout(self):
+        """Function to disable the buttons once nobody pressed them for a while"""
+        self.previous_page.disabled = True
+        self.next_page.disabled = True
+
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass